@@ -0,0 +1,315 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+# Host side benchmarks of the flash and monitor tools against the implementations they replaced, e.g.
+#   python benchmark.py                     all benchmarks
+#   python benchmark.py monitor --elf a.axf AddressMatcher with the executable sections of an ELF file
+# Both tools have a "base" package, the benchmarks of each tool run in a process of their own.
+
+import argparse
+import os
+import random
+import struct
+import subprocess
+import sys
+import threading
+import time
+import timeit
+from queue import Queue
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOL_DIRS = {
+    "flash": os.path.join(SCRIPTS_DIR, "flash"),
+    "monitor": os.path.join(SCRIPTS_DIR, "monitor")
+}
+
+
+def legacy_floader_frame(sof, request, length):
+    len_l = length & 0xFF
+    len_h = (length >> 8) & 0xFF
+    frame_bytes = bytearray([sof, len_l, len_h, (len_l ^ len_h) & 0xFF])
+    frame_bytes += request[:length]
+    frame_bytes += (sum(request) & 0xFF).to_bytes(1, byteorder="little")
+    return frame_bytes
+
+
+def legacy_xmodem_frame(stx, packet_no, address, data):
+    stx_data = [stx, packet_no & 0xFF, (~packet_no) & 0xFF]
+    stx_data.extend(list(address.to_bytes(4, byteorder='little')))
+    stx_bytes = bytearray(stx_data)
+    stx_bytes += data
+    stx_bytes += (sum(stx_bytes[3:]) % 256).to_bytes(1, byteorder="little")
+    return stx_bytes
+
+
+def benchmark_frame_codec(number=20000):
+    # per-frame host overhead of the frame builders
+    from base.frame_codec import FloaderFrameCodec, XmodemFrameCodec
+
+    sof = 0xA5
+    stx = 0x02
+    for page_size in [256, 1024, 2048, 4096]:
+        data = os.urandom(page_size)
+        request = struct.pack('<BBI', 0x84, 0, 0x08000000) + data
+        codec = FloaderFrameCodec(sof, page_size + 6)
+        assert codec.encode(request, len(request)) == bytes(legacy_floader_frame(sof, request, len(request)))
+
+        legacy_us = timeit.timeit(lambda: legacy_floader_frame(sof, request, len(request)), number=number) / number * 1e6
+        codec_us = timeit.timeit(lambda: codec.encode(request, len(request)), number=number) / number * 1e6
+        print(f"floader WRITE {page_size:>5}B: legacy {legacy_us:6.2f}us, codec {codec_us:6.2f}us, "
+              f"x{legacy_us / codec_us:.1f}")
+
+    data = os.urandom(1024)
+    codec = XmodemFrameCodec(stx)
+    assert codec.encode(1, 0x08000000, data) == bytes(legacy_xmodem_frame(stx, 1, 0x08000000, data))
+    legacy_us = timeit.timeit(lambda: legacy_xmodem_frame(stx, 1, 0x08000000, data), number=number) / number * 1e6
+    codec_us = timeit.timeit(lambda: codec.encode(1, 0x08000000, data), number=number) / number * 1e6
+    print(f"XMODEM STX     1024B: legacy {legacy_us:6.2f}us, codec {codec_us:6.2f}us, x{legacy_us / codec_us:.1f}")
+
+
+def benchmark_last_line_flusher(chunks=20000):
+    # scheduling overhead per serial chunk, timer per chunk vs. deadline
+    from base.constants import LAST_LINE_THREAD_INTERVAL
+    from base.last_line_flusher import LastLineFlusher
+
+    def run(name, schedule):
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        for _ in range(chunks):
+            schedule()
+        cpu_ms = (time.process_time() - cpu_start) * 1000
+        wall_ms = (time.perf_counter() - wall_start) * 1000
+        print(f"{name:<8}: {chunks} chunks, cpu {cpu_ms:8.1f}ms, wall {wall_ms:8.1f}ms, "
+              f"{chunks / max(wall_ms, 1e-3) * 1000:12.0f} chunks/s")
+        return cpu_ms
+
+    timers = [None]
+
+    def schedule_timer():
+        if timers[0] is not None:
+            timers[0].cancel()
+        timers[0] = threading.Timer(LAST_LINE_THREAD_INTERVAL, lambda: None)
+        timers[0].start()
+
+    flusher = LastLineFlusher()
+    timer_ms = run("timer", schedule_timer)
+    timers[0].cancel()
+    deadline_ms = run("deadline", flusher.touch)
+    print(f"cpu x{timer_ms / max(deadline_ms, 1e-3):.0f}")
+
+
+def benchmark_serial_handler(lines=200000):
+    # lines/sec of the serial input pipeline
+    from base.coredump_freertos import CoreDump
+    from base.log_handler import LogHandler
+    from base.serial_handler import SerialHandler
+
+    chunk_lines = 64
+    chunk = "[MAIN-I] KM4 START SCHEDULER, tick 123456, free heap 0x20012345\r\n" * chunk_lines
+    for timestamps, address_decoding, decode_coredumps in [(False, False, False), (True, False, False),
+                                                            (True, True, True)]:
+        output_queue = Queue()
+        log_handler = LogHandler("", output_queue, timestamps, address_decoding, "", False, "", "bench", None)
+        coredump = CoreDump(decode_coredumps, Queue(), log_handler, "", "", "") if decode_coredumps else None
+        handler = SerialHandler("", log_handler, "freertos", "")
+
+        start = time.perf_counter()
+        for _ in range(lines // chunk_lines):
+            handler.handle_serial_input(chunk, coredump)
+            output_queue.queue.clear()
+        elapsed = time.perf_counter() - start
+        print(f"timestamps={timestamps!s:<5} address_decoding={address_decoding!s:<5} "
+              f"decode_coredumps={decode_coredumps!s:<5}: {lines / elapsed:10.0f} lines/s")
+
+
+def legacy_logagg_parse(buf, logAGG_src, data):
+    events = []
+    buf.extend(data)
+    while buf:
+        try:
+            idx = buf.index(0xFF)
+        except ValueError:
+            events.append(("raw", bytes(buf)))
+            buf.clear()
+            break
+        if idx > 0:
+            events.append(("raw", bytes(buf[:idx])))
+            del buf[:idx]
+        if len(buf) < 2:
+            break
+        header = buf[1]
+        src = (header >> 5) & 0x07
+        length = ((header >> 2) & 0x07) + 1
+        csum = header & 0x03
+        if len(buf) < 2 + length:
+            break
+        frame = bytes(buf[: 2 + length])
+        del buf[: 2 + length]
+        odd_parity = bin(header >> 2).count("1") & 1
+        if not ((csum & 0x2) == 0 and (csum & 0x1) == odd_parity):
+            events.append(("raw", frame))
+            continue
+        if src in (0x1, 0x2, 0x4) and (src & logAGG_src) != 0:
+            events.append(("frame", src, frame[2:]))
+    return events
+
+
+def merge_events(events):
+    merged = []
+    for event in events:
+        if merged and merged[-1][:-1] == event[:-1]:
+            merged[-1] = event[:-1] + (merged[-1][-1] + event[-1],)
+        else:
+            merged.append(event)
+    return merged
+
+
+def make_logagg_stream(size, seed=0):
+    # interleaved frames of 3 sources with full 8-byte payloads, as a multi-core aggregated log
+    from base.logagg_demux import LOGAGG_SYNC
+
+    rand = random.Random(seed)
+    lines = [f"[{name}-I] core {name} heartbeat tick {tick}\r\n".encode() for tick in range(64)
+             for name in ["KM4", "KR4", "CA32"]]
+    stream = bytearray()
+    index = 0
+    while len(stream) < size:
+        src = 1 << (index % 3)
+        line = lines[index % len(lines)]
+        for offset in range(0, len(line), 8):
+            payload = line[offset:offset + 8]
+            header = (src << 5) | ((len(payload) - 1) << 2)
+            header |= bin(header >> 2).count("1") & 1
+            stream += bytes([LOGAGG_SYNC, header]) + payload
+            # the other cores interleave at random frame boundaries
+            if rand.random() < 0.3:
+                break
+        index += 1
+    return bytes(stream)
+
+
+def benchmark_logagg_demux(size=4 * 1024 * 1024, chunk_size=4096):
+    # throughput of the logAGG demultiplexer
+    from base.logagg_demux import LogAggDemux
+
+    stream = make_logagg_stream(size)
+    chunks = [stream[offset:offset + chunk_size] for offset in range(0, len(stream), chunk_size)]
+
+    demux = LogAggDemux([0x1, 0x2, 0x4])
+    legacy_buf = bytearray()
+    events = []
+    legacy_events = []
+    for chunk in chunks[:64]:
+        events += demux.feed(chunk)
+        legacy_events += legacy_logagg_parse(legacy_buf, 0x7, chunk)
+    assert merge_events(events) == merge_events(legacy_events)
+
+    legacy_buf = bytearray()
+    for name, parse in [("legacy", lambda chunk: legacy_logagg_parse(legacy_buf, 0x7, chunk)),
+                        ("demux", LogAggDemux([0x1, 0x2, 0x4]).feed)]:
+        count = 0
+        start = time.perf_counter()
+        for chunk in chunks:
+            count += len(parse(chunk))
+        elapsed = time.perf_counter() - start
+        print(f"{name:<6}: {len(stream) / elapsed / 1024 / 1024:6.2f} MB/s, {count} events")
+
+
+def legacy_is_executable_address(intervals, addr):
+    for start, end in intervals:
+        if start > addr:
+            return False
+        if start <= addr < end:
+            return True
+    return False
+
+
+def benchmark_address_matcher(elf_path=None, count=200000):
+    # addresses/sec of AddressMatcher
+    from base.address_decoder import AddressMatcher
+
+    if elf_path:
+        from elftools.elf.constants import SH_FLAGS
+        from elftools.elf.elffile import ELFFile
+
+        matcher = AddressMatcher(elf_path)
+        with open(elf_path, 'rb') as file:
+            raw_intervals = sorted([(s['sh_addr'], s['sh_addr'] + s['sh_size']) for s in ELFFile(file).iter_sections()
+                                    if s['sh_flags'] & SH_FLAGS.SHF_EXECINSTR])
+    else:
+        # a large image with many executable output sections, e.g. per-region text and ram code sections
+        rand = random.Random(0)
+        raw_intervals = []
+        address = 0x08000000
+        for _ in range(2000):
+            size = rand.randrange(0x40, 0x4000)
+            raw_intervals.append((address, address + size))
+            address += size + rand.choice([0, 0, 0x100])
+        matcher = AddressMatcher()
+        matcher.set_intervals(raw_intervals)
+    print(f"{len(raw_intervals)} executable sections, {len(matcher.intervals)} merged intervals")
+
+    # log-like addresses: a working set of code addresses repeated, plus random data words
+    rand = random.Random(1)
+    low = raw_intervals[0][0] if raw_intervals else 0
+    high = raw_intervals[-1][1] if raw_intervals else 0x10000000
+    working_set = [rand.randrange(low, high) for _ in range(512)]
+    addresses = [rand.choice(working_set) if rand.random() < 0.8 else rand.randrange(0, 0xFFFFFFFF)
+                 for _ in range(count)]
+    assert [matcher.is_executable_address(a) for a in addresses[:2000]] == \
+        [legacy_is_executable_address(raw_intervals, a) for a in addresses[:2000]]
+
+    for name, check in [("linear", lambda a: legacy_is_executable_address(raw_intervals, a)),
+                        ("bisect", AddressMatcher.is_executable_address.__get__(matcher))]:
+        matcher._cache.clear()
+        start = time.perf_counter()
+        for address in addresses:
+            check(address)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {count / elapsed:12.0f} addresses/s")
+
+
+def run_flash_benchmarks(args):
+    print("> frame codec")
+    benchmark_frame_codec()
+
+
+def run_monitor_benchmarks(args):
+    print("> last line flusher")
+    benchmark_last_line_flusher()
+    print("> serial handler")
+    benchmark_serial_handler()
+    print("> logAGG demux")
+    benchmark_logagg_demux()
+    print("> address matcher")
+    benchmark_address_matcher(args.elf)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="host side benchmarks of the flash and monitor tools")
+    parser.add_argument('tool', nargs='?', choices=['all'] + list(TOOL_DIRS.keys()), default='all',
+                        help='tool to benchmark')
+    parser.add_argument('--elf', type=str, help='ELF file for the address matcher benchmark')
+    args = parser.parse_args()
+
+    if args.tool == 'all':
+        ret = 0
+        for tool in TOOL_DIRS.keys():
+            cmd = [sys.executable, os.path.abspath(__file__), tool]
+            if args.elf:
+                cmd += ['--elf', args.elf]
+            ret = subprocess.run(cmd).returncode or ret
+        sys.exit(ret)
+
+    sys.path.insert(0, TOOL_DIRS[args.tool])
+    if args.tool == 'flash':
+        run_flash_benchmarks(args)
+    else:
+        run_monitor_benchmarks(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,3 @@
 from .download_handler import *
 from .rtk_logging import *
-from .rt_settings import *
\ No newline at end of file
+from .rt_settings import *
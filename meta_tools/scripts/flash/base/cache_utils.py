@@ -0,0 +1,64 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import sys
+import json
+import hashlib
+import tempfile
+
+_CACHE_DIR_NAME = "AmebaFlash"
+
+
+class CacheUtils:
+    @staticmethod
+    def get_cache_dir(sub_dir=None):
+        if sys.platform == "win32":
+            root = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+        elif sys.platform == "darwin":
+            root = os.path.expanduser("~/Library/Caches")
+        else:
+            root = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+
+        cache_dir = os.path.join(root, _CACHE_DIR_NAME)
+        if sub_dir:
+            cache_dir = os.path.join(cache_dir, sub_dir)
+
+        return cache_dir
+
+    @staticmethod
+    def get_content_key(content):
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        return hashlib.sha256(content).hexdigest()
+
+    @staticmethod
+    def load_json(sub_dir, key):
+        result = None
+        cache_file = os.path.join(CacheUtils.get_cache_dir(sub_dir), f"{key}.json")
+        try:
+            if os.path.exists(cache_file):
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    result = json.load(f)
+        except Exception:
+            # broken cache entry, will be overwritten
+            result = None
+
+        return result
+
+    @staticmethod
+    def save_json(sub_dir, key, data):
+        cache_dir = CacheUtils.get_cache_dir(sub_dir)
+        try:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            # write to a temp file and rename, so that concurrent processes never read a partial entry
+            fd, temp_file = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_file, os.path.join(cache_dir, f"{key}.json"))
+        except Exception:
+            # cache is optional
+            pass
@@ -0,0 +1,86 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+
+from .cache_utils import *
+
+_DEVICE_CACHE_DIR = "devices"
+_PORT_KEY_PREFIX = "port_"
+
+
+class DeviceCache(object):
+    """
+    Per-board cache of results which only change when the OTP is programmed, keyed by the device identity
+    reported by the flashloader: chip ID, WiFi MAC and flash ID/capacity. A board swapped on the same port, or with a
+    replaced flash, gets a different key. The entry is dropped when this tool programs the OTP, and when a later
+    handshake on the port of the board fails, since the OTP may have been changed by another tool meanwhile.
+    """
+
+    SPIC_ADDR_MODE = "SpicAddrMode"
+
+    def __init__(self, device_info, port=None):
+        self.key = self.get_key(device_info)
+        self.data = None
+        if self.is_valid() and port is not None:
+            # remember the board last seen on the port
+            port_key = self._get_port_key(port)
+            port_entry = CacheUtils.load_json(_DEVICE_CACHE_DIR, port_key) or {}
+            if port_entry.get("Key", None) != self.key:
+                CacheUtils.save_json(_DEVICE_CACHE_DIR, port_key, {"Key": self.key})
+
+    @staticmethod
+    def get_key(device_info):
+        if device_info is None or not device_info.wifi_mac:
+            return None
+        mac = bytes(device_info.wifi_mac)
+        if mac == bytes(len(mac)) or mac == bytes([0xFF] * len(mac)):
+            # MAC not programmed, cannot tell boards apart
+            return None
+        return (f"{device_info.did:04x}_{mac.hex()}_{device_info.flash_mid}_{device_info.flash_did}_"
+                f"{device_info.flash_capacity}")
+
+    def is_valid(self):
+        return self.key is not None
+
+    def get(self, name):
+        if not self.is_valid():
+            return None
+        if self.data is None:
+            self.data = CacheUtils.load_json(_DEVICE_CACHE_DIR, self.key) or {}
+        return self.data.get(name, None)
+
+    def set(self, name, value):
+        if not self.is_valid():
+            return
+        if self.data is None:
+            self.data = CacheUtils.load_json(_DEVICE_CACHE_DIR, self.key) or {}
+        self.data[name] = value
+        CacheUtils.save_json(_DEVICE_CACHE_DIR, self.key, self.data)
+
+    def invalidate(self):
+        if not self.is_valid():
+            return
+        self.data = {}
+        self._remove(self.key)
+
+    @staticmethod
+    def invalidate_port(port):
+        # drop the entry of the board last seen on the port, it is queried again on the next connection
+        port_entry = CacheUtils.load_json(_DEVICE_CACHE_DIR, DeviceCache._get_port_key(port))
+        if port_entry and port_entry.get("Key", None):
+            DeviceCache._remove(port_entry["Key"])
+
+    @staticmethod
+    def _get_port_key(port):
+        return _PORT_KEY_PREFIX + CacheUtils.get_content_key(port)
+
+    @staticmethod
+    def _remove(key):
+        try:
+            os.remove(os.path.join(CacheUtils.get_cache_dir(_DEVICE_CACHE_DIR), f"{key}.json"))
+        except OSError:
+            pass
@@ -4,10 +4,8 @@
 # Copyright (c) 2024 Realtek Semiconductor Corp.
 # SPDX-License-Identifier: Apache-2.0
 
-from serial.tools.list_ports import comports
 import serial
 import struct
-import serial.tools.list_ports
 from datetime import datetime
 
 from .rom_handler import *
@@ -19,6 +17,14 @@ from .rt_settings import *
 from .spic_addr_mode import *
 from .memory_info import *
 from .config_utils import *
+from .image_preparer import *
+from .usb_identity import *
+from .otp_map import *
+from .device_cache import *
+from .flash_layout_planner import *
+from .golden_image import *
+from .resume_state import *
+from .flash_stats import *
 from typing import Optional, Dict, Any
 from pathlib import Path
 
@@ -26,18 +32,29 @@ current_script_path = Path(__file__).resolve().parent
 remote_service_path = current_script_path.parent.parent / 'RemoteService'
 
 RemoteSerial = None
+_remote_serial_probed = False
 
-if remote_service_path.exists():
-    sys.path.insert(0, str(remote_service_path))
 
-    try:
-        from remote_serial import RemoteSerial
-    except ImportError as e:
-        RemoteSerial = None
-        print(f"error: RemoteSerial ImportError: ", str(e))
-    except Exception as e:
-        RemoteSerial = None
-        print(f"error: RemoteSerial ImportException: ", str(e))
+def load_remote_serial():
+    # RemoteService is probed on first use of a remote server only, keep it off the startup path of local flashing
+    global RemoteSerial, _remote_serial_probed
+
+    if not _remote_serial_probed:
+        _remote_serial_probed = True
+        if remote_service_path.exists():
+            sys.path.insert(0, str(remote_service_path))
+
+            try:
+                from remote_serial import RemoteSerial
+            except ImportError as e:
+                RemoteSerial = None
+                print(f"error: RemoteSerial ImportError: ", str(e))
+            except Exception as e:
+                RemoteSerial = None
+                print(f"error: RemoteSerial ImportException: ", str(e))
+
+    return RemoteSerial
+
 
 _RTK_USB_VID = "0BDA"
 
@@ -57,6 +74,11 @@ OtpSpicAddrModePosForAmebaD = 6
 OtpSpicAddrMode4ByteForAmebaD = (1 << OtpSpicAddrModePosForAmebaD)
 OtpSpicAddrMode3ByteForAmebaD = (0 << OtpSpicAddrModePosForAmebaD)
 
+# Active ready detection, the fixed delays in settings are only used as upper bounds
+ReadyPollIntervalInSecond = 0.01
+ReadyProbeTimeoutInSecond = 0.05
+UsbReopenTimeoutInSecond = 1
+
 
 class Ameba(object):
     def __init__(self,
@@ -70,6 +92,10 @@ class Ameba(object):
                  chip_erase=False,
                  memory_type=None,
                  erase_info=None,
+                 golden_image=False,
+                 ram_boot=False,
+                 entry_address=None,
+                 stats=None,
                  remote_server: Optional[str] = None,
                  remote_port: Optional[int] = None,
                  remote_password: Optional[str] = None,
@@ -83,6 +109,7 @@ class Ameba(object):
         self.remote_port = remote_port
         self.remote_password = remote_password
         self.close_tcp_on_cleanup = close_tcp_on_cleanup
+        self.usb_identity = None
         self.is_usb = self.is_realtek_usb() if not remote_server else False
         self.initial_serial_port()
         self.baudrate = baudrate
@@ -91,8 +118,15 @@ class Ameba(object):
         self.chip_erase = chip_erase
         self.memory_type = memory_type
         self.device_info = None
+        self.device_cache = None
+        self.flash_protection = None
         self.erase_info = erase_info
+        self.golden_image = golden_image
+        self.ram_boot = ram_boot
+        self.entry_address = entry_address
+        self.is_ram_booted = False
         self.is_all_ram = True
+        self.stats = stats if stats is not None else FlashStats(serial_port, baudrate, None)
 
         self.rom_handler = RomHandler(self)
         self.floader_handler = FloaderHandler(self)
@@ -102,7 +136,7 @@ class Ameba(object):
             if self.is_open():
                 try:
                     self.logger.info(f"close {self.serial_port.port}...")
-                    if RemoteSerial and isinstance(self.serial_port, RemoteSerial):
+                    if self.is_remote_serial():
                         self.serial_port.close(close_tcp=self.close_tcp_on_cleanup)
                     else:
                         self.serial_port.close()
@@ -116,7 +150,7 @@ class Ameba(object):
             try:
                 if self.serial_port.is_open:
                     self.logger.info(f"close {self.serial_port.port}...")
-                    if RemoteSerial and isinstance(self.serial_port, RemoteSerial):
+                    if self.is_remote_serial():
                         self.serial_port.close(close_tcp=self.close_tcp_on_cleanup)
                     else:
                         self.serial_port.close()
@@ -140,9 +174,9 @@ class Ameba(object):
             if self.remote_server and self.remote_port:
                 self.logger.info(f"Connect to remote serial server: {self.remote_server}:{self.remote_port} (Serial port: {self.serial_port_name})")
                 # initialize remote serial port
-                if RemoteSerial is None:
+                if load_remote_serial() is None:
                     self.logger.error(f"RemoteSerial doesn't exists at: {remote_service_path} ")
-                    sys.exit(1)
+                    raise FlashError(f"RemoteSerial doesn't exists at: {remote_service_path}", ErrType.SYS_PARAMETER)
                 self.serial_port = RemoteSerial(
                     remote_server=self.remote_server,
                     remote_port=self.remote_port,
@@ -175,13 +209,18 @@ class Ameba(object):
                     self.serial_port.dtr = False
                     self.serial_port.rts = False
                     self.serial_port.open()
+        except FlashError:
+            raise
         except Exception as err:
             self.logger.error(f"Initialize serial port failed: {err}")
-            sys.exit(1)
+            raise FlashError(f"Initialize serial port failed: {err}", ErrType.SYS_IO) from err
+
+    def is_remote_serial(self):
+        return (RemoteSerial is not None) and isinstance(self.serial_port, RemoteSerial)
 
     # --- check if serial port is open (remote/local compatible) ---
     def is_open(self) -> bool:
-        if RemoteSerial and isinstance(self.serial_port, RemoteSerial):
+        if self.is_remote_serial():
             return self.serial_port.is_open
         elif isinstance(self.serial_port, serial.Serial):
             return self.serial_port.is_open
@@ -198,7 +237,7 @@ class Ameba(object):
 
         try:
             # remote serial port: use set_baudrate to preserve DTR/RTS states
-            if RemoteSerial and isinstance(self.serial_port, RemoteSerial):
+            if self.is_remote_serial():
                 self.serial_port.set_baudrate(baud)
                 time.sleep(delay_s)
             else:
@@ -224,17 +263,14 @@ class Ameba(object):
 
                 if self.serial_port.baudrate != baud:
                     self.serial_port.baudrate = baud
-                    time.sleep(delay_s)
+                    if not (self.is_usb and self.is_active_ready_detection()):
+                        time.sleep(delay_s)
 
                 if self.is_usb:
-                    for rty in range(10):
-                        try:
-                            self.serial_port.open()
-                            ret = ErrType.OK
-                            break
-                        except:
-                            ret = ErrType.SYS_IO
-                        time.sleep(0.1)
+                    if self.is_active_ready_detection():
+                        ret = self.wait_usb_port_open(delay_s + UsbReopenTimeoutInSecond)
+                    else:
+                        ret = self.wait_usb_port_open(UsbReopenTimeoutInSecond)
         except Exception as e:
             self.logger.error(f"An exception occurs when switching baudrate: {str(e)}")
             ret = ErrType.SYS_IO
@@ -246,6 +282,104 @@ class Ameba(object):
 
         return ret
 
+    def is_active_ready_detection(self):
+        if self.is_remote_serial():
+            return False
+        return self.setting.active_ready_detection != 0
+
+    def locate_usb_port(self):
+        # the device may re-enumerate under another port name, follow it by USB identity
+        port_name = self.usb_identity.find_port(self.serial_port_name)
+        if port_name is not None and port_name != self.serial_port_name:
+            self.logger.info(f"{self.serial_port_name} re-enumerated as {port_name}")
+            self.serial_port_name = port_name
+        return port_name is not None
+
+    def is_port_present(self):
+        if self.usb_identity is not None:
+            return self.locate_usb_port()
+        if sys.platform.startswith("linux") and self.serial_port_name.startswith("/dev/"):
+            # device node is created/removed by udev on USB (re-)enumeration
+            return os.path.exists(self.serial_port_name)
+        import serial.tools.list_ports
+        for port_info in serial.tools.list_ports.comports():
+            if port_info.device == self.serial_port_name:
+                return True
+        return False
+
+    def wait_usb_port_open(self, timeout_s):
+        ret = ErrType.SYS_IO
+        deadline = time.monotonic() + timeout_s
+
+        while True:
+            if self.is_port_present():
+                try:
+                    if self.serial_port.port != self.serial_port_name:
+                        self.serial_port.port = self.serial_port_name
+                    self.serial_port.open()
+                    ret = ErrType.OK
+                    break
+                except:
+                    ret = ErrType.SYS_IO
+            if time.monotonic() >= deadline:
+                self.logger.debug(f"Wait for {self.serial_port_name} timeout")
+                break
+            time.sleep(ReadyPollIntervalInSecond)
+
+        return ret
+
+    def wait_port_reenumerated(self, timeout_s):
+        deadline = time.monotonic() + timeout_s
+
+        # wait for the device node to disappear and then come back
+        while self.is_port_present():
+            if time.monotonic() >= deadline:
+                self.logger.debug(f"{self.serial_port_name} not re-enumerated")
+                return
+            time.sleep(ReadyPollIntervalInSecond)
+
+        while not self.is_port_present():
+            if time.monotonic() >= deadline:
+                self.logger.debug(f"Wait for {self.serial_port_name} timeout")
+                return
+            time.sleep(ReadyPollIntervalInSecond)
+
+        self.logger.debug(f"{self.serial_port_name} re-enumerated")
+
+    def wait_tx_done(self, delay_s):
+        if self.is_active_ready_detection():
+            try:
+                # return as soon as the data has been transmitted
+                self.serial_port.flush()
+                return
+            except Exception as err:
+                self.logger.debug(f"Flush serial port exception: {err}")
+        time.sleep(delay_s)
+
+    def boot_floader(self, baud, boot_delay):
+        if not self.is_active_ready_detection():
+            return self.switch_baudrate(baud, boot_delay, True)
+
+        # poll the flashloader until it responds instead of waiting for the whole boot delay
+        deadline = time.monotonic() + boot_delay + (UsbReopenTimeoutInSecond if self.is_usb else 0)
+        ret = self.switch_baudrate(baud, 0, True)
+        while True:
+            if ret == ErrType.OK:
+                ret, _ = self.floader_handler.sense(ReadyProbeTimeoutInSecond, count_retries=False)
+                if ret == ErrType.OK:
+                    self.logger.debug(f"Flashloader ready")
+                    break
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(ReadyPollIntervalInSecond)
+            if self.is_usb and (ret == ErrType.SYS_IO or not self.serial_port.is_open):
+                # device re-enumerated after the opened port, reopen it
+                ret = self.switch_baudrate(baud, 0, True)
+            else:
+                ret = ErrType.OK
+
+        return ret
+
     def read_bytes(self, timeout_seconds, size=1):
         ret = ErrType.OK
         read_ch = None
@@ -284,14 +418,17 @@ class Ameba(object):
     def is_realtek_usb(self):
         if self.remote_server:
             return False
-        ports = serial.tools.list_ports.comports()
-        for port, desc, hvid in sorted(ports):
-            if port == self.serial_port_name:
-                # hvid: USB VID:PID=0BDA:8722 SER=5 LOCATION=1-1
-                if _RTK_USB_VID in hvid:
+        import serial.tools.list_ports
+        # one enumeration for the check and the USB identity
+        for port_info in serial.tools.list_ports.comports():
+            if port_info.device == self.serial_port_name:
+                # hwid: USB VID:PID=0BDA:8722 SER=5 LOCATION=1-1
+                if _RTK_USB_VID in port_info.hwid:
+                    self.usb_identity = UsbIdentity.from_port_info(port_info)
+                    self.logger.debug(f"USB identity: {self.usb_identity}")
                     return True
-        else:
-            return False
+                break
+        return False
 
     def switch_baudrate_old(self, baud, delay_s, force=False):
         ret = ErrType.OK
@@ -386,20 +523,25 @@ class Ameba(object):
                     self.serial_port.flushOutput()
 
                     self.write_bytes(CmdEsc)
-                    time.sleep(0.02)
+                    self.wait_tx_done(0.02)
 
                     if self.profile_info.is_amebad():
                         self.serial_port.flushOutput()
                         self.write_bytes(CmdSetBackupRegister)
-                        time.sleep(0.02)
+                        self.wait_tx_done(0.02)
 
                     self.serial_port.flushOutput()
                     self.write_bytes(CmdResetIntoDownloadMode)
-                    time.sleep(0.02)  # wait for cmd tx to device successfully when in lower baudrate
+                    self.wait_tx_done(0.02)  # wait for cmd tx to device successfully when in lower baudrate
 
-                    self.switch_baudrate(self.profile_info.handshake_baudrate, boot_delay, True)
-                    self.serial_port.flushInput()
-                    time.sleep(0.05)
+                    if self.is_active_ready_detection():
+                        # ROM handshake waits for the NAK stream of ROM download mode, no need to wait boot delay
+                        self.switch_baudrate(self.profile_info.handshake_baudrate, 0, True)
+                        self.serial_port.flushInput()
+                    else:
+                        self.switch_baudrate(self.profile_info.handshake_baudrate, boot_delay, True)
+                        self.serial_port.flushInput()
+                        time.sleep(0.05)
 
                     self.logger.debug(
                         f'Check whether reset in ROM download mode with baudrate {self.profile_info.handshake_baudrate}')
@@ -414,7 +556,8 @@ class Ameba(object):
                     self.switch_baudrate(self.baudrate, self.setting.baudrate_switch_delay_in_second, True)
 
                 self.logger.debug(f"Check whether in floader with baudrate {self.baudrate}")
-                ret, status = self.floader_handler.sense(self.setting.sync_response_timeout_in_second)
+                ret, status = self.floader_handler.sense(self.setting.sync_response_timeout_in_second,
+                                                         count_retries=False)
                 if ret == ErrType.OK:
                     # do not reset floader
                     is_floader = True
@@ -495,6 +638,7 @@ class Ameba(object):
 
         return ret
 
+    @stats_phase("prepare")
     def prepare(self, show_device_info=True):
         ret = ErrType.OK
         floader_init_baud = self.baudrate if self.is_usb else (self.profile_info.handshake_baudrate if
@@ -520,7 +664,7 @@ class Ameba(object):
                 self.logger.error(f"Flashloader download fail: {ret}")
                 return ret
 
-            ret = self.switch_baudrate(floader_init_baud, boot_delay, True)
+            ret = self.boot_floader(floader_init_baud, boot_delay)
             if ret != ErrType.OK:
                 self.logger.error(f"Flashloader boot fail: {ret}")
                 return ret
@@ -528,6 +672,9 @@ class Ameba(object):
             ret = self.floader_handler.handshake(self.baudrate)
             if ret != ErrType.OK:
                 self.logger.error(f"Flashloader handshake fail: {ret}")
+                if self.setting.device_cache != 0:
+                    # do not trust the cached board data on the next connection, e.g. OTP changed by another tool
+                    DeviceCache.invalidate_port(self.serial_port_name)
                 return ret
 
         ret, self.device_info = self.floader_handler.query()
@@ -535,6 +682,11 @@ class Ameba(object):
             self.logger.error(f"Query fail: {ret}")
             return ret
 
+        # status register may be changed by the firmware once the device is reset, only valid within a session
+        self.flash_protection = None
+        if self.setting.device_cache != 0:
+            self.device_cache = DeviceCache(self.device_info, self.serial_port_name)
+
         if not show_device_info:
             return ret
 
@@ -556,7 +708,12 @@ class Ameba(object):
             address = 0
             bp_mask = FlashUtils.NorStatusReg1BpMask.value
 
-        ret, protection = self.read_flash_status_register(cmd, address)
+        if self.flash_protection is not None:
+            ret, protection = ErrType.OK, self.flash_protection
+        else:
+            ret, protection = self.read_flash_status_register(cmd, address)
+            if ret == ErrType.OK:
+                self.flash_protection = protection
         flash_status.protection = protection
         if ret == ErrType.OK:
             if (protection & bp_mask) != 0:
@@ -621,6 +778,7 @@ class Ameba(object):
             address = 0
 
         ret = self.write_flash_status_register(cmd, address, protection)
+        self.flash_protection = protection if ret == ErrType.OK else None
 
         return ret
 
@@ -666,7 +824,7 @@ class Ameba(object):
             reburn_timing = ConfigUtils.get_key_value_pairs(self.logger, reburn_timing_file)
             try:
                 if reburn_timing:
-                    if RemoteSerial and isinstance(self.serial_port, RemoteSerial):
+                    if self.is_remote_serial():
                         self.serial_port.control_dtr_rts(reburn_timing, "enter_download_mode")
                     else:
                         ret = self.dtr_rts_timing_mapping(reburn_timing)
@@ -689,7 +847,7 @@ class Ameba(object):
             reset_timing = ConfigUtils.get_key_value_pairs(self.logger, reset_timing_file)
             try:
                 if reset_timing:
-                    if RemoteSerial and isinstance(self.serial_port, RemoteSerial):
+                    if self.is_remote_serial():
                         self.serial_port.control_dtr_rts(reset_timing, "reset_device")
                     else:
                         ret = self.dtr_rts_timing_mapping(reset_timing)
@@ -701,9 +859,14 @@ class Ameba(object):
 
         return ret
 
+    @stats_phase("post_process")
     def post_process(self):
         ret = ErrType.OK
 
+        if self.is_ram_booted:
+            self.logger.info(f"Device is running from RAM, skip post process")
+            return ret
+
         post_process_str = self.setting.post_process.strip().upper()
         try:
             next_op = NextOpType[post_process_str]
@@ -753,13 +916,17 @@ class Ameba(object):
         return ret
 
     def _process_image(self, img_name):
+        return Ameba.resolve_image_name(img_name, self.image_path, self.logger)
+
+    @staticmethod
+    def resolve_image_name(img_name, image_path, logger):
         if img_name.strip().startswith(("A:", "B:")):
             img_name = img_name.split(":")[1].split("(")[0].strip()
         if img_name.endswith(".dtb"):
-            img_path_files = os.listdir(self.image_path)
+            img_path_files = os.listdir(image_path)
             for img_f in img_path_files:
-                self.logger.debug(img_f)
-                if img_f.endswith(".dtb") and os.path.isfile(os.path.join(self.image_path, img_f)):
+                logger.debug(img_f)
+                if img_f.endswith(".dtb") and os.path.isfile(os.path.join(image_path, img_f)):
                     img_name = img_f
                     break
             else:
@@ -964,6 +1131,7 @@ class Ameba(object):
         chksum = chksum & 0xffffffff
         return chksum
 
+    @stats_phase("erase")
     def erase_flash_chip(self):
         self.logger.info(f"Chip erase start")  # customized, do not modify
         ret = self.floader_handler.erase_flash(MemoryInfo.MEMORY_TYPE_NOR, RtkDeviceProfile.DEFAULT_FLASH_START_ADDR,
@@ -973,7 +1141,45 @@ class Ameba(object):
         self.logger.info(f"Chip erase end")
         return ret
 
-    def download_images(self):
+    def get_image_padding_byte(self, image_info):
+        return Ameba.get_padding_byte(self.setting, image_info)
+
+    @staticmethod
+    def get_padding_byte(setting, image_info):
+        if image_info.memory_type == MemoryInfo.MEMORY_TYPE_RAM:
+            return setting.ram_download_padding_byte
+        else:
+            return FlashUtils.FlashWritePaddingData.value
+
+    def get_download_image_list(self):
+        return Ameba.list_download_images(self.profile_info, self.setting, self.image_path, self.download_img_info,
+                                          self.logger)
+
+    @staticmethod
+    def list_download_images(profile_info, setting, image_path, download_img_info, logger):
+        # (image path, padding byte) of the images to download, known before the device is opened
+        image_list = []
+
+        if download_img_info:
+            for image_info in download_img_info:
+                image_list.append((image_info.image_name, Ameba.get_padding_byte(setting, image_info)))
+        else:
+            for image_info in profile_info.images:
+                if not image_info.mandatory:
+                    continue
+                try:
+                    img_name = Ameba.resolve_image_name(image_info.image_name, image_path, logger)
+                except OSError:
+                    img_name = None
+                if img_name is None:
+                    continue
+                img_path = os.path.realpath(os.path.join(image_path, img_name))
+                image_list.append((img_path, Ameba.get_padding_byte(setting, image_info)))
+
+        return image_list
+
+    @stats_phase("download")
+    def download_images(self, image_preparer=None):
         ret = ErrType.OK
 
         # support chip erase
@@ -983,17 +1189,36 @@ class Ameba(object):
                 self.logger.error(f"Chip erase fail")
                 return ret
 
-        if self.download_img_info:
-            for image_info in self.download_img_info:
-                img_path = image_info.image_name
-                img_name = os.path.basename(img_path)
-                image_info.image_name = img_name
+        ret, download_list = self.get_download_list()
+        if ret != ErrType.OK:
+            return ret
 
-                self.logger.info(f"{img_name} download...")
-                ret = self._download_image(img_path, image_info)
+        if self.is_layout_plan_applicable(download_list):
+            ret = self._download_images_with_plan(download_list, image_preparer)
+        else:
+            for img_path, image_info in download_list:
+                prepared_image = image_preparer.get(img_path, self.get_image_padding_byte(image_info)) \
+                    if image_preparer else None
+
+                self.logger.info(f"{image_info.image_name} download...")
+                ret = self._download_image(img_path, image_info, prepared_image)
                 if ret != ErrType.OK:
-                    self.logger.info(f"{img_name} download fail: {ret}")
+                    self.logger.info(f"{image_info.image_name} download fail: {ret}")
                     break
+
+        if ret == ErrType.OK:
+            self.logger.info("All images download done")
+
+        return ret
+
+    def get_download_list(self):
+        download_list = []
+
+        if self.download_img_info:
+            for image_info in self.download_img_info:
+                img_path = image_info.image_name
+                image_info.image_name = os.path.basename(img_path)
+                download_list.append((img_path, image_info))
         else:
             is_area_A = False
             is_area_B = False
@@ -1002,7 +1227,6 @@ class Ameba(object):
                 if not is_mandatory:
                     continue
                 img_name = image_info.image_name
-                self.logger.info(f"{img_name} download...")
                 if img_name.strip().startswith(("A:", "a_")):
                     is_area_A = True
                 elif img_name.strip().startswith(("B:", "b_")):
@@ -1010,21 +1234,280 @@ class Ameba(object):
 
                 if is_area_A and is_area_B:
                     self.logger.error(f"NOT support both A and B download at the same time")
-                    ret = ErrType.SYS_PARAMETER
-                    break
+                    return ErrType.SYS_PARAMETER, download_list
 
                 img_name = self._process_image(img_name)
                 img_path = os.path.realpath(os.path.join(self.image_path, img_name))
-                ret = self._download_image(img_path, image_info)
-                if ret != ErrType.OK:
-                    self.logger.info(f"{img_name} download fail: {ret}")
-                    break
+                download_list.append((img_path, image_info))
+
+        return ErrType.OK, download_list
+
+    @stats_phase("download")
+    def download_golden_image(self, image_preparer=None):
+        ret, download_list = self.get_download_list()
+        if ret != ErrType.OK:
+            return ret
+
+        for _, image_info in download_list:
+            if (image_info.memory_type != MemoryInfo.MEMORY_TYPE_NOR) or \
+                    self.profile_info.is_ram_address(image_info.start_address):
+                self.logger.error(f"Golden image is only supported for NOR flash")
+                return ErrType.SYS_PARAMETER
+
+        golden_image = None
+        if len(download_list) > 1:
+            # merge the images on host side, so they are downloaded as one continuous transfer
+            golden_image = GoldenImage(FlashUtils.FlashWritePaddingData.value)
+            try:
+                img_path = golden_image.build([(path, info.start_address, info.start_address + os.path.getsize(path))
+                                               for path, info in download_list])
+            except (OSError, ValueError) as err:
+                self.logger.error(f"Generate golden image fail: {err}")
+                golden_image.clean_up()
+                return ErrType.SYS_PARAMETER
+
+            if image_preparer is None:
+                image_preparer = ImagePreparer(self.logger)
+            image_preparer.add(golden_image.prepared_image)
+
+            image_info = ImageInfo()
+            image_info.image_name = "golden image"
+            image_info.start_address = golden_image.start_address
+            image_info.end_address = max([info.end_address for _, info in download_list])
+            image_info.memory_type = MemoryInfo.MEMORY_TYPE_NOR
+            image_info.mandatory = True
+            self.logger.info(f"Golden image generated from {len(download_list)} images: "
+                             f"{hex(golden_image.start_address)}-{hex(golden_image.end_address)}")
+            download_list = [(img_path, image_info)]
+
+        try:
+            ret = self.erase_flash_chip()
+            if ret != ErrType.OK:
+                self.logger.error(f"Chip erase fail")
+                return ret
+
+            ret = self._download_images_with_plan(download_list, image_preparer, need_erase=False,
+                                                  sense_packet_count=self.setting.golden_image_sense_packet_count)
+        finally:
+            if golden_image is not None:
+                golden_image.clean_up()
 
         if ret == ErrType.OK:
             self.logger.info("All images download done")
 
         return ret
 
+    @stats_phase("download")
+    def download_ram_and_run(self, image_preparer=None):
+        ret, download_list = self.get_download_list()
+        if ret != ErrType.OK:
+            return ret
+
+        for _, image_info in download_list:
+            if not self.profile_info.is_ram_address(image_info.start_address):
+                self.logger.error(f"RAM boot is only supported for RAM images, {image_info.image_name} is not")
+                return ErrType.SYS_PARAMETER
+
+        for img_path, image_info in download_list:
+            prepared_image = image_preparer.get(img_path, self.get_image_padding_byte(image_info)) \
+                if image_preparer else None
+
+            self.logger.info(f"{image_info.image_name} download...")
+            ret = self._download_ram_image(img_path, image_info, prepared_image)
+            if ret != ErrType.OK:
+                self.logger.info(f"{image_info.image_name} download fail: {ret}")
+                return ret
+
+        entry_address = self.entry_address if self.entry_address is not None else download_list[0][1].start_address
+        self.logger.info(f"Boot from RAM: entry={hex(entry_address)}")
+        ret = self.floader_handler.next_operation(NextOpType.BOOT, entry_address)
+        if ret != ErrType.OK:
+            self.logger.error(f"Boot from RAM fail: {ret}")
+            return ret
+        self.is_ram_booted = True
+
+        return ret
+
+    def _download_ram_image(self, image_path, image_info, prepared_image=None):
+        # RAM has no erase and no program time, stream the image in large frames and sense only once at the end
+        ret = ErrType.OK
+        # never larger than the frames the flashloader is known to accept, and word aligned for the checksum
+        max_frame_size = self.floader_handler.frame_codec.max_payload_size
+        frame_size = max(4, min(self.setting.ram_download_frame_size, max_frame_size)) // 4 * 4
+        if frame_size != self.setting.ram_download_frame_size:
+            self.logger.warning(f"RamDownloadFrameSize {self.setting.ram_download_frame_size} is not supported, "
+                                f"use {frame_size}")
+        padding_byte = self.get_image_padding_byte(image_info)
+        checksum = 0
+
+        start_time = datetime.now()
+
+        try:
+            img_length = os.path.getsize(image_path)
+        except OSError as e:
+            self.logger.error(f"Failed to get file size: {e}")
+            return ErrType.SYS_PARAMETER
+
+        aligned_img_length = divide_then_round_up(img_length, 4) * 4
+        if (prepared_image is not None) and (prepared_image.image_length == img_length):
+            checksum = prepared_image.get_checksum(aligned_img_length)
+        else:
+            prepared_image = None
+
+        addr = image_info.start_address
+        tx_sum = 0
+        with open(image_path, 'rb') as file_stream:
+            while tx_sum < aligned_img_length:
+                chunk_data = file_stream.read(frame_size)
+                if len(chunk_data) <= 0:
+                    # file shrank after its size was got
+                    self.logger.error(f"{image_info.image_name} read fail at offset {tx_sum}, file changed")
+                    return ErrType.SYS_IO
+                if (len(chunk_data) % 4) != 0:
+                    chunk_data += bytes([padding_byte]) * (4 - len(chunk_data) % 4)
+
+                need_sense = (tx_sum + len(chunk_data) >= aligned_img_length)
+                ret = self.floader_handler.write(image_info.memory_type, chunk_data, len(chunk_data), addr,
+                                                 self.setting.sync_response_timeout_in_second, need_sense=need_sense)
+                if ret != ErrType.OK:
+                    self.logger.debug(f"Write to addr={hex(addr)} size={len(chunk_data)} fail: {ret}")
+                    return ret
+
+                if prepared_image is None:
+                    checksum = (checksum + sum(struct.unpack(f'<{len(chunk_data) // 4}I', chunk_data))) & 0xFFFFFFFF
+
+                addr += len(chunk_data)
+                tx_sum += len(chunk_data)
+
+        ret, cal_checksum = self.floader_handler.checksum(image_info.memory_type, image_info.start_address,
+                                                          image_info.end_address, aligned_img_length,
+                                                          nor_checksum_timeout_in_second(aligned_img_length))
+        if ret == ErrType.OK and cal_checksum != checksum:
+            self.logger.debug(f"Checksum fail: expect {hex(checksum)} get {hex(cal_checksum)}")
+            ret = ErrType.SYS_CHECKSUM
+        if ret != ErrType.OK:
+            return ret
+
+        elapse_ms = max(1, round((datetime.now() - start_time).total_seconds() * 1000, 0))
+        self.logger.info(f"{image_info.image_name} download done: {aligned_img_length // 1024}KB / {elapse_ms}ms / "
+                         f"{aligned_img_length * 8 // elapse_ms}Kbps")
+
+        return ret
+
+    def is_layout_plan_applicable(self, download_list):
+        if self.setting.merge_adjacent_images == 0 or len(download_list) < 2:
+            return False
+        if self.device_info.is_boot_from_nand():
+            return False
+        for _, image_info in download_list:
+            if (image_info.memory_type != MemoryInfo.MEMORY_TYPE_NOR) or \
+                    self.profile_info.is_ram_address(image_info.start_address):
+                return False
+        return True
+
+    def _download_images_with_plan(self, download_list, image_preparer=None, need_erase=True, sense_packet_count=None):
+        ret = ErrType.OK
+        page_size = self.device_info.flash_page_size
+        if sense_packet_count is None:
+            sense_packet_count = self.setting.sense_packet_count
+        padding_char = FlashUtils.FlashWritePaddingData.value.to_bytes(1, byteorder="little")
+        memory_type = MemoryInfo.MEMORY_TYPE_NOR
+
+        start_time = datetime.now()
+
+        images = []
+        for img_path, image_info in download_list:
+            try:
+                img_length = os.path.getsize(img_path)
+            except OSError as e:
+                self.logger.error(f"Failed to get file size: {e}")
+                return ErrType.SYS_PARAMETER
+            images.append(PlannedImage(img_path, image_info, img_length, page_size))
+
+        try:
+            # flash is already erased by chip erase
+            plan = FlashLayoutPlanner(page_size).plan(images, need_erase=(need_erase and (not self.chip_erase)))
+        except ValueError as err:
+            self.logger.error(f"Flash layout plan fail: {err}")
+            return ErrType.SYS_PARAMETER
+
+        self.logger.info(f"Flash layout plan: {len(images)} images, {len(plan.regions)} regions, {len(plan.erase_list)} erases")
+
+        for erase_addr, erase_size in plan.erase_list:
+            ret = self.floader_handler.erase_flash(memory_type, erase_addr, erase_addr + erase_size, erase_size,
+                                                   nor_erase_timeout_in_second(divide_then_round_up(erase_size, 1024)),
+                                                   sense=True)
+            if ret != ErrType.OK:
+                self.logger.error(f"Erase {hex(erase_addr)} size={erase_size} fail: {ret}")
+                return ret
+
+        total_length = sum([image.aligned_length for image in images])
+        tx_sum = 0
+        progress_int = 0
+        write_timeout = FlashUtils.NorPageProgramTimeoutInSeconds.value * sense_packet_count
+
+        for region in plan.regions:
+            region_end_address = region[-1].data_end_address
+            write_pages = 0
+            for image in region:
+                self.logger.info(f"{image.image_info.image_name} download...")
+                prepared_image = image_preparer.get(image.image_path, FlashUtils.FlashWritePaddingData.value) \
+                    if image_preparer else None
+                if (prepared_image is not None) and (prepared_image.image_length == image.image_length):
+                    image.checksum = prepared_image.get_checksum(image.aligned_length)
+                else:
+                    prepared_image = None
+
+                addr = image.start_address
+                with open(image.image_path, 'rb') as file_stream:
+                    while addr < image.data_end_address:
+                        chunk_data = file_stream.read(page_size)
+                        if len(chunk_data) < page_size:
+                            chunk_data += padding_char * (page_size - len(chunk_data))
+
+                        write_pages += 1
+                        # images of a region are streamed back to back, sense only every SensePacketCount pages
+                        need_sense = ((write_pages % sense_packet_count) == 0) or \
+                                     (addr + page_size >= region_end_address)
+                        ret = self.floader_handler.write(memory_type, chunk_data, page_size, addr, write_timeout,
+                                                         need_sense=need_sense)
+                        if ret != ErrType.OK:
+                            self.logger.debug(f"Write to addr={hex(addr)} size={page_size} fail: {ret}")
+                            self.logger.info(f"{image.image_info.image_name} download fail: {ret}")
+                            return ret
+
+                        if prepared_image is None:
+                            image.checksum = (image.checksum + sum(struct.unpack(f'<{page_size // 4}I', chunk_data))) & 0xFFFFFFFF
+
+                        addr += page_size
+                        tx_sum += page_size
+
+                        progress = int((tx_sum / total_length) * 100)
+                        if int((progress) / 10) != progress_int:
+                            progress_int += 1
+                            self.logger.info(f"Programming progress: {progress}%")
+
+        for image in images:
+            ret, cal_checksum = self.floader_handler.checksum(memory_type, image.start_address,
+                                                              image.image_info.end_address, image.aligned_length,
+                                                              nor_checksum_timeout_in_second(image.aligned_length))
+            if ret == ErrType.OK and cal_checksum != image.checksum:
+                self.logger.debug(f"Checksum fail: expect {hex(image.checksum)} get {hex(cal_checksum)}")
+                ret = ErrType.SYS_CHECKSUM
+            if ret != ErrType.OK:
+                self.logger.info(f"{image.image_info.image_name} download fail: {ret}")
+                return ret
+            self.logger.info(f"{image.image_info.image_name} download done: {image.aligned_length // 1024}KB")
+
+        elapse_ms = max(1, round((datetime.now() - start_time).total_seconds() * 1000, 0))
+        kbps = total_length * 8 // elapse_ms
+        if self.is_usb:
+            self.logger.info(f"Images download done: {total_length // 1024}KB / {elapse_ms}ms / {kbps / 1000}Mbps")
+        else:
+            self.logger.info(f"Images download done: {total_length // 1024}KB / {elapse_ms}ms / {kbps}Kbps")
+
+        return ret
+
     def get_page_alligned_size(self, size, page_size):
         result = size
 
@@ -1033,7 +1516,7 @@ class Ameba(object):
 
         return result
 
-    def _download_image(self, image_path, image_info):
+    def _download_image(self, image_path, image_info, prepared_image=None):
         ret = ErrType.OK
 
         page_size = self.device_info.flash_page_size
@@ -1044,7 +1527,7 @@ class Ameba(object):
         checksum = 0
         write_timeout = 0
         is_ram = (image_info.memory_type == MemoryInfo.MEMORY_TYPE_RAM)
-        padding_byte_val = self.setting.ram_download_padding_byte if is_ram else FlashUtils.FlashWritePaddingData.value
+        padding_byte_val = self.get_image_padding_byte(image_info)
         padding_char = padding_byte_val.to_bytes(1, byteorder="little")
 
         start_time = datetime.now()
@@ -1057,14 +1540,33 @@ class Ameba(object):
 
         aligned_img_length = self.get_page_alligned_size(img_length, page_size)
 
+        # checksum already calculated on host side during device bring-up
+        if (prepared_image is not None) and (prepared_image.image_length != img_length):
+            self.logger.debug(f"Image changed after prepared, calculate checksum while downloading")
+            prepared_image = None
+        if prepared_image is not None:
+            checksum = prepared_image.get_checksum(aligned_img_length)
+
         self.logger.debug(
             f"Image download size={aligned_img_length}({img_length}), start_addr={hex(image_info.start_address)}, "
             f"end_addr={hex(image_info.end_address)}")
 
         addr = image_info.start_address
         tx_sum = 0
+        resume_state = self.get_resume_state(image_path, image_info, img_length)
+        confirmed_addr = addr
+        confirmed_tx_sum = 0
 
         with open(image_path, 'rb') as file_stream:
+            if resume_state is not None:
+                addr, tx_sum, resume_checksum = self.check_resume_state(resume_state, file_stream, aligned_img_length,
+                                                                        padding_char)
+                if prepared_image is None:
+                    checksum = resume_checksum
+                confirmed_addr = addr
+                confirmed_tx_sum = tx_sum
+                next_erase_addr = addr
+
             if ((image_info.memory_type == MemoryInfo.MEMORY_TYPE_NAND) or (
                     is_ram and (self.profile_info.memory_type == MemoryInfo.MEMORY_TYPE_NAND))):
 
@@ -1086,6 +1588,7 @@ class Ameba(object):
                     if ret == ErrType.DEV_NAND_BAD_BLOCK.value or ret == ErrType.DEV_NAND_WORN_BLOCK.value:
                         self.logger.info(
                             f"{'Bad' if ret == ErrType.DEV_NAND_BAD_BLOCK else 'Worn'} block: 0x{format(addr, '08X')}")
+                        self.stats.bad_blocks += 1
                         addr += self.device_info.flash_block_size()
                         next_erase_addr = addr
                         continue
@@ -1114,14 +1617,18 @@ class Ameba(object):
                             ret = self.floader_handler.write(image_info.memory_type, chunk_data,
                                                              page_size, addr, write_timeout, need_sense=need_sense)
                             if ret == ErrType.OK:
-                                # 新的极速计算方式 (利用 C 语言层加速)
-                                # '<' 代表小端模式，'I' 代表 unsigned int (4字节)
-                                # len(chunk_data)//4 计算出有多少个整数
-                                fmt = f'<{len(chunk_data) // 4}I'
-                                checksum = (checksum + sum(struct.unpack(fmt, chunk_data))) & 0xFFFFFFFF
+                                if prepared_image is None:
+                                    # 新的极速计算方式 (利用 C 语言层加速)
+                                    # '<' 代表小端模式，'I' 代表 unsigned int (4字节)
+                                    # len(chunk_data)//4 计算出有多少个整数
+                                    fmt = f'<{len(chunk_data) // 4}I'
+                                    checksum = (checksum + sum(struct.unpack(fmt, chunk_data))) & 0xFFFFFFFF
 
                                 addr += page_size
                                 tx_sum += page_size
+                                if need_sense:
+                                    confirmed_addr = addr
+                                    confirmed_tx_sum = tx_sum
                             else:
                                 self.logger.error(f"Write to addr={format(addr, '08x')}, size={page_size} fail: {ret}")
                                 break
@@ -1153,6 +1660,7 @@ class Ameba(object):
                         if ret == ErrType.DEV_NAND_BAD_BLOCK.value or ret == ErrType.DEV_NAND_WORN_BLOCK.value:
                             self.logger.debug(
                                 f"{'Bad' if ret == ErrType.DEV_NAND_BAD_BLOCK else 'Worn'} block: {hex(addr)}")
+                            self.stats.bad_blocks += 1
                             ret = ErrType.OK
                         elif ret != ErrType.OK:
                             self.logger.error(f"Fail to erase block {hex(addr)}:{ret}")
@@ -1168,7 +1676,7 @@ class Ameba(object):
                     else:
                         self.logger.warning(f"Image download uncompleted: {tx_sum}/{aligned_img_length}")
 
-                    elapse_ms = round((datetime.now() - start_time).total_seconds() * 1000, 0)
+                    elapse_ms = max(1, round((datetime.now() - start_time).total_seconds() * 1000, 0))
                     kbps = aligned_img_length * 8 // elapse_ms
                     size_kb = aligned_img_length // 1024
 
@@ -1244,11 +1752,15 @@ class Ameba(object):
                     # 计算 Checksum
                     # '<' 代表小端模式，'I' 代表 unsigned int (4字节)
                     # len(chunk_data)//4 计算出有多少个整数
-                    fmt = f'<{len(chunk_data) // 4}I'
-                    checksum = (checksum + sum(struct.unpack(fmt, chunk_data))) & 0xFFFFFFFF
+                    if prepared_image is None:
+                        fmt = f'<{len(chunk_data) // 4}I'
+                        checksum = (checksum + sum(struct.unpack(fmt, chunk_data))) & 0xFFFFFFFF
 
                     addr += page_size
                     tx_sum += page_size
+                    if need_sense:
+                        confirmed_addr = addr
+                        confirmed_tx_sum = tx_sum
 
                     progress = int((tx_sum / aligned_img_length) * 100)
                     if int((progress) / 10) != progress_int:
@@ -1281,7 +1793,7 @@ class Ameba(object):
                         else:
                             self.logger.debug(f"Image download done: {round(aligned_img_length / 1024 / 1024, 2)}MB")
 
-                        elapse_ms = round((datetime.now() - start_time).total_seconds() * 1000, 0)
+                        elapse_ms = max(1, round((datetime.now() - start_time).total_seconds() * 1000, 0))
                         kbps = aligned_img_length * 8 // elapse_ms
                         size_kb = aligned_img_length // 1024
 
@@ -1315,8 +1827,68 @@ class Ameba(object):
                     self.logger.debug(f"Checksum fail: expect {hex(checksum)} get {hex(cal_checksum)}")
                     ret = ErrType.SYS_CHECKSUM
 
+        if resume_state is not None:
+            if (ret == ErrType.OK) or (ret == ErrType.SYS_CHECKSUM) or (confirmed_tx_sum == 0):
+                resume_state.clear()
+            else:
+                resume_state.save(confirmed_addr, confirmed_tx_sum)
+                self.logger.info(f"Download progress saved, next download resumes from {hex(confirmed_addr)}")
+
         return ret
 
+    def get_resume_state(self, image_path, image_info, img_length):
+        # chip erase wipes the downloaded data of the previous download
+        if (self.setting.resume_download == 0) or self.chip_erase or \
+                (image_info.memory_type == MemoryInfo.MEMORY_TYPE_RAM):
+            return None
+
+        device_key = DeviceCache.get_key(self.device_info)
+        if device_key is None:
+            device_key = f"{self.serial_port_name}_{self.device_info.did:04x}"
+
+        return ResumeState(device_key, image_path, image_info, img_length)
+
+    def check_resume_state(self, resume_state, file_stream, aligned_img_length, padding_char):
+        start_address = resume_state.start_address
+
+        if not resume_state.load():
+            return start_address, 0, 0
+
+        offset = resume_state.offset
+        address = resume_state.address
+        if resume_state.memory_type != MemoryInfo.MEMORY_TYPE_NAND:
+            # resume from the start of the erase sector, NOR has no bad block so address follows offset
+            offset = offset // FlashUtils.NorDefaultBlockSize.value * FlashUtils.NorDefaultBlockSize.value
+            address = start_address + offset
+        if offset <= 0 or offset >= aligned_img_length:
+            return start_address, 0, 0
+
+        # verify the downloaded data before resume, the device may be reflashed by other means in between
+        prefix_checksum = 0
+        remaining = offset
+        while remaining > 0:
+            read_size = min(remaining, 1024 * 1024)
+            chunk_data = file_stream.read(read_size)
+            chunk_data += padding_char * (read_size - len(chunk_data))
+            prefix_checksum += sum(struct.unpack(f'<{len(chunk_data) // 4}I', chunk_data))
+            remaining -= len(chunk_data)
+        prefix_checksum &= 0xFFFFFFFF
+
+        if resume_state.memory_type == MemoryInfo.MEMORY_TYPE_NAND:
+            checksum_timeout = nand_checksum_timeout_in_second(offset, None)
+        else:
+            checksum_timeout = nor_checksum_timeout_in_second(offset)
+        ret, cal_checksum = self.floader_handler.checksum(resume_state.memory_type, start_address,
+                                                          resume_state.end_address, offset, checksum_timeout)
+        if ret != ErrType.OK or cal_checksum != prefix_checksum:
+            self.logger.info(f"Downloaded data mismatch, download from the beginning")
+            file_stream.seek(0)
+            return start_address, 0, 0
+
+        self.logger.info(f"Resume download from {hex(address)}, {offset // 1024}KB already downloaded")
+        return address, offset, prefix_checksum
+
+    @stats_phase("erase")
     def erase_flash(self):
         ret = ErrType.OK
 
@@ -1341,6 +1913,7 @@ class Ameba(object):
                 elif ret == ErrType.DEV_NAND_BAD_BLOCK:
                     self.logger.warning(
                         f"NAND erase address = {hex(addr)} size = {self.device_info.flash_block_size() / 1024}KB skipped: bad block")
+                    self.stats.bad_blocks += 1
                     ret = ErrType.OK
                 elif ret == ErrType.DEV_NAND_WORN_BLOCK:
                     self.logger.warning(
@@ -1445,6 +2018,8 @@ class Ameba(object):
         buf = bytes(buf_array)
         self.logger.info(f"Program eFuse to change supported flash size {'>' if (mode == SpicAddrMode.FOUR_BYTE_MODE.value) else '<='}16MB")
 
+        if self.device_cache:
+            self.device_cache.invalidate()
         ret = self.floader_handler.otp_write_logical_map(otp_spic_addr_mode_addr, 1, buf)
         if ret != ErrType.OK:
             self.logger.error(f"Fail to program eFuse[{otp_spic_addr_mode_addr}]: {ret}")
@@ -1465,6 +2040,51 @@ class Ameba(object):
             self.logger.error(f"Fail to program eFuse")
             return ErrType.SYS_CHECKSUM
 
+    @stats_phase("otp")
+    def program_otp_map(self, otp_map):
+        if otp_map.max_offset() >= self.profile_info.logical_efuse_len:
+            self.logger.error(f"OTP offset {hex(otp_map.max_offset())} out of logical map size {self.profile_info.logical_efuse_len}")
+            return ErrType.SYS_OVERRANGE
+
+        # the cached board data is derived from OTP, query it again after any OTP program attempt
+        if self.device_cache:
+            self.device_cache.invalidate()
+
+        ret, buf = self.floader_handler.otp_read_logical_map(0, self.profile_info.logical_efuse_len)
+        if ret != ErrType.OK:
+            self.logger.error(f"Fail to read eFuse: {ret}")
+            return ret
+
+        ranges = otp_map.diff(buf)
+        if not ranges:
+            self.logger.info(f"eFuse already programmed, no need to change")
+            return ErrType.OK
+
+        # only the changed ranges are programmed, each in one request
+        target_map = otp_map.apply(buf)
+        for offset, length in ranges:
+            self.logger.info(f"Program eFuse[{hex(offset)}:{hex(offset + length)}]: {target_map[offset:offset + length].hex()}")
+            ret = self.floader_handler.otp_write_logical_map(offset, length, target_map)
+            if ret != ErrType.OK:
+                self.logger.error(f"Fail to program eFuse[{hex(offset)}]: {ret}")
+                return ret
+        time.sleep(0.01)
+
+        ret, buf = self.floader_handler.otp_read_logical_map(0, self.profile_info.logical_efuse_len)
+        if ret != ErrType.OK:
+            self.logger.error(f"Fail to read eFuse: {ret}")
+            return ret
+
+        mismatch = otp_map.mismatch(buf)
+        if mismatch:
+            for offset in mismatch:
+                self.logger.error(f"Fail to verify eFuse[{hex(offset)}]: expect {format(otp_map.values[offset], '02x')}, get {format(buf[offset], '02x')}")
+            self.logger.error(f"Fail to program eFuse")
+            return ErrType.SYS_CHECKSUM
+
+        self.logger.info(f"Program eFuse done: {len(ranges)} range(s)")
+        return ErrType.OK
+
     def get_spic_address_mode(self):
         ret = ErrType.OK
         is_amebad = self.profile_info.is_amebad()
@@ -1476,6 +2096,11 @@ class Ameba(object):
         if self.device_info.is_boot_from_nand():
             return ret, mode
 
+        cached_mode = self.device_cache.get(DeviceCache.SPIC_ADDR_MODE) if self.device_cache else None
+        if cached_mode is not None:
+            self.logger.info(f"Current supported flash size {'>' if (cached_mode == SpicAddrMode.FOUR_BYTE_MODE.value) else '<='}16MB (cached)")
+            return ret, cached_mode
+
         ret, buf = self.floader_handler.otp_read_logical_map(0, self.profile_info.logical_efuse_len)
         if ret != ErrType.OK:
             self.logger.error(f"Fail to read eFuse: {ret}")
@@ -1491,17 +2116,21 @@ class Ameba(object):
         else:
             self.logger.info(f"Current supported flash size <=16MB as default")
 
+        if self.device_cache:
+            self.device_cache.set(DeviceCache.SPIC_ADDR_MODE, mode)
+
         return ret, mode
 
-    def check_supported_flash_size(self):
+    def check_supported_flash_size(self, need_prepare=True):
         ret = ErrType.OK
         reset_system = False
 
         self.logger.info(f"Check supported flash size...")
-        ret = self.prepare(show_device_info=False)
-        if ret != ErrType.OK:
-            self.logger.error("Prepare for check supported flash size fail")
-            return ret, reset_system
+        if need_prepare:
+            ret = self.prepare(show_device_info=False)
+            if ret != ErrType.OK:
+                self.logger.error("Prepare for check supported flash size fail")
+                return ret, reset_system
 
         ret, mode = self.get_spic_address_mode()
         if ret != ErrType.OK:
@@ -1529,7 +2158,10 @@ class Ameba(object):
                 boot_delay = self.setting.usb_rom_boot_delay_in_second if self.profile_info.support_usb_download else self.setting.rom_boot_delay_in_second
                 # reset floader with next option
                 self.floader_handler.next_operation(NextOpType.REBURN, 0)
-                self.logger.info(f"Reburn delay {boot_delay}s")
-                time.sleep(boot_delay)
+                if not self.is_active_ready_detection():
+                    self.logger.info(f"Reburn delay {boot_delay}s")
+                    time.sleep(boot_delay)
+                elif self.is_usb:
+                    self.wait_port_reenumerated(boot_delay)
 
         return ret, reset_system
@@ -39,3 +39,8 @@ class ErrType(enum.Enum):
     SYS_CANCEL = _SYS_ERR_BASE + 0x30  # Operation cancelled
     SYS_UNKNOWN = _SYS_ERR_BASE + 0xEE  # Unknown error
 
+
+class FlashError(Exception):
+    def __init__(self, message, err=ErrType.SYS_UNKNOWN):
+        super().__init__(message)
+        self.err = err
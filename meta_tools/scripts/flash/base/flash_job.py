@@ -0,0 +1,255 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import json
+
+from .image_info import *
+from .memory_info import *
+from .otp_map import *
+
+
+class FlashOperation(object):
+    DOWNLOAD = "download"
+    ERASE = "erase"
+    CHIP_ERASE = "chip_erase"
+    READ_WIFIMAC = "read_wifimac"
+    OTP = "otp"
+    ALL_OPERATIONS = [DOWNLOAD, ERASE, CHIP_ERASE, READ_WIFIMAC, OTP]
+
+    def __init__(self, **kwargs):
+        self.operation = str(kwargs.get("Operation", "")).strip().lower().replace("-", "_")
+        self.image = kwargs.get("Image", None)
+        self.image_dir = kwargs.get("ImageDir", None)
+        self.partition_table = kwargs.get("PartitionTable", None)
+        self.start_address = kwargs.get("StartAddress", None)
+        self.end_address = kwargs.get("EndAddress", None)
+        self.size_in_kbyte = kwargs.get("Size", None)
+        self.memory_type = kwargs.get("MemoryType", "nor")
+        self.otp_map = kwargs.get("OtpMap", None)
+        self.otp_csv = kwargs.get("OtpCsv", None)
+        self.otp_default_map = kwargs.get("OtpDefaultMap", False)
+        self.golden_image = kwargs.get("GoldenImage", False)
+        self.ram_boot = kwargs.get("RamBoot", False)
+        self.entry_address = kwargs.get("EntryAddress", None)
+
+    def __repr__(self):
+        return f"FlashOperation({self.to_dict()})"
+
+    def to_dict(self):
+        return {
+            "Operation": self.operation,
+            "Image": self.image,
+            "ImageDir": self.image_dir,
+            "PartitionTable": self.partition_table,
+            "StartAddress": self.start_address,
+            "EndAddress": self.end_address,
+            "Size": self.size_in_kbyte,
+            "MemoryType": self.memory_type,
+            "OtpMap": self.otp_map,
+            "OtpCsv": self.otp_csv,
+            "OtpDefaultMap": self.otp_default_map,
+            "GoldenImage": self.golden_image,
+            "RamBoot": self.ram_boot,
+            "EntryAddress": self.entry_address
+        }
+
+    @staticmethod
+    def _parse_address(address, name):
+        if isinstance(address, int):
+            return address
+        try:
+            return int(str(address), 16)
+        except Exception as err:
+            raise ValueError(f"{name} is invalid: {err}")
+
+    def get_memory_type(self):
+        mem_t = str(self.memory_type).lower()
+        if mem_t == "nand":
+            return MemoryInfo.MEMORY_TYPE_NAND
+        elif mem_t == "ram":
+            return MemoryInfo.MEMORY_TYPE_RAM
+        elif mem_t == "nor":
+            return MemoryInfo.MEMORY_TYPE_NOR
+        else:
+            raise ValueError(f"Invalid memory type: {self.memory_type}")
+
+    def resolve_paths(self, root_dir):
+        if self.image is not None and not os.path.isabs(self.image):
+            self.image = os.path.join(root_dir, self.image)
+        if self.image_dir is not None and not os.path.isabs(self.image_dir):
+            self.image_dir = os.path.join(root_dir, self.image_dir)
+        if self.otp_map is not None and not os.path.isabs(self.otp_map):
+            self.otp_map = os.path.join(root_dir, self.otp_map)
+        if self.otp_csv is not None and not os.path.isabs(self.otp_csv):
+            self.otp_csv = os.path.join(root_dir, self.otp_csv)
+        if self.partition_table is not None:
+            for img_info in self.partition_table:
+                image_name = img_info.get("ImageName", "")
+                if image_name and not os.path.isabs(image_name):
+                    img_info["ImageName"] = os.path.join(root_dir, image_name)
+
+    def get_images_info(self):
+        memory_type = self.get_memory_type()
+
+        if self.image is not None:
+            if not os.path.exists(self.image):
+                raise ValueError(f"Image {self.image} does not exist")
+            if self.start_address is None:
+                raise ValueError(f"Start address is required for single image download")
+
+            download_img_info = ImageInfo()
+            download_img_info.image_name = self.image
+            download_img_info.description = os.path.basename(self.image)
+            download_img_info.start_address = self._parse_address(self.start_address, "Start address")
+            if memory_type == MemoryInfo.MEMORY_TYPE_NAND:
+                if self.end_address is None:
+                    raise ValueError(f"End address is required for nand flash download")
+                download_img_info.end_address = self._parse_address(self.end_address, "End address")
+            else:
+                download_img_info.end_address = download_img_info.start_address + os.path.getsize(self.image)
+            download_img_info.memory_type = memory_type
+            download_img_info.mandatory = True
+            return [download_img_info]
+        elif self.partition_table is not None:
+            images_info = []
+            for img_info in self.partition_table:
+                img_json = ImageInfo(**img_info)
+                img_json.description = os.path.basename(img_json.image_name)
+                images_info.append(img_json)
+            return images_info
+        elif self.image_dir is not None:
+            if not os.path.exists(self.image_dir):
+                raise ValueError(f"Image directory {self.image_dir} does not exist")
+            return None
+        else:
+            raise ValueError(f"No Image, ImageDir or PartitionTable specified for download")
+
+    def get_memory_info(self):
+        memory_info = MemoryInfo()
+        memory_info.memory_type = self.get_memory_type()
+
+        if self.start_address is None:
+            raise ValueError(f"Start address is required for erase flash")
+        memory_info.start_address = self._parse_address(self.start_address, "Start address")
+
+        if memory_info.memory_type == MemoryInfo.MEMORY_TYPE_NAND:
+            if self.end_address is None:
+                raise ValueError(f"End address is required for nand flash erase")
+        elif self.size_in_kbyte is None:
+            raise ValueError(f"Erase size is required")
+
+        memory_info.size_in_kbyte = self.size_in_kbyte
+        if self.end_address is not None:
+            memory_info.end_address = self._parse_address(self.end_address, "End address")
+        else:
+            memory_info.end_address = memory_info.start_address + self.size_in_kbyte
+
+        return memory_info
+
+    def get_entry_address(self):
+        if self.entry_address is None:
+            return None
+        return self._parse_address(self.entry_address, "Entry address")
+
+    def get_otp_map(self, profile_info, port):
+        return OtpMap.create(profile_info, port, self.otp_map, self.otp_csv, self.otp_default_map)
+
+    def validate(self):
+        if self.operation not in FlashOperation.ALL_OPERATIONS:
+            raise ValueError(f"Invalid operation '{self.operation}', should be one of {FlashOperation.ALL_OPERATIONS}")
+
+        if self.operation == FlashOperation.DOWNLOAD:
+            self.get_images_info()
+            if self.ram_boot and self.get_memory_type() != MemoryInfo.MEMORY_TYPE_RAM:
+                raise ValueError(f"RamBoot is only valid for ram download")
+            self.get_entry_address()
+        elif self.operation == FlashOperation.ERASE:
+            self.get_memory_info()
+        elif self.operation == FlashOperation.OTP:
+            if not (self.otp_map or self.otp_csv or self.otp_default_map):
+                raise ValueError(f"No OtpMap, OtpCsv or OtpDefaultMap specified for otp")
+            for file_path in [self.otp_map, self.otp_csv]:
+                if file_path is not None and not os.path.exists(file_path):
+                    raise ValueError(f"OTP file {file_path} does not exist")
+            # parse the files before the port is opened, the rows of all ports in csv are checked
+            OtpMap.create(None, None, self.otp_map, self.otp_csv)
+        else:
+            self.get_memory_type()
+
+
+class FlashJob(object):
+    """
+    Job file for batch mode, an ordered list of operations executed for each device within one session, e.g.
+
+    {
+      "Ports": ["COM3", "COM4"],
+      "Operations": [
+        {"Operation": "chip_erase"},
+        {"Operation": "download", "ImageDir": "images"},
+        {"Operation": "otp", "OtpCsv": "otp.csv"},
+        {"Operation": "read_wifimac"}
+      ],
+      "Devices": {
+        "COM5": [{"Operation": "download", "Image": "image_all.bin", "StartAddress": "0x08000000"}]
+      }
+    }
+
+    "Operations" apply to the ports in "Ports" and the ports specified by --port, "Devices" specifies the operations
+    for a dedicated port. Relative paths are relative to the job file.
+    """
+
+    def __init__(self, **kwargs):
+        self.ports = kwargs.get("Ports", [])
+        self.operations = [FlashOperation(**op) for op in kwargs.get("Operations", [])]
+        self.devices = {}
+        for port, operations in kwargs.get("Devices", {}).items():
+            self.devices[port] = [FlashOperation(**op) for op in operations]
+
+    @staticmethod
+    def load_from_file(file_path):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            f_content = f.read()
+
+        if file_path.lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError(f"PyYAML is required for YAML job file, please use JSON instead")
+            job_dict = yaml.safe_load(f_content)
+        else:
+            job_dict = json.loads(f_content)
+
+        if isinstance(job_dict, list):
+            job_dict = {"Operations": job_dict}
+
+        job = FlashJob(**job_dict)
+
+        root_dir = os.path.dirname(os.path.abspath(file_path))
+        for operations in [job.operations] + list(job.devices.values()):
+            for op in operations:
+                op.resolve_paths(root_dir)
+                op.validate()
+
+        return job
+
+    def get_device_operations(self, serial_ports):
+        device_operations = {}
+        ports = list(serial_ports) if serial_ports else []
+        for port in self.ports:
+            if port not in ports:
+                ports.append(port)
+
+        if self.operations:
+            for port in ports:
+                device_operations[port] = self.operations
+        device_operations.update(self.devices)
+
+        return device_operations
+
+    @staticmethod
+    def need_download(operations):
+        return any(op.operation == FlashOperation.DOWNLOAD for op in operations)
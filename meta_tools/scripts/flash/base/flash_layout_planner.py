@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+from .flash_utils import *
+
+_NOR_ERASE_SIZES = [64 * FlashUtils.NorDefaultPageSize.value,
+                    32 * FlashUtils.NorDefaultPageSize.value,
+                    4 * FlashUtils.NorDefaultPageSize.value]
+
+
+class PlannedImage(object):
+    def __init__(self, image_path, image_info, image_length, page_size):
+        self.image_path = image_path
+        self.image_info = image_info
+        self.image_length = image_length
+        self.aligned_length = divide_then_round_up(image_length, page_size) * page_size
+        self.start_address = image_info.start_address
+        self.data_end_address = self.start_address + self.aligned_length
+        self.checksum = 0
+
+
+class FlashLayoutPlan(object):
+    def __init__(self):
+        # (address, size) of NOR erase operations, in address order
+        self.erase_list = []
+        # lists of images to be written back to back, each list is one contiguous address range
+        self.regions = []
+
+
+class FlashLayoutPlanner(object):
+    """
+    Plan a NOR download of several images as a whole: one erase plan for all the images with the largest erase
+    operations possible across image boundaries, and adjacent images merged into contiguous write regions.
+    """
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+        self.sector_size = _NOR_ERASE_SIZES[-1]
+
+    def _align_up(self, address):
+        return divide_then_round_up(address, self.sector_size) * self.sector_size
+
+    def _get_erase_range(self, image):
+        if (image.start_address % self.sector_size) != 0:
+            raise ValueError(f"Flash erase address align error: addr {hex(image.start_address)} not aligned to "
+                             f"sector size {hex(self.sector_size)}")
+        end_address = self._align_up(image.data_end_address)
+        if image.image_info.full_erase:
+            end_address = max(end_address, self._align_up(image.image_info.end_address))
+        return [image.start_address, end_address]
+
+    def _split_erase_range(self, start_address, end_address):
+        erase_list = []
+        address = start_address
+        while address < end_address:
+            for erase_size in _NOR_ERASE_SIZES:
+                if (address % erase_size) == 0 and (end_address - address) >= erase_size:
+                    erase_list.append((address, erase_size))
+                    address += erase_size
+                    break
+        return erase_list
+
+    def plan(self, images, need_erase=True):
+        plan = FlashLayoutPlan()
+        images = sorted(images, key=lambda image: image.start_address)
+
+        for prev_image, image in zip(images, images[1:]):
+            if image.start_address < prev_image.data_end_address:
+                raise ValueError(f"Image {image.image_info.image_name} overlaps {prev_image.image_info.image_name}")
+
+        for image in images:
+            if plan.regions and plan.regions[-1][-1].data_end_address == image.start_address:
+                plan.regions[-1].append(image)
+            else:
+                plan.regions.append([image])
+
+        if need_erase:
+            erase_ranges = []
+            for image in images:
+                erase_range = self._get_erase_range(image)
+                if erase_ranges and erase_ranges[-1][1] >= erase_range[0]:
+                    erase_ranges[-1][1] = max(erase_ranges[-1][1], erase_range[1])
+                else:
+                    erase_ranges.append(erase_range)
+            for start_address, end_address in erase_ranges:
+                plan.erase_list.extend(self._split_erase_range(start_address, end_address))
+
+        return plan
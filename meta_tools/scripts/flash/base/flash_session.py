@@ -0,0 +1,371 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import time
+
+from .download_handler import *
+from .flash_job import *
+from .rtk_logging import *
+
+_DEFAULT_REMOTE_PORT = 58916
+_SETTING_FILE = "Settings.json"
+
+
+def download_process(ameba, logger, create_ameba, is_prepared=False, image_preparer=None):
+    if not ameba.check_protocol_for_download():
+        return ErrType.SYS_PROTO, ameba
+
+    if image_preparer is None:
+        # read and checksum images on host side while the device is being brought up
+        image_preparer = ImagePreparer(logger)
+        image_preparer.start(ameba.get_download_image_list())
+
+    if ameba.memory_type == MemoryInfo.MEMORY_TYPE_NOR:
+        ret, is_reburn = ameba.check_supported_flash_size(need_prepare=(not is_prepared))
+        if ret != ErrType.OK:
+            logger.error(f"Check supported flash size fail")
+            return ret, ameba
+
+        if is_reburn:
+            ameba.clean_up()
+            ameba = create_ameba()
+
+            logger.info(f"Re-prepare for reburn...")
+            ret = ameba.prepare()
+            if ret != ErrType.OK:
+                logger.error("Download prepare fail")
+                return ret, ameba
+        elif not is_prepared:
+            ret = ameba.show_device_info()
+            if ret != ErrType.OK:
+                return ret, ameba
+    elif not is_prepared:
+        logger.info(f"Prepare for download...")
+        ret = ameba.prepare()
+        if ret != ErrType.OK:
+            logger.error("Download prepare fail")
+            return ret, ameba
+
+    ret = ameba.verify_images()
+    if ret != ErrType.OK:
+        return ret, ameba
+
+    if not ameba.is_all_ram:
+        ret = ameba.post_verify_images()
+        if ret != ErrType.OK:
+            return ret, ameba
+
+    if not ameba.is_all_ram:
+        flash_status = FlashBPS()
+        ret = ameba.check_and_process_flash_lock(flash_status)
+        if ret != ErrType.OK:
+            logger.error("Download image fail")
+            return ret, ameba
+
+    logger.info(f"Image download start...")  # customized, do not modify
+    if ameba.ram_boot:
+        ret = ameba.download_ram_and_run(image_preparer)
+    elif ameba.golden_image:
+        ret = ameba.download_golden_image(image_preparer)
+    else:
+        ret = ameba.download_images(image_preparer)
+    if ret != ErrType.OK:
+        logger.error("Download image fail")
+        return ret, ameba
+
+    if (not ameba.is_all_ram) and flash_status.need_unlock:
+        logger.info("Restore the flash block protection...")
+        ret = ameba.lock_flash(flash_status.protection)
+        if ret != ErrType.OK:
+            logger.error(f"Fail to restore the flash block protection")
+            return ret, ameba
+
+    return ret, ameba
+
+
+def read_wifimac_process(ameba, logger, is_prepared=False):
+    ret = ErrType.OK
+
+    if not is_prepared:
+        ret = ameba.prepare(show_device_info=False)
+        if ret != ErrType.OK:
+            logger.error("Prepare for read wifi-mac fail")
+            return ret
+
+    logger.info(f'WiFiMAC: {ameba.device_info.get_wifi_mac_text()}')
+
+    return ret
+
+
+def otp_process(ameba, logger, otp_map, is_prepared=False):
+    ret = ErrType.OK
+
+    if not is_prepared:
+        ret = ameba.prepare()
+        if ret != ErrType.OK:
+            logger.error("Prepare for OTP program fail")
+            return ret
+
+    if len(otp_map) == 0:
+        logger.warning(f"No OTP data for {ameba.serial_port_name}")
+        return ret
+
+    ret = ameba.program_otp_map(otp_map)
+    if ret != ErrType.OK:
+        logger.error("OTP program fail")
+
+    return ret
+
+
+def erase_process(ameba, logger, is_prepared=False):
+    ret = ErrType.OK
+
+    if not is_prepared:
+        ret = ameba.prepare()
+        if ret != ErrType.OK:
+            logger.error("Erase prepare fail")
+            return ret
+
+    if ameba.chip_erase:
+        ret = ameba.erase_flash_chip()
+        if ret != ErrType.OK:
+            logger.error("Chip erase fail")
+        return ret
+
+    ret = ameba.validate_config_for_erase()
+    if ret != ErrType.OK:
+        return ret
+
+    ret = ameba.post_validate_config_for_erase()
+    if ret != ErrType.OK:
+        return ret
+
+    if (not ameba.profile_info.is_ram_address(ameba.erase_info.start_address)):
+        flash_status = FlashBPS()
+        ret = ameba.check_and_process_flash_lock(flash_status)
+        if ret != ErrType.OK:
+            logger.error("Erase fail")
+            return ret
+
+    ret = ameba.erase_flash()
+    if ret != ErrType.OK:
+        logger.error(f"Erase {ameba.memory_type} failed")
+        return ret
+
+    if (not ameba.profile_info.is_ram_address(ameba.erase_info.start_address)) and flash_status.need_unlock:
+        logger.info("Restore the flash block protection...")
+        ret = ameba.lock_flash(flash_status.protection)
+        if ret != ErrType.OK:
+            logger.error(f"Fail to restore the flash block protection")
+
+    return ret
+
+
+def configure_job_operation(ameba, op):
+    ameba.memory_type = op.get_memory_type()
+    ameba.image_path = op.image_dir
+    ameba.download_img_info = op.get_images_info() if op.operation == FlashOperation.DOWNLOAD else None
+    ameba.erase_info = op.get_memory_info() if op.operation == FlashOperation.ERASE else None
+    ameba.chip_erase = (op.operation == FlashOperation.CHIP_ERASE)
+    ameba.golden_image = op.golden_image
+    ameba.ram_boot = op.ram_boot
+    ameba.entry_address = op.get_entry_address()
+    ameba.is_all_ram = True
+
+
+class FlashResult(object):
+    def __init__(self, operation, port, elapsed_ms, device_info=None, wifi_mac=None):
+        self.operation = operation
+        self.port = port
+        self.elapsed_ms = elapsed_ms
+        self.device_info = device_info
+        self.wifi_mac = wifi_mac
+
+    def __repr__(self):
+        return f"FlashResult({self.to_dict()})"
+
+    def to_dict(self):
+        return {
+            "Operation": self.operation,
+            "Port": self.port,
+            "ElapsedInMillisecond": self.elapsed_ms,
+            "WiFiMAC": self.wifi_mac
+        }
+
+
+class FlashSession(object):
+    """
+    In-process flash API, the device is brought up once when the session opens and all operations run in the same
+    flashloader session. Operations return FlashResult and raise FlashError on failure, e.g.
+
+        with FlashSession("AmebaDplus_FreeRTOS_NOR.rdev", "COM3", 1500000) as session:
+            session.download(image_dir="images")
+            mac = session.read_wifi_mac().wifi_mac
+            session.post_process()
+
+    Sessions on different ports can run concurrently in threads.
+    """
+
+    def __init__(self, profile, port, baudrate, settings=None, logger=None, log_level="INFO", log_file=None,
+                 remote_server=None, remote_port=_DEFAULT_REMOTE_PORT, remote_password=None):
+        self.port = port
+        self.baudrate = baudrate
+        self.logger = logger if logger is not None else create_logger(port, log_level=log_level, file=log_file)
+        self.profile_info = self._load_profile(profile)
+        self.settings = self._load_settings(settings)
+        self.remote_server = remote_server
+        self.remote_port = remote_port
+        self.remote_password = remote_password
+        self.ameba = None
+        self.device_info = None
+        self.stats = FlashStats(port, baudrate, None)
+        self._op = None
+
+    @staticmethod
+    def _load_profile(profile):
+        if isinstance(profile, RtkDeviceProfile):
+            return profile
+
+        try:
+            profile_json = JsonUtils.load_from_file(profile)
+        except Exception as err:
+            raise FlashError(f"Load device profile {profile} exception: {err}", ErrType.SYS_PARAMETER) from err
+        if profile_json is None:
+            raise FlashError(f"Fail to load device profile {profile}", ErrType.SYS_PARAMETER)
+        profile_info = RtkDeviceProfile(**profile_json)
+        if profile_info.device_id == 0:
+            raise FlashError(f"Invalid device profile {profile}", ErrType.SYS_PARAMETER)
+
+        return profile_info
+
+    @staticmethod
+    def _load_settings(settings):
+        if isinstance(settings, RtSettings):
+            return settings
+        if isinstance(settings, dict):
+            return RtSettings(**settings)
+        if settings is not None:
+            # path of a settings file
+            try:
+                settings_json = JsonUtils.load_from_file(settings, need_decrypt=False)
+            except Exception as err:
+                raise FlashError(f"Load settings {settings} exception: {err}", ErrType.SYS_PARAMETER) from err
+            if settings_json is None:
+                raise FlashError(f"Fail to load settings {settings}", ErrType.SYS_PARAMETER)
+            return RtSettings(**settings_json)
+
+        # Settings.json of the tool, never written by the session
+        setting_path = os.path.realpath(os.path.join(RtkUtils.get_executable_root_path(), _SETTING_FILE))
+        if os.path.exists(setting_path):
+            return RtSettings(**JsonUtils.load_from_file(setting_path, need_decrypt=False))
+        return RtSettings(**{})
+
+    def _create_ameba(self):
+        ameba = Ameba(self.profile_info, self.port, self.baudrate, None, self.settings, self.logger,
+                      stats=self.stats,
+                      remote_server=self.remote_server,
+                      remote_port=self.remote_port,
+                      remote_password=self.remote_password)
+        if self._op is not None:
+            configure_job_operation(ameba, self._op)
+        return ameba
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def open(self):
+        if self.ameba is not None:
+            return
+
+        self.ameba = self._create_ameba()
+        ret = self.ameba.prepare()
+        if ret != ErrType.OK:
+            self.close()
+            raise FlashError(f"Prepare fail: {ret}", ret)
+
+    def close(self):
+        if self.ameba is not None:
+            if self.ameba.device_info is not None:
+                self.device_info = self.ameba.device_info
+            self.ameba.clean_up()
+            self.ameba = None
+
+    def run(self, op):
+        try:
+            op.validate()
+        except ValueError as err:
+            raise FlashError(str(err), ErrType.SYS_PARAMETER) from err
+
+        start_time = time.monotonic()
+        self._op = op
+        try:
+            image_preparer = None
+            otp_map = None
+            if op.operation == FlashOperation.OTP:
+                try:
+                    otp_map = op.get_otp_map(self.profile_info, self.port)
+                except Exception as err:
+                    raise FlashError(f"Load OTP map fail: {err}", ErrType.SYS_PARAMETER) from err
+            elif op.operation == FlashOperation.DOWNLOAD:
+                # read and checksum images on host side before the port is opened and the device is brought up
+                image_preparer = ImagePreparer(self.logger)
+                image_preparer.start(Ameba.list_download_images(self.profile_info, self.settings, op.image_dir,
+                                                                op.get_images_info(), self.logger))
+            self.open()
+            configure_job_operation(self.ameba, op)
+            if op.operation == FlashOperation.DOWNLOAD:
+                ret, self.ameba = download_process(self.ameba, self.logger, self._create_ameba, is_prepared=True,
+                                                   image_preparer=image_preparer)
+            elif op.operation == FlashOperation.READ_WIFIMAC:
+                ret = read_wifimac_process(self.ameba, self.logger, is_prepared=True)
+            elif op.operation == FlashOperation.OTP:
+                ret = otp_process(self.ameba, self.logger, otp_map, is_prepared=True)
+            else:
+                ret = erase_process(self.ameba, self.logger, is_prepared=True)
+        finally:
+            self._op = None
+
+        if ret != ErrType.OK:
+            raise FlashError(f"{op.operation} fail: {ret}", ret)
+
+        device_info = self.ameba.device_info
+        wifi_mac = device_info.get_wifi_mac_text() if (device_info is not None and device_info.wifi_mac) else None
+        return FlashResult(op.operation, self.port, round((time.monotonic() - start_time) * 1000), device_info,
+                           wifi_mac)
+
+    def download(self, image=None, start_address=None, end_address=None, image_dir=None, partition_table=None,
+                 memory_type="nor", golden_image=False, ram_boot=False, entry_address=None):
+        return self.run(FlashOperation(Operation=FlashOperation.DOWNLOAD, Image=image, StartAddress=start_address,
+                                       EndAddress=end_address, ImageDir=image_dir, PartitionTable=partition_table,
+                                       MemoryType=memory_type, GoldenImage=golden_image, RamBoot=ram_boot,
+                                       EntryAddress=entry_address))
+
+    def erase(self, start_address, size_in_kbyte=None, end_address=None, memory_type="nor"):
+        return self.run(FlashOperation(Operation=FlashOperation.ERASE, StartAddress=start_address,
+                                       Size=size_in_kbyte, EndAddress=end_address, MemoryType=memory_type))
+
+    def chip_erase(self):
+        return self.run(FlashOperation(Operation=FlashOperation.CHIP_ERASE))
+
+    def read_wifi_mac(self):
+        return self.run(FlashOperation(Operation=FlashOperation.READ_WIFIMAC))
+
+    def program_otp(self, otp_map=None, otp_csv=None, default_map=False):
+        return self.run(FlashOperation(Operation=FlashOperation.OTP, OtpMap=otp_map, OtpCsv=otp_csv,
+                                       OtpDefaultMap=default_map))
+
+    def post_process(self):
+        # reset or reburn the device according to PostProcess of settings
+        self.open()
+        ret = self.ameba.post_process()
+        if ret != ErrType.OK:
+            raise FlashError(f"Post process fail: {ret}", ret)
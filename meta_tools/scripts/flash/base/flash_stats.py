@@ -0,0 +1,223 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+import functools
+import json
+import math
+import time
+from contextlib import contextmanager
+
+_DB_TIMEOUT_IN_SECOND = 30
+# a port is flagged when its latest sessions are clearly worse than its own history
+_RECENT_SESSION_COUNT = 5
+_MIN_HISTORY_SESSION_COUNT = 5
+_DEGRADED_THROUGHPUT_RATIO = 0.8
+_DEGRADED_RETRY_RATIO = 2
+_DEGRADED_FAIL_COUNT = 2
+
+_CREATE_TABLE = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    start_time REAL NOT NULL,
+    port TEXT NOT NULL,
+    baudrate INTEGER,
+    operation TEXT,
+    device_id INTEGER,
+    flash_mid INTEGER,
+    flash_did INTEGER,
+    wifi_mac TEXT,
+    tx_bytes INTEGER,
+    elapsed_ms INTEGER,
+    download_ms INTEGER,
+    phases TEXT,
+    retries INTEGER,
+    bad_blocks INTEGER,
+    outcome TEXT
+)'''
+
+_CREATE_INDEX = 'CREATE INDEX IF NOT EXISTS sessions_port ON sessions (port, start_time)'
+
+
+class FlashStats(object):
+    """
+    Counters and phase timings of one flash session, shared by the Ameba instances of the session (e.g. re-created
+    for reburn), and saved as one record to the statistics database when the session ends.
+    """
+
+    def __init__(self, port, baudrate, operation):
+        self.port = port
+        self.baudrate = baudrate
+        self.operation = operation
+        self.start_time = time.time()
+        self.start_counter = time.monotonic()
+        self.phases = {}
+        self.tx_bytes = 0
+        self.retries = 0
+        self.bad_blocks = 0
+        self._phase_stack = []
+
+    @contextmanager
+    def phase(self, name):
+        # phases are exclusive, time of a nested phase (e.g. chip erase in download) is not counted in the outer one
+        frame = [time.monotonic(), 0]
+        self._phase_stack.append(frame)
+        try:
+            yield
+        finally:
+            self._phase_stack.pop()
+            elapsed_ms = round((time.monotonic() - frame[0]) * 1000)
+            self.phases[name] = self.phases.get(name, 0) + elapsed_ms - frame[1]
+            if self._phase_stack:
+                self._phase_stack[-1][1] += elapsed_ms
+
+    def get_record(self, device_info, outcome):
+        wifi_mac = None
+        if device_info is not None and device_info.wifi_mac:
+            wifi_mac = device_info.get_wifi_mac_text()
+
+        return {
+            "start_time": self.start_time,
+            "port": self.port,
+            "baudrate": self.baudrate,
+            "operation": self.operation,
+            "device_id": device_info.did if device_info is not None else None,
+            "flash_mid": device_info.flash_mid if device_info is not None else None,
+            "flash_did": device_info.flash_did if device_info is not None else None,
+            "wifi_mac": wifi_mac,
+            "tx_bytes": self.tx_bytes,
+            "elapsed_ms": round((time.monotonic() - self.start_counter) * 1000),
+            "download_ms": self.phases.get("download", 0),
+            "phases": json.dumps(self.phases),
+            "retries": self.retries,
+            "bad_blocks": self.bad_blocks,
+            "outcome": outcome
+        }
+
+
+def stats_phase(name):
+    # time a method of an object with a FlashStats "stats" attribute as the given phase
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.stats.phase(name):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _percentile(sorted_values, percent):
+    # nearest-rank percentile
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def _median(values):
+    return _percentile(sorted(values), 50)
+
+
+class FlashStatsDb(object):
+    """
+    Local SQLite database of flash session records, appended by concurrent flash threads and processes.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def _connect(self):
+        # imported here, download_handler imports this module for stats_phase on every run, with or without --stats-db
+        import sqlite3
+
+        conn = sqlite3.connect(self.db_path, timeout=_DB_TIMEOUT_IN_SECOND)
+        conn.execute(_CREATE_TABLE)
+        conn.execute(_CREATE_INDEX)
+        return conn
+
+    def append(self, record):
+        names = list(record.keys())
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(f"INSERT INTO sessions ({', '.join(names)}) VALUES ({', '.join(['?'] * len(names))})",
+                             [record[name] for name in names])
+        finally:
+            conn.close()
+
+    def report(self):
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT port, tx_bytes, download_ms, retries, bad_blocks, outcome FROM sessions "
+                                "ORDER BY port, start_time").fetchall()
+        finally:
+            conn.close()
+
+        sessions = {}
+        for row in rows:
+            sessions.setdefault(row[0], []).append(row[1:])
+
+        result = []
+        for port, port_sessions in sessions.items():
+            # throughput in KB/s of the sessions which downloaded data
+            throughputs = [tx_bytes / download_ms * 1000 / 1024 for tx_bytes, download_ms, _, _, _ in port_sessions
+                           if tx_bytes and download_ms]
+            sorted_throughputs = sorted(throughputs)
+            port_report = {
+                "Port": port,
+                "Sessions": len(port_sessions),
+                "Failed": len([s for s in port_sessions if s[4] != "PASS"]),
+                "P10": _percentile(sorted_throughputs, 10),
+                "P50": _percentile(sorted_throughputs, 50),
+                "P90": _percentile(sorted_throughputs, 90),
+                "Retries": sum([s[2] or 0 for s in port_sessions]),
+                "BadBlocks": sum([s[3] or 0 for s in port_sessions]),
+                "Degrading": self._get_degrading_reasons(port_sessions, throughputs)
+            }
+            result.append(port_report)
+
+        return result
+
+    @staticmethod
+    def _get_degrading_reasons(port_sessions, throughputs):
+        reasons = []
+
+        recent_sessions = port_sessions[-_RECENT_SESSION_COUNT:]
+        failed_count = len([s for s in recent_sessions if s[4] != "PASS"])
+        if failed_count >= _DEGRADED_FAIL_COUNT:
+            reasons.append(f"{failed_count} of last {len(recent_sessions)} sessions failed")
+
+        history_sessions = port_sessions[:-_RECENT_SESSION_COUNT]
+        if len(history_sessions) >= _MIN_HISTORY_SESSION_COUNT:
+            recent_retries = sum([s[2] or 0 for s in recent_sessions]) / len(recent_sessions)
+            history_retries = sum([s[2] or 0 for s in history_sessions]) / len(history_sessions)
+            if recent_retries >= 1 and recent_retries > history_retries * _DEGRADED_RETRY_RATIO:
+                reasons.append(f"retries {history_retries:.1f} -> {recent_retries:.1f} per session")
+
+        if len(throughputs) >= _RECENT_SESSION_COUNT + _MIN_HISTORY_SESSION_COUNT:
+            recent_median = _median(throughputs[-_RECENT_SESSION_COUNT:])
+            history_median = _median(throughputs[:-_RECENT_SESSION_COUNT])
+            if recent_median < history_median * _DEGRADED_THROUGHPUT_RATIO:
+                reasons.append(f"throughput {history_median:.0f} -> {recent_median:.0f} KB/s")
+
+        return reasons
+
+    def print_report(self, logger):
+        report = self.report()
+        if not report:
+            logger.info(f"No flash session in {self.db_path}")
+            return
+
+        logger.info(f"{'Port':<16}{'Sessions':>9}{'Failed':>8}{'P10':>9}{'P50':>9}{'P90':>9}{'Retries':>9}"
+                    f"{'BadBlocks':>10}  (throughput in KB/s)")
+        for port_report in report:
+            throughputs = "".join([f"{port_report[p]:>9.0f}" if port_report[p] is not None else f"{'-':>9}"
+                                   for p in ["P10", "P50", "P90"]])
+            logger.info(f"{port_report['Port']:<16}{port_report['Sessions']:>9}{port_report['Failed']:>8}"
+                        f"{throughputs}{port_report['Retries']:>9}{port_report['BadBlocks']:>10}")
+        for port_report in report:
+            if port_report["Degrading"]:
+                logger.warning(f"{port_report['Port']} degrading: {'; '.join(port_report['Degrading'])}, "
+                               f"check the port and cable")
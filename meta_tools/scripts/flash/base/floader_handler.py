@@ -6,11 +6,14 @@
 
 import time
 import ctypes
+import struct
+import logging
 
 from .sense_status import *
 from .device_info import *
 from .next_op import *
 from .flash_utils import *
+from .frame_codec import *
 
 BAUDSET = 0x81
 QUERY = 0x02
@@ -73,36 +76,30 @@ class FloaderHandler(object):
         self.profile = ameba_obj.profile_info
         self.logger = ameba_obj.logger
         self.setting = ameba_obj.setting
+        self.frame_codec = FloaderFrameCodec(SOF)
         super().__init__()
 
-    def send_request(self, request, length, timeout, is_sync=True):
+    def send_request(self, request, length, timeout, is_sync=True, count_retries=True):
+        # probes expected to fail until the device is ready set count_retries False, not to count in statistics
         ret = ErrType.SYS_UNKNOWN
         response_bytes = None
 
-        len_l = length & 0xFF
-        len_h = (length >> 8) & 0xFF
-
-        frame_data = [(SOF)]
-        frame_data.append(len_l)
-        frame_data.append(len_h)
-        frame_data.append((len_l ^ len_h) & 0xFF)
-
-        frame_bytes = bytearray(frame_data)
-        frame_bytes += request[:length]
-        checksum = sum(request)
-
-        frame_bytes += (checksum & 0xFF).to_bytes(1, byteorder="little")
+        frame_bytes = self.frame_codec.encode(request, length)
+        is_debug = self.logger.isEnabledFor(logging.DEBUG)
 
         try:
             retry = 0
             while retry < self.setting.request_retry_count:
                 retry += 1
+                if retry > 1 and count_retries:
+                    self.ameba.stats.retries += 1
 
                 self.serial_port.flushInput()
                 self.serial_port.flushOutput()
 
                 self.ameba.write_bytes(frame_bytes)
-                self.logger.debug(f"Request: len={length}, payload={request.hex()}")
+                if is_debug:
+                    self.logger.debug(f"Request: len={length}, payload={request.hex()}")
 
                 ret, ret_byte = self.ameba.read_bytes(timeout)
                 if ret != ErrType.OK:
@@ -116,14 +113,15 @@ class FloaderHandler(object):
                             len_h = ret_bytes[1]
                             len_xor = ret_bytes[2]
                             response_len = (len_h << 8) + len_l
-                            if len_xor == (len_l ^ len_h):
+                            if FloaderFrameCodec.is_length_valid(len_l, len_h, len_xor):
                                 ret, response_bytes = self.ameba.read_bytes(self.setting.async_response_timeout_in_second,
                                                                             size=response_len + 1)
                                 if ret == ErrType.OK:
                                     if response_len >= len(response_bytes) - 1:
-                                        self.logger.debug(
-                                            f"Response: len={response_len}, payload={response_bytes.hex()}")
-                                        checksm = sum(response_bytes[:response_len]) % 256
+                                        if is_debug:
+                                            self.logger.debug(
+                                                f"Response: len={response_len}, payload={response_bytes.hex()}")
+                                        checksm = FloaderFrameCodec.get_checksum(response_bytes, response_len)
                                         if checksm == response_bytes[response_len]:
                                             self.logger.debug(f"Checksum={checksm}({hex(checksm)}), ok")
                                             break
@@ -179,9 +177,10 @@ class FloaderHandler(object):
 
         return ret, response_bytes
 
-    def sense(self, timeout, op_code=None, data=None):
+    def sense(self, timeout, op_code=None, data=None, count_retries=True):
         self.logger.debug(f"Sense...")
-        ret, sense_ack = self.send_request(SENSE.to_bytes(1, byteorder="little"), length=1, timeout=timeout)
+        ret, sense_ack = self.send_request(SENSE.to_bytes(1, byteorder="little"), length=1, timeout=timeout,
+                                           count_retries=count_retries)
         if ret == ErrType.OK:
             sense_status = SenseStatus()
             self.logger.debug(f"Sense response raw data: {sense_ack.hex()}")
@@ -240,7 +239,7 @@ class FloaderHandler(object):
                 else:
                     self.logger.debug("Sense")
 
-                ret, resp = self.sense(self.setting.sync_response_timeout_in_second)
+                ret, resp = self.sense(self.setting.sync_response_timeout_in_second, count_retries=False)
                 if ret == ErrType.OK:
                     break
                 else:
@@ -356,16 +355,12 @@ class FloaderHandler(object):
     def write(self, mem_type, src, size, addr, timeout, need_sense=False):
         sense_status = SenseStatus()
 
-        write_data = [WRITE]
-        write_data.append(mem_type&0xFF)
-        write_data.extend(list(addr.to_bytes(4, byteorder="little")))
-
-        write_array = bytearray(write_data)
-        write_array += src[:size]
+        write_array = struct.pack('<BBI', WRITE, mem_type & 0xFF, addr) + src[:size]
 
         self.logger.debug(f"WRITE: addr={hex(addr)}, size={size}, mem_type={mem_type}, need_sense={need_sense}")
         ret, _ = self.send_request(write_array, len(write_array), self.setting.write_response_timeout_in_second, is_sync=False)
         if ret == ErrType.OK:
+            self.ameba.stats.tx_bytes += size
             if need_sense:
                 ret, sense_ack = self.sense(timeout, op_code=WRITE, data=addr)
                 if ret != ErrType.OK:
@@ -376,13 +371,9 @@ class FloaderHandler(object):
     def read(self, mem_type, addr, size, timeout):
         resp = None
 
-        read_data = [READ]
-        read_data.append((mem_type & 0xFF))
-        read_data.extend(list(addr.to_bytes(4, byteorder="little")))
-        read_data.extend(list(size.to_bytes(4, byteorder="little")))
+        read_bytes = struct.pack('<BBII', READ, mem_type & 0xFF, addr, size)
 
         self.logger.debug(f"READ: addr={hex(addr)}, size={size}, mem_type={mem_type}")
-        read_bytes = bytearray(read_data)
         ret, resp_ack = self.send_request(read_bytes, len(read_bytes), timeout)
         if ret == ErrType.OK:
             if resp_ack[0] == READ:
@@ -397,16 +388,9 @@ class FloaderHandler(object):
 
     def checksum(self, mem_type,  start_addr, end_addr, size, timeout):
         chk_rest = 0
-        request_data = [CHKSM]
-        request_data.append((mem_type & 0xFF))
-        request_data.extend(list(start_addr.to_bytes(4, byteorder='little')))
-
-        request_data.extend(list(end_addr.to_bytes(4, byteorder='little')))
-
-        request_data.extend(list(size.to_bytes(4, byteorder='little')))
+        request_bytes = struct.pack('<BBIII', CHKSM, mem_type & 0xFF, start_addr, end_addr, size)
 
         self.logger.debug(f"CHKSM: start={hex(start_addr)}, end={hex(end_addr)}, size={size}, mem_type={mem_type}")
-        request_bytes = bytearray(request_data)
         ret, resp = self.send_request(request_bytes, len(request_bytes), timeout)
         if ret == ErrType.OK:
             if resp[0] == int(CHKSM):
@@ -422,21 +406,14 @@ class FloaderHandler(object):
 
     def erase_flash(self, mem_type, start_addr, end_addr, size, timeout, sense=False, force=False):
         self.logger.debug(f"Erase flash: start_addr={hex(start_addr)}, end_addr={hex(end_addr)} size={size}")
-        request_data = [FS_ERASE]
-        request_data.append((mem_type & 0xFF))
-        request_data.append(1 if force else 0)
-
-        request_data.extend(list(start_addr.to_bytes(4, byteorder="little")))
-        request_data.extend(list((end_addr & 0xFFFFFFFF).to_bytes(4, byteorder="little")))
-
-        request_data.extend(list((size & 0xFFFFFFFF).to_bytes(4, byteorder="little")))
+        request_bytes = struct.pack('<BBBIII', FS_ERASE, mem_type & 0xFF, 1 if force else 0, start_addr,
+                                    end_addr & 0xFFFFFFFF, size & 0xFFFFFFFF)
 
         if force:
             self.logger.warning(f"FS_ERASE: start_addr={hex(start_addr)}, end_addr={hex(end_addr)}, size={size}, mem_type={mem_type} force")
         else:
             self.logger.debug(f"FS_ERASE: start_addr={hex(start_addr)}, end_addr={hex(end_addr)}, size={size}, mem_type={mem_type}")
 
-        request_bytes = bytearray(request_data)
         ret, _ = self.send_request(request_bytes, len(request_bytes), self.setting.async_response_timeout_in_second, is_sync=False)
         if ret != ErrType.OK:
             self.logger.warning(f"FS_ERASE start_addr={hex(start_addr)}, end_addr={hex(end_addr)}, size={size}, force={force}, fail:{ret}")
@@ -590,10 +567,9 @@ class FloaderHandler(object):
 
         request_data.extend(list(size.to_bytes(4, byteorder="little")))
 
-        for idx in range(size):
-            request_data.append(data[address + idx])
-
         request_bytes = bytearray(request_data)
+        # data is the whole map indexed by address
+        request_bytes.extend(data[address:address + size])
 
         ret, _ = self.send_request(request_bytes, len(request_bytes), self.setting.async_response_timeout_in_second, is_sync=False)
 
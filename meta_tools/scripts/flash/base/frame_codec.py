@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+import struct
+import zlib
+
+# Adler-32 keeps the plain byte sum (+1) modulo 65521 in its low 16 bits, which is exact for up to 256 bytes
+_ADLER_BLOCK_SIZE = 256
+# below this size the builtin sum is faster than slicing into Adler-32 blocks
+_SHORT_DATA_SIZE = 64
+
+_FLOADER_HEADER = struct.Struct('<BHB')
+_XMODEM_HEADER = struct.Struct('<BBBI')
+_CHECKSUM_BYTES = [bytes([value]) for value in range(256)]
+
+
+def byte_sum(data):
+    # sum of all bytes of a bytes-like object, computed block-wise in C by zlib
+    length = len(data)
+    if length <= _SHORT_DATA_SIZE:
+        return sum(data)
+    if length <= _ADLER_BLOCK_SIZE:
+        return (zlib.adler32(data) & 0xFFFF) - 1
+    if length <= 2 * _ADLER_BLOCK_SIZE:
+        # e.g. a 256-byte page with the WRITE request header, cheaper without the block loop
+        return (zlib.adler32(data[:_ADLER_BLOCK_SIZE]) & 0xFFFF) + (zlib.adler32(data[_ADLER_BLOCK_SIZE:]) & 0xFFFF) - 2
+
+    view = memoryview(data)
+    total = 0
+    for offset in range(0, length, _ADLER_BLOCK_SIZE):
+        total += zlib.adler32(view[offset:offset + _ADLER_BLOCK_SIZE]) & 0xFFFF
+    return total - (length + _ADLER_BLOCK_SIZE - 1) // _ADLER_BLOCK_SIZE
+
+
+class FloaderFrameCodec(object):
+    """
+    Flashloader frame: SOF | LEN_L | LEN_H | LEN_L ^ LEN_H | payload | checksum, joined into one bytes object, i.e.
+    the payload is copied once and the frame is written to the port without further conversion.
+    """
+
+    HEADER_SIZE = _FLOADER_HEADER.size
+
+    def __init__(self, sof, max_payload_size=2048):
+        self.sof = sof
+        self.max_payload_size = max_payload_size
+
+    def encode(self, payload, length):
+        if length != len(payload):
+            payload = payload[:length]
+            length = len(payload)
+
+        return b"".join((_FLOADER_HEADER.pack(self.sof, length, (length ^ (length >> 8)) & 0xFF), payload,
+                         _CHECKSUM_BYTES[byte_sum(payload) & 0xFF]))
+
+    @staticmethod
+    def is_length_valid(len_l, len_h, len_xor):
+        return len_xor == (len_l ^ len_h)
+
+    @staticmethod
+    def get_checksum(response, length):
+        return byte_sum(memoryview(response)[:length]) & 0xFF
+
+
+class XmodemFrameCodec(object):
+    """
+    ROM XMODEM STX frame: STX | packet no | ~packet no | address | data | checksum of address and data.
+    """
+
+    HEADER_SIZE = _XMODEM_HEADER.size
+
+    def __init__(self, stx, max_data_size=1024):
+        self.stx = stx
+        self.max_data_size = max_data_size
+
+    def encode(self, packet_no, address, data):
+        header = _XMODEM_HEADER.pack(self.stx, packet_no & 0xFF, (~packet_no) & 0xFF, address)
+        # checksum starts from the address field
+        checksum = byte_sum(header[3:]) + byte_sum(data)
+
+        return b"".join((header, data, _CHECKSUM_BYTES[checksum & 0xFF]))
@@ -0,0 +1,88 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import struct
+import tempfile
+
+from .image_preparer import *
+
+_COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class GoldenImage(object):
+    """
+    Whole-chip image merged on host side from several images, gaps filled with the padding byte, so that the images
+    are downloaded as one continuous transfer after a chip erase.
+    """
+
+    def __init__(self, padding_byte):
+        self.padding_byte = padding_byte
+        self.image_path = None
+        self.start_address = 0
+        self.end_address = 0
+        self.prepared_image = None
+        self._word_sum = 0
+        self._pending = b""
+
+    def _update_checksum(self, data):
+        data = self._pending + data
+        aligned_length = len(data) // 4 * 4
+        if aligned_length > 0:
+            self._word_sum += sum(struct.unpack(f'<{aligned_length // 4}I', data[:aligned_length]))
+        self._pending = data[aligned_length:]
+
+    def _write(self, stream, data):
+        stream.write(data)
+        self._update_checksum(data)
+
+    def build(self, image_list):
+        # image_list: [(image_path, start_address, end_address)]
+        image_list = sorted(image_list, key=lambda image: image[1])
+        self.start_address = image_list[0][1]
+        self.end_address = max([end_address for _, _, end_address in image_list])
+
+        fd, self.image_path = tempfile.mkstemp(prefix="golden_", suffix=".bin")
+        address = self.start_address
+        with os.fdopen(fd, 'wb') as golden_stream:
+            for image_path, start_address, end_address in image_list:
+                if start_address < address:
+                    raise ValueError(f"Image {os.path.basename(image_path)} overlaps the previous image")
+                gap = start_address - address
+                while gap > 0:
+                    fill_size = min(gap, _COPY_CHUNK_SIZE)
+                    self._write(golden_stream, bytes([self.padding_byte]) * fill_size)
+                    gap -= fill_size
+                address = start_address
+
+                with open(image_path, 'rb') as image_stream:
+                    while True:
+                        chunk_data = image_stream.read(_COPY_CHUNK_SIZE)
+                        if not chunk_data:
+                            break
+                        self._write(golden_stream, chunk_data)
+                        address += len(chunk_data)
+
+        image_length = address - self.start_address
+        if self._pending:
+            self._update_checksum(bytes([self.padding_byte]) * (4 - len(self._pending)))
+
+        # checksum is calculated while merging, no need to prepare the merged image again
+        self.prepared_image = PreparedImage(self.image_path, self.padding_byte)
+        self.prepared_image.image_length = image_length
+        self.prepared_image.word_sum = self._word_sum & 0xFFFFFFFF
+        self.prepared_image.ret = ErrType.OK
+        self.prepared_image.done.set()
+
+        return self.image_path
+
+    def clean_up(self):
+        if self.image_path and os.path.exists(self.image_path):
+            try:
+                os.remove(self.image_path)
+            except OSError:
+                pass
+        self.image_path = None
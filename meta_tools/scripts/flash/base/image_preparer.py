@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import struct
+import threading
+
+from .errno import *
+
+_READ_CHUNK_SIZE = 1024 * 1024
+
+
+class PreparedImage(object):
+    def __init__(self, image_path, padding_byte):
+        self.image_path = image_path
+        self.padding_byte = padding_byte
+        self.image_length = 0
+        # Sum of little-endian 32-bit words, with the last partial word padded by padding_byte
+        self.word_sum = 0
+        self.ret = ErrType.SYS_UNKNOWN
+        self.done = threading.Event()
+
+    def get_checksum(self, aligned_length):
+        # Padding up to the page aligned length contributes whole padding words only
+        word_aligned_length = (self.image_length + 3) // 4 * 4
+        padding_word = self.padding_byte * 0x01010101
+        padding_words = (aligned_length - word_aligned_length) // 4
+        return (self.word_sum + padding_words * padding_word) & 0xFFFFFFFF
+
+
+class ImagePreparer(object):
+    """
+    Prepare download images on host side in background, i.e. read and checksum the images while the device is
+    being reset, handshaked and loaded with the flashloader.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.prepared_images = {}
+        self._thread = None
+
+    def start(self, image_list):
+        for image_path, padding_byte in image_list:
+            if image_path not in self.prepared_images:
+                self.prepared_images[image_path] = PreparedImage(image_path, padding_byte)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, prepared_image):
+        # image already prepared elsewhere, e.g. checksum calculated while generating it
+        self.prepared_images[prepared_image.image_path] = prepared_image
+
+    def get(self, image_path, padding_byte):
+        prepared_image = self.prepared_images.get(image_path, None)
+        if prepared_image is None or prepared_image.padding_byte != padding_byte:
+            return None
+
+        prepared_image.done.wait()
+        if prepared_image.ret != ErrType.OK:
+            return None
+
+        return prepared_image
+
+    def join(self):
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        for prepared_image in list(self.prepared_images.values()):
+            try:
+                prepared_image.ret = self._prepare_image(prepared_image)
+            except Exception as err:
+                self.logger.debug(f"Prepare image {prepared_image.image_path} exception: {err}")
+                prepared_image.ret = ErrType.SYS_IO
+            finally:
+                prepared_image.done.set()
+
+    def _prepare_image(self, prepared_image):
+        if not os.path.exists(prepared_image.image_path):
+            return ErrType.SYS_PARAMETER
+
+        word_sum = 0
+        image_length = 0
+        with open(prepared_image.image_path, 'rb') as stream:
+            while True:
+                chunk_data = stream.read(_READ_CHUNK_SIZE)
+                if not chunk_data:
+                    break
+                image_length += len(chunk_data)
+                if len(chunk_data) % 4 != 0:
+                    # only the last chunk may be unaligned since _READ_CHUNK_SIZE is 4 bytes aligned
+                    chunk_data += bytes([prepared_image.padding_byte]) * (4 - len(chunk_data) % 4)
+                word_sum += sum(struct.unpack(f'<{len(chunk_data) // 4}I', chunk_data))
+
+        prepared_image.image_length = image_length
+        prepared_image.word_sum = word_sum & 0xFFFFFFFF
+        self.logger.debug(f"Image prepared: {os.path.basename(prepared_image.image_path)}, size={image_length}")
+
+        return ErrType.OK
@@ -5,27 +5,86 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import os
+import copy
 import json
 import base64
-from pyDes import *
+import threading
+
+from .cache_utils import *
 
 _DES_KEY = "574C414E"  # 0x574C414E, WLAN
 _DES_IV = [0x40, 0x52, 0x65, 0x61, 0x6C, 0x73, 0x69, 0x6C]  # @Realsil
+# decrypted profiles by the hash of the encrypted content, kept in memory only so that no plain profile is written
+_profile_cache = {}
+_profile_cache_lock = threading.Lock()
+
+# cipher backends are imported on first decryption only, a cached profile needs neither of them
+_TripleDES = None
+_triple_des_probed = False
+
+
+def _load_triple_des():
+    global _TripleDES, _triple_des_probed
+
+    if not _triple_des_probed:
+        _triple_des_probed = True
+        try:
+            try:
+                from cryptography.hazmat.decrepit.ciphers.algorithms import TripleDES
+            except ImportError:
+                from cryptography.hazmat.primitives.ciphers.algorithms import TripleDES
+            _TripleDES = TripleDES
+        except ImportError:
+            _TripleDES = None
+
+    return _TripleDES
+
+
+def _des_decrypt(data):
+    TripleDES = _load_triple_des()
+    if TripleDES is not None:
+        try:
+            from cryptography.hazmat.primitives import padding
+            from cryptography.hazmat.primitives.ciphers import Cipher, modes
+
+            # 3DES with a single 8-byte key is equivalent to DES
+            decryptor = Cipher(TripleDES(_DES_KEY.encode("utf-8")), modes.CBC(bytes(_DES_IV))).decryptor()
+            padded_data = decryptor.update(data) + decryptor.finalize()
+            unpadder = padding.PKCS7(64).unpadder()
+            return unpadder.update(padded_data) + unpadder.finalize()
+        except Exception:
+            # fall back to pyDes, e.g. DES disabled by the crypto backend
+            pass
+
+    from pyDes import des, CBC, PAD_PKCS5
+    k = des(_DES_KEY, CBC, _DES_IV, padmode=PAD_PKCS5)
+    return k.decrypt(data)
 
 
 class JsonUtils:
     @staticmethod
-    def load_from_file(file_path, need_decrypt=True):
+    def load_from_file(file_path, need_decrypt=True, use_cache=True):
         result = None
         if os.path.exists(file_path):
             with open(file_path, 'r', encoding='utf-8') as f:
                 f_content = f.read()
 
             if need_decrypt:
-                k = des(_DES_KEY, CBC, _DES_IV, padmode=PAD_PKCS5)
-                des_k = k.decrypt(base64.b64decode(f_content))
+                # sessions of the same profile decrypt it once per process, callers get their own copy
+                cache_key = CacheUtils.get_content_key(f_content) if use_cache else None
+                if cache_key is not None:
+                    with _profile_cache_lock:
+                        result = _profile_cache.get(cache_key)
+                    if result is not None:
+                        return copy.deepcopy(result)
+
+                des_k = _des_decrypt(base64.b64decode(f_content))
                 profile_str = des_k.decode("utf-8")
                 result = json.loads(profile_str)
+
+                if cache_key is not None:
+                    with _profile_cache_lock:
+                        _profile_cache[cache_key] = copy.deepcopy(result)
             else:
                 result = json.loads(f_content)
 
@@ -36,6 +95,7 @@ class JsonUtils:
         path_dir = os.path.dirname(file_path)
         os.makedirs(path_dir, exist_ok=True)
         if need_encrypt:
+            from pyDes import des, CBC, PAD_PKCS5
             ek = des(_DES_KEY.encode("utf-8"), CBC, _DES_IV, pad=None, padmode=PAD_PKCS5)
             en_bytes = ek.encrypt(json.dumps(data).encode("utf-8"))
             save_data = base64.b64encode(en_bytes)
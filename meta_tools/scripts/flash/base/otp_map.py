@@ -0,0 +1,119 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+
+from .efuse_data import *
+
+
+class OtpMap(object):
+    """
+    Target OTP logical map, a sparse set of byte values by offset.
+    """
+
+    CSV_ALL_PORTS = "*"
+
+    def __init__(self):
+        self.values = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    @staticmethod
+    def _parse_int(value):
+        if isinstance(value, int):
+            return value
+        return int(str(value).strip(), 16)
+
+    @staticmethod
+    def _parse_bytes(value):
+        if isinstance(value, (list, tuple)):
+            return [OtpMap._parse_int(v) for v in value]
+        hex_str = str(value).strip().replace(":", "").replace("-", "").replace(" ", "")
+        if hex_str.lower().startswith("0x"):
+            hex_str = hex_str[2:]
+        return list(bytes.fromhex(hex_str))
+
+    def set(self, offset, data):
+        for idx, value in enumerate(data):
+            if value < 0 or value > 0xFF:
+                raise ValueError(f"Invalid OTP value {value} at offset {hex(offset + idx)}")
+            self.values[offset + idx] = value
+
+    def load_efuse_data(self, efuse_data_list):
+        for efuse_data in efuse_data_list:
+            self.set(self._parse_int(efuse_data.offset), self._parse_bytes(efuse_data.value))
+
+    def load_from_json(self, file_path):
+        # same format as DefaultEfuseMap in device profile
+        with open(file_path, 'r', encoding='utf-8') as f:
+            map_json = json.load(f)
+        if isinstance(map_json, dict):
+            map_json = map_json.get("DefaultEfuseMap", map_json.get("EfuseMap", []))
+        self.load_efuse_data([EfuseData(**efuse_data) for efuse_data in map_json])
+
+    def load_from_csv(self, file_path, port):
+        # rows of Port,Offset,Value, e.g. COM3,0x11A,00E04C870001, port * for all devices
+        import csv
+
+        # port None loads the rows of all ports, to check the file
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                try:
+                    row_port = (row.get("Port") or self.CSV_ALL_PORTS).strip()
+                    if port is not None and row_port not in [port, self.CSV_ALL_PORTS]:
+                        continue
+                    self.set(self._parse_int(row["Offset"]), self._parse_bytes(row["Value"]))
+                except Exception as err:
+                    raise ValueError(f"Invalid OTP CSV {file_path} line {reader.line_num}: {err!r}")
+
+    @staticmethod
+    def create(profile_info, port, map_file=None, csv_file=None, default_map=False):
+        # later sources override earlier ones: profile default map, map file, per-device csv
+        # any malformed source raises ValueError
+        otp_map = OtpMap()
+        if default_map:
+            try:
+                otp_map.load_efuse_data(profile_info.default_efuse_map)
+            except Exception as err:
+                raise ValueError(f"Invalid DefaultEfuseMap of device profile: {err!r}")
+        if map_file:
+            try:
+                otp_map.load_from_json(map_file)
+            except Exception as err:
+                raise ValueError(f"Invalid OTP map {map_file}: {err!r}")
+        if csv_file:
+            try:
+                otp_map.load_from_csv(csv_file, port)
+            except OSError as err:
+                raise ValueError(f"Invalid OTP CSV {csv_file}: {err!r}")
+        return otp_map
+
+    def max_offset(self):
+        return max(self.values.keys()) if self.values else -1
+
+    def diff(self, current_map):
+        # changed bytes coalesced into contiguous (offset, length) ranges
+        ranges = []
+        for offset in sorted(self.values.keys()):
+            if current_map[offset] == self.values[offset]:
+                continue
+            if ranges and (ranges[-1][0] + ranges[-1][1] == offset):
+                ranges[-1][1] += 1
+            else:
+                ranges.append([offset, 1])
+
+        return [(offset, length) for offset, length in ranges]
+
+    def apply(self, current_map):
+        target_map = bytearray(current_map)
+        for offset, value in self.values.items():
+            target_map[offset] = value
+        return target_map
+
+    def mismatch(self, current_map):
+        return [offset for offset in sorted(self.values.keys()) if current_map[offset] != self.values[offset]]
@@ -0,0 +1,67 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+
+from .cache_utils import *
+
+_RESUME_CACHE_DIR = "resume"
+
+
+class ResumeState(object):
+    """
+    Download progress of an image confirmed by sense, saved when the download fails so that the next download of the
+    same image to the same device resumes from the last confirmed address instead of from the beginning.
+    """
+
+    def __init__(self, device_key, image_path, image_info, image_length):
+        self.image_path = os.path.realpath(image_path)
+        try:
+            self.image_mtime = os.path.getmtime(image_path)
+        except OSError:
+            self.image_mtime = 0
+        self.image_length = image_length
+        self.start_address = image_info.start_address
+        self.end_address = image_info.end_address
+        self.memory_type = image_info.memory_type
+        self.key = CacheUtils.get_content_key(f"{device_key}|{self.image_path}|{self.start_address}")
+        # flash address to resume from and the corresponding image offset, they differ by the skipped bad blocks
+        self.address = self.start_address
+        self.offset = 0
+
+    def _identity(self):
+        return {
+            "ImagePath": self.image_path,
+            "ImageMtime": self.image_mtime,
+            "ImageLength": self.image_length,
+            "StartAddress": self.start_address,
+            "EndAddress": self.end_address,
+            "MemoryType": self.memory_type
+        }
+
+    def load(self):
+        state = CacheUtils.load_json(_RESUME_CACHE_DIR, self.key)
+        if state is None:
+            return False
+        for name, value in self._identity().items():
+            if state.get(name, None) != value:
+                # image or layout changed, start over
+                return False
+        self.address = state.get("Address", self.start_address)
+        self.offset = state.get("Offset", 0)
+        return self.offset > 0
+
+    def save(self, address, offset):
+        state = self._identity()
+        state["Address"] = address
+        state["Offset"] = offset
+        CacheUtils.save_json(_RESUME_CACHE_DIR, self.key, state)
+
+    def clear(self):
+        try:
+            os.remove(os.path.join(CacheUtils.get_cache_dir(_RESUME_CACHE_DIR), f"{self.key}.json"))
+        except OSError:
+            pass
@@ -8,9 +8,11 @@ import io
 import os
 import sys
 import time
+import logging
 
 from .errno import *
 from .rtk_utils import *
+from .frame_codec import *
 
 STX = 0x02  # Transfer data
 EOT = 0x04  # End of transfer
@@ -47,6 +49,7 @@ class RomHandler(object):
         self.is_usb = ameba_obj.is_usb
         self.stx_packet_no = 1
         self.padding = padding
+        self.frame_codec = XmodemFrameCodec(STX)
         self.setting = ameba_obj.setting
 
     def get_baudrate_idx(self, rate):
@@ -89,7 +92,8 @@ class RomHandler(object):
             6000000: 34
         }.get(rate, 13)
 
-    def send_request(self, request, length, timeout):
+    def send_request(self, request, length, timeout, count_retries=True):
+        # handshake probes expected to fail until the device is ready set count_retries False
         ret = ErrType.SYS_UNKNOWN
         response = []
 
@@ -97,7 +101,9 @@ class RomHandler(object):
             for retry in range(2):
                 if retry > 0:
                     self.logger.debug(f"Request retry {retry}#: len={length}, payload={request.hex()}")
-                else:
+                    if count_retries:
+                        self.ameba.stats.retries += 1
+                elif self.logger.isEnabledFor(logging.DEBUG):
                     self.logger.debug(f"Request: len={length}, payload={request.hex()}")
 
                 self.serial_port.flushInput()
@@ -168,7 +174,7 @@ class RomHandler(object):
                 _bytes.append(index)
                 cmd = bytearray(_bytes)
 
-                ret = self.send_request(cmd, 2, DEFAULT_TIMEOUT)
+                ret = self.send_request(cmd, 2, DEFAULT_TIMEOUT, count_retries=False)
                 if ret == ErrType.OK:
                     self.logger.debug(f"BAUDSET ok")
                 elif ret == ErrType.DEV_LENGTH:
@@ -186,7 +192,8 @@ class RomHandler(object):
                     continue
 
                 self.logger.debug(f"BAUDCHK")
-                ret = self.send_request(BAUDCHK.to_bytes(1, byteorder="little"), 1, DEFAULT_TIMEOUT)
+                ret = self.send_request(BAUDCHK.to_bytes(1, byteorder="little"), 1, DEFAULT_TIMEOUT,
+                                        count_retries=False)
                 if ret == ErrType.OK:
                     self.logger.debug("BAUDCHK ok")
                     break
@@ -198,7 +205,7 @@ class RomHandler(object):
                     _bytes = [BAUDSET]
                     _bytes.append(index)
                     cmd = bytearray(_bytes)
-                    ret = self.send_request(cmd, 2, DEFAULT_TIMEOUT)
+                    ret = self.send_request(cmd, 2, DEFAULT_TIMEOUT, count_retries=False)
                     if ret == ErrType.OK:
                         self.logger.debug(f"Baudset ok")
                         break
@@ -209,7 +216,8 @@ class RomHandler(object):
                         self.logger.debug(f"Baudset fail: {ret}")
                 else:
                     self.logger.debug("BAUDCHK")
-                    ret = self.send_request(BAUDCHK.to_bytes(1, byteorder="little"), 1, DEFAULT_TIMEOUT)
+                    ret = self.send_request(BAUDCHK.to_bytes(1, byteorder="little"), 1, DEFAULT_TIMEOUT,
+                                            count_retries=False)
                     if ret == ErrType.OK:
                         self.logger.debug(f"Baudchk ok")
                         break
@@ -313,17 +321,7 @@ class RomHandler(object):
 
     def transfer(self, address, data_bytes):
         self.logger.debug(f"STX {self.stx_packet_no}#: addr={hex(address)}")
-        stx_data = [STX]
-        stx_data.append(self.stx_packet_no & 0xFF)
-        stx_data.append((~self.stx_packet_no) & 0xFF)
-
-        stx_data.extend(list(address.to_bytes(4, byteorder='little')))
-
-        stx_bytes = bytearray(stx_data)
-        stx_bytes += data_bytes
-
-        checksum = sum(stx_bytes[3:]) % 256
-        stx_bytes += checksum.to_bytes(1, byteorder="little")
+        stx_bytes = self.frame_codec.encode(self.stx_packet_no, address, data_bytes)
 
         ret = self.send_request(stx_bytes, len(stx_bytes), STX_TIMEOUT)
         if ret == ErrType.OK:
@@ -41,6 +41,12 @@ class RtSettings():
         self.auto_reset_device_with_dtr_rts_file = kwargs.get("AutoResetDeviceWithDtrRtsTimingFile", "Reset.cfg")
         self.post_process = kwargs.get("PostProcess", "RESET")
         self.serial_initial_read_timeout_in_second = round(kwargs.get("SerialInitialReadTimeoutInMillisecond", 20) / 1000, 2)
+        self.active_ready_detection = kwargs.get("ActiveReadyDetection", 0)
+        self.device_cache = kwargs.get("DeviceCache", 0)
+        self.merge_adjacent_images = kwargs.get("MergeAdjacentImages", 0)
+        self.golden_image_sense_packet_count = kwargs.get("GoldenImageSensePacketCount", 128)
+        self.resume_download = kwargs.get("ResumeDownload", 0)
+        self.ram_download_frame_size = kwargs.get("RamDownloadFrameSize", 2048)
 
     def __repr__(self):
         profile_dict = {
@@ -68,7 +74,13 @@ class RtSettings():
             "AutoProgramSpicAddrMode4Byte": self.auto_program_spic_addr_mode_4byte,
             "AutoSwitchToDownloadModeWithDtrRtsTimingFile": self.auto_switch_to_download_mode_with_dtr_rts_file,
             "AutoResetDeviceWithDtrRtsTimingFile": self.auto_reset_device_with_dtr_rts_file,
-            "PostProcess": self.post_process
+            "PostProcess": self.post_process,
+            "ActiveReadyDetection": self.active_ready_detection,
+            "DeviceCache": self.device_cache,
+            "MergeAdjacentImages": self.merge_adjacent_images,
+            "GoldenImageSensePacketCount": self.golden_image_sense_packet_count,
+            "ResumeDownload": self.resume_download,
+            "RamDownloadFrameSize": self.ram_download_frame_size
         }
 
         return profile_dict
\ No newline at end of file
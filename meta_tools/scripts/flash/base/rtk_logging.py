@@ -6,13 +6,21 @@
 
 import sys
 import logging
-from colorama import Fore, Style, init
 
-# init Colorama
-init(autoreset=True)
+_colorama_initialized = False
 
 
-def create_logger(name, log_level="INFO", stream=sys.stdout, file=None):
+def _init_colorama():
+    # init Colorama on first logger creation, it wraps sys.stdout so that must be picked up afterwards
+    global _colorama_initialized
+
+    if not _colorama_initialized:
+        from colorama import init
+        init(autoreset=True)
+        _colorama_initialized = True
+
+
+def create_logger(name, log_level="INFO", stream=None, file=None):
     if log_level == "DEBUG":
         level = logging.DEBUG
     elif log_level == "WARNING":
@@ -26,6 +34,11 @@ def create_logger(name, log_level="INFO", stream=sys.stdout, file=None):
 
     logger = logging.getLogger(name)
     if not logger.handlers:
+        _init_colorama()
+        from colorama import Fore, Style
+        if stream is None:
+            stream = sys.stdout
+
         formatter = logging.Formatter(
             fmt=f'[%(asctime)s.%(msecs)03d][%(levelname)s] [{name}]%(message)s',
             datefmt='%Y-%m-%d %H:%M:%S')
@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+
+def _comports():
+    # list_ports enumerates platform backends (e.g. setupapi on Windows), import it on first use only
+    import serial.tools.list_ports
+    return serial.tools.list_ports.comports()
+
+
+class UsbIdentity(object):
+    """
+    USB identity of a serial port, used to find the device again after it re-enumerates, maybe under another port
+    name (e.g. /dev/ttyACM0 -> /dev/ttyACM1).
+    """
+
+    def __init__(self, vid, pid, serial_number=None, location=None):
+        self.vid = vid
+        self.pid = pid
+        self.serial_number = serial_number
+        self.location = location
+
+    def __repr__(self):
+        return f"VID:PID={self.vid:04X}:{self.pid:04X} SER={self.serial_number} LOCATION={self.location}"
+
+    @staticmethod
+    def from_port_info(port_info):
+        if port_info.vid is None or port_info.pid is None:
+            return None
+        return UsbIdentity(port_info.vid, port_info.pid, port_info.serial_number, port_info.location)
+
+    @staticmethod
+    def from_port(port_name):
+        for port_info in _comports():
+            if port_info.device == port_name:
+                return UsbIdentity.from_port_info(port_info)
+        return None
+
+    def match(self, port_info):
+        if port_info.vid != self.vid or port_info.pid != self.pid:
+            return False
+        if self.serial_number and port_info.serial_number != self.serial_number:
+            return False
+        return True
+
+    def find_port(self, preferred_port=None):
+        candidates = [port_info for port_info in _comports() if self.match(port_info)]
+
+        if self.location is not None:
+            # serial number may be shared by boards on the same fixture, the hub location tells them apart
+            for port_info in candidates:
+                if port_info.location == self.location:
+                    return port_info.device
+            return None
+
+        if len(candidates) == 1:
+            return candidates[0].device
+        for port_info in candidates:
+            if port_info.device == preferred_port:
+                return port_info.device
+
+        return None
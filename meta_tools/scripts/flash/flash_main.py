@@ -0,0 +1,532 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import sys
+import argparse
+import base64
+import json
+import re
+import threading
+from copy import deepcopy
+
+from base import *
+from base.flash_job import *
+from base.flash_session import *
+import version_info
+
+MinSupportedDeviceProfileMajorVersion = 1
+MinSupportedDeviceProfileMinorVersion = 1
+setting_file = "Settings.json"
+
+
+def convert_mingw_path_to_windows(mingw_path):
+    drive_match = re.match(r'^/([a-zA-Z])/', mingw_path)
+    if drive_match:
+        drive_letter = drive_match.group(1).upper() + ":\\"
+        windows_path_tail = mingw_path[3:]
+    else:
+        drive_letter = ""
+        windows_path_tail = mingw_path
+
+    windows_path_tail = windows_path_tail.replace('/', '\\')
+
+    windows_path = drive_letter + windows_path_tail
+
+    return windows_path
+
+
+def sys_exit(logger, status, ret):
+    if status:
+        logger.info(f"Finished PASS")  # customized, do not modify
+        sys.exit(0)
+    else:
+        logger.error(f"Finished FAIL: {ret}")  # customized, do not modify
+        sys.exit(1)
+
+
+def decoder_partition_string(partition_table_base64):
+    try:
+        if partition_table_base64 is None:
+            return None
+        partition_value = base64.b64decode(partition_table_base64).decode("utf-8")
+        partition_list = json.loads(partition_value)
+        return partition_list
+    except Exception as err:
+        raise argparse.ArgumentTypeError("Invalid partition table format with base64") from err
+
+
+def record_flash_stats(logger, stats_db, stats, device_info, ret):
+    if stats_db is None:
+        return
+    try:
+        FlashStatsDb(stats_db).append(stats.get_record(device_info, "PASS" if ret == ErrType.OK else str(ret)))
+    except Exception as err:
+        logger.warning(f"Save flash statistics to {stats_db} fail: {err}")
+
+
+# --- add remote server params ---
+def flash_process_entry(profile_info, serial_port, serial_baudrate, image_dir, settings, images_info,
+                        chip_erase,
+                        memory_type, memory_info, download,
+                        log_level, log_f,
+                        read_wifimac=False,
+                        remote_server=None, remote_port=None, remote_password=None,
+                        otp_map=None, golden_image=False, stats_db=None, ram_boot=False, entry_address=None):
+    logger = create_logger(serial_port, log_level=log_level, file=log_f)
+
+    if download:
+        operation = FlashOperation.DOWNLOAD
+    elif read_wifimac:
+        operation = FlashOperation.READ_WIFIMAC
+    elif otp_map is not None:
+        operation = FlashOperation.OTP
+    else:
+        operation = FlashOperation.CHIP_ERASE if chip_erase else FlashOperation.ERASE
+    stats = FlashStats(serial_port, serial_baudrate, operation)
+    ameba = None
+
+    def create_ameba():
+        return Ameba(profile_info, serial_port, serial_baudrate, image_dir, settings, logger,
+                     download_img_info=images_info,
+                     chip_erase=chip_erase,
+                     memory_type=memory_type,
+                     erase_info=memory_info,
+                     golden_image=golden_image,
+                     ram_boot=ram_boot,
+                     entry_address=entry_address,
+                     stats=stats,
+                     remote_server=remote_server,
+                     remote_port=remote_port,
+                     remote_password=remote_password)
+
+    def exit_process(status, ret):
+        record_flash_stats(logger, stats_db, stats, ameba.device_info if ameba is not None else None, ret)
+        sys_exit(logger, status, ret)
+
+    try:
+        image_preparer = None
+        if download:
+            # read and checksum images on host side before the port is opened and the device is brought up
+            image_preparer = ImagePreparer(logger)
+            image_preparer.start(Ameba.list_download_images(profile_info, settings, image_dir, images_info, logger))
+        ameba = create_ameba()
+        if download:
+            ret, ameba = download_process(ameba, logger, create_ameba, image_preparer=image_preparer)
+            if ret != ErrType.OK:
+                exit_process(False, ret)
+
+            ret = ameba.post_process()
+            if ret != ErrType.OK:
+                logger.error("Post process fail")
+                exit_process(False, ret)
+        elif read_wifimac:
+            ret = read_wifimac_process(ameba, logger)
+            if ret != ErrType.OK:
+                exit_process(False, ret)
+        elif otp_map is not None:
+            ret = otp_process(ameba, logger, otp_map)
+            if ret != ErrType.OK:
+                exit_process(False, ret)
+        else:
+            ret = erase_process(ameba, logger)
+            if ret != ErrType.OK:
+                exit_process(False, ret)
+    except FlashError as err:
+        exit_process(False, err.err)
+
+    ameba.clean_up()
+
+    exit_process(True, ret)
+
+
+def job_process_entry(profile_info, serial_port, serial_baudrate, settings, operations,
+                      log_level, log_f,
+                      remote_server=None, remote_port=None, remote_password=None, stats_db=None):
+    logger = create_logger(serial_port, log_level=log_level, file=log_f)
+
+    # device is brought up once, operations of the job share the same flashloader session
+    session = FlashSession(profile_info, serial_port, serial_baudrate, settings=settings, logger=logger,
+                           remote_server=remote_server, remote_port=remote_port, remote_password=remote_password)
+    session.stats.operation = ",".join([op.operation for op in operations])
+    try:
+        for index, op in enumerate(operations):
+            logger.info(f"Job operation {index + 1}/{len(operations)}: {op.operation}")
+            session.run(op)
+
+        if FlashJob.need_download(operations):
+            session.post_process()
+    except FlashError as err:
+        logger.error(f"Job fail: {err}")
+        session.close()
+        record_flash_stats(logger, stats_db, session.stats, session.device_info, err.err)
+        sys_exit(logger, False, err.err)
+
+    session.close()
+    record_flash_stats(logger, stats_db, session.stats, session.device_info, ErrType.OK)
+
+    sys_exit(logger, True, ErrType.OK)
+
+
+def flash_main(parser, args):
+    download = args.download
+    profile = args.profile
+    image = args.image
+    image_dir = args.image_dir
+    chip_erase = args.chip_erase
+    serial_ports = args.port
+    serial_baudrate = args.baudrate
+    log_level = args.log_level.upper()
+    log_file = args.log_file
+    erase = args.erase
+    start_addr = args.start_address
+    end_addr = args.end_address
+    size = args.size
+    mem_t = args.memory_type
+    partition_table = decoder_partition_string(args.partition_table)
+    read_wifimac = args.read_wifimac
+    golden_image = args.golden_image
+    ram_boot = args.ram_boot
+    entry_address = args.entry_address
+    otp_map_file = args.otp_map
+    otp_csv_file = args.otp_csv
+    otp_default_map = args.otp_default_map
+    otp = any([otp_map_file, otp_csv_file, otp_default_map])
+
+    remote_server = args.remote_server
+    remote_port = 58916
+    remote_password = args.remote_password
+    no_reset = args.no_reset
+    job_file = args.job_file
+    stats_db = args.stats_db
+    stats_report = args.stats_report
+
+    if mem_t is not None:
+        if mem_t == "nand":
+            memory_type = MemoryInfo.MEMORY_TYPE_NAND
+        elif mem_t == "ram":
+            memory_type = MemoryInfo.MEMORY_TYPE_RAM
+        else:
+            memory_type = MemoryInfo.MEMORY_TYPE_NOR
+    else:
+        memory_type = None
+
+    if log_file is not None:
+        log_path = os.path.dirname(log_file)
+        if log_path:
+            if not os.path.exists(log_path):
+                os.makedirs(log_path, exist_ok=True)
+            log_f = log_file
+        else:
+            log_f = os.path.join(os.getcwd(), log_file)
+    else:
+        log_f = None
+    logger = create_logger("main", log_level=log_level, file=log_f)
+    if log_file is not None:
+        logger.info(f"Log file: {log_file}")
+
+    logger.info(f"AmebaFlash Version: {version_info.version}")
+
+    if stats_report:
+        if stats_db is None or not os.path.exists(stats_db):
+            logger.error('Invalid arguments, no statistics database specified')
+            sys.exit(1)
+        try:
+            FlashStatsDb(stats_db).print_report(logger)
+        except Exception as err:
+            logger.error(f"Report flash statistics exception: {err}")
+            sys.exit(1)
+        sys.exit(0)
+
+    if remote_server:
+        logger.info(f"Using remote serial server: {remote_server}:{remote_port}")
+
+    if profile is None:
+        logger.error('Invalid arguments, no device profile specified')
+        parser.print_usage()
+        sys.exit(1)
+
+    if not os.path.exists(profile):
+        logger.error("Device profile '" + profile + "' does not exist")
+        sys.exit(1)
+    logger.info(f'Device profile: {profile}')
+
+    job = None
+    if job_file is not None:
+        if not os.path.exists(job_file):
+            logger.error(f"Job file {job_file} does not exist")
+            sys.exit(1)
+        try:
+            job = FlashJob.load_from_file(job_file)
+        except Exception as err:
+            logger.error(f"Load job file {job_file} exception: {err}")
+            sys.exit(1)
+        logger.info(f'Job file: {job_file}')
+
+        device_operations = job.get_device_operations(serial_ports)
+        if not device_operations:
+            logger.error('Invalid job file, no operations for any serial port')
+            sys.exit(1)
+        serial_ports = list(device_operations.keys())
+
+    if serial_ports is None:
+        logger.error('Invalid arguments, no serial port specified')
+        parser.print_usage()
+        sys.exit(1)
+    logger.info(f'Serial port: {serial_ports}')
+
+    if serial_baudrate is None:
+        logger.error('Invalid arguments, no serial baudrate specified')
+        parser.print_usage()
+        sys.exit(1)
+    logger.info(f'Baudrate: {serial_baudrate}')
+
+    if job is not None:
+        for sp, operations in device_operations.items():
+            logger.info(f"{sp} operations: {', '.join([op.operation for op in operations])}")
+    elif all([download, erase]):
+        logger.warning("Download and erase are set true, only do image download ")
+    elif not (download or erase or chip_erase or read_wifimac or otp):
+        logger.error("Download or erase or chip-erase or read-wifimac or otp should be set")
+        sys.exit(1)
+
+    memory_info = None
+    images_info = None
+    if job is not None:
+        # operations are validated when loading the job file
+        pass
+    elif download:
+        # download
+        if (image is None) and (image_dir is None) and (partition_table is None):
+            logger.error('Invalid arguments, no image or image_dir input')
+            parser.print_usage()
+            sys.exit(1)
+
+        if image is not None:
+            download_img_info = ImageInfo()
+            if not os.path.exists(image):
+                logger.error(f"Image {image} does not exist")
+                sys.exit(1)
+            download_img_info.image_name = image
+            download_img_info.description = os.path.basename(image)
+
+            if memory_type is None:
+                logger.error(f"Memory type is required for single image download")
+                sys.exit(1)
+
+            if start_addr is None:
+                logger.error(f"Start address is required for single image download")
+                sys.exit(1)
+
+            try:
+                start_address = int(start_addr, 16)
+            except Exception as err:
+                logger.error(f"Start address is invalid: {err}")
+                sys.exit(1)
+            download_img_info.start_address = start_address
+
+            if memory_type == MemoryInfo.MEMORY_TYPE_NAND:
+                if end_addr is None:
+                    logger.error(f"End address is required for nand flash download")
+                    sys.exit(1)
+
+                try:
+                    end_address = int(end_addr, 16)
+                except Exception as err:
+                    logger.error(f"End address is invalid: {err}")
+                    sys.exit(1)
+            else:
+                end_address = start_address + os.path.getsize(image)
+
+            download_img_info.end_address = end_address
+            download_img_info.memory_type = memory_type
+            download_img_info.mandatory = True
+            images_info = [download_img_info]
+        elif partition_table is not None:
+            images_info = []
+            for img_info in partition_table:
+                img_json = ImageInfo(** img_info)
+                if sys.platform == "win32":
+                    img_p = convert_mingw_path_to_windows(img_json.image_name)
+                    img_json.image_name = img_p
+                img_json.description = os.path.basename(img_json.image_name)
+                images_info.append(img_json)
+        else:
+            images_info = None
+            if not os.path.exists(image_dir):
+                logger.error(f"Image directory {image_dir} does not exist")
+                sys.exit(1)
+
+            logger.info(f'Image dir: {image_dir}')
+        if images_info:
+            logger.info(f'Image info:')
+            for img_info in images_info:
+                for key, value in img_info.__repr__().items():
+                    if key == "ImageName":
+                        key = "Image"
+                    logger.info(f'> {key}: {value}')
+    elif read_wifimac:
+        # profile, port, baudrate, memory-type
+        pass
+    elif otp:
+        for file_path in [otp_map_file, otp_csv_file]:
+            if file_path is not None and not os.path.exists(file_path):
+                logger.error(f"OTP file {file_path} does not exist")
+                sys.exit(1)
+    else:
+        # erase
+        if all([chip_erase, erase]):
+            logger.warning(f"Both chip erase and erase are enabled, do chip erase only")
+        if not chip_erase:
+            memory_info = MemoryInfo()
+            if start_addr is None:
+                logger.error(f"Start address is required for erase flash")
+                sys.exit(1)
+
+            try:
+                start_address = int(start_addr, 16)
+            except Exception as err:
+                logger.error(f"Start address is invalid: {err}")
+                sys.exit(1)
+            memory_info.start_address = start_address
+
+            if memory_type is None:
+                logger.error("Memory type is required for erase")
+                sys.exit(1)
+
+            memory_info.memory_type = memory_type
+
+            if memory_type == MemoryInfo.MEMORY_TYPE_NAND:
+                if end_addr is None:
+                    logger.error(f"End address is required for nand flash download")
+                    sys.exit(1)
+            else:
+                if size is None:
+                    logger.error(f"Erase size is required")
+                    sys.exit(1)
+
+            if end_addr:
+                try:
+                    end_address = int(end_addr, 16)
+                except Exception as err:
+                    logger.error(f"End address is invalid: {err}")
+                    sys.exit(1)
+            else:
+                end_address = 0
+
+            memory_info.size_in_kbyte = size
+
+            if end_address == 0:
+                end_address = start_address + size
+            memory_info.end_address = end_address
+
+    if (job is None) and (not read_wifimac) and (not otp):
+        if chip_erase:
+            logger.info(f"Chip erase: {chip_erase}")
+            if memory_type is None:
+                logger.warning("Memory type is required for chip erase")
+                sys.exit(1)
+            if memory_type != MemoryInfo.MEMORY_TYPE_NOR:
+                logger.warning("Memory type should be 'nor' for chip erase")
+        else:
+            logger.info(f"Chip erase: False")
+
+    if golden_image:
+        if (not download) or (memory_type != MemoryInfo.MEMORY_TYPE_NOR):
+            logger.error("Golden image is only valid for nor flash download")
+            sys.exit(1)
+        logger.info(f"Golden image: {golden_image}")
+
+    if ram_boot:
+        if (not download) or (memory_type != MemoryInfo.MEMORY_TYPE_RAM):
+            logger.error("RAM boot is only valid for ram download")
+            sys.exit(1)
+        if entry_address is not None:
+            try:
+                entry_address = int(entry_address, 16)
+            except Exception as err:
+                logger.error(f"Entry address is invalid: {err}")
+                sys.exit(1)
+        logger.info(f"RAM boot: entry={hex(entry_address) if entry_address is not None else 'first image'}")
+    elif entry_address is not None:
+        logger.warning("Entry address is only used with --ram-boot, ignored")
+
+    try:
+        # check device profile
+        try:
+            profile_json = JsonUtils.load_from_file(profile)
+            if profile_json is None:
+                logger.error(f"Fail to load device profile {profile}")
+                sys.exit(1)
+            profile_info = RtkDeviceProfile(**profile_json)
+            ver = profile_info.get_version()
+            if ver.major >= MinSupportedDeviceProfileMajorVersion and ver.minor >= MinSupportedDeviceProfileMinorVersion and profile_info.device_id != 0:
+                logger.info(f"Device profile {profile} loaded")
+            else:
+                logger.error(f"Fail to load device profile {profile}, unsupported version {ver.__repr__()}")
+                sys.exit(1)
+        except Exception as err:
+            logger.error(f"Load device profile {profile} exception: {err}")
+            sys.exit(1)
+
+        # load settings
+        setting_path = os.path.realpath(os.path.join(RtkUtils.get_executable_root_path(), setting_file))
+        logger.info(f"Settings path: {setting_path}")
+        dt = None
+        try:
+            if os.path.exists(setting_path):
+                dt = JsonUtils.load_from_file(setting_path, need_decrypt=False)
+                settings = RtSettings(** dt)
+            else:
+                logger.debug(f"{setting_file} not exists!")
+                settings = RtSettings(**{})
+        except Exception as err:
+            logger.error(f"Load settings exception: {err}")
+            settings = RtSettings(** {})
+        # save Setting.json, only when the content changes
+        try:
+            if no_reset:
+                settings.post_process = "NONE"
+            else:
+                settings.post_process = "RESET"
+            if settings.__repr__() != dt:
+                JsonUtils.save_to_file(setting_path, settings.__repr__())
+        except Exception as err:
+            logger.debug(f"save {setting_file} exception: {err}")
+
+        otp_maps = {}
+        if otp:
+            try:
+                for sp in serial_ports:
+                    otp_maps[sp] = OtpMap.create(profile_info, sp, otp_map_file, otp_csv_file, otp_default_map)
+            except Exception as err:
+                logger.error(f"Load OTP map exception: {err}")
+                sys.exit(1)
+
+        threads_list = []
+
+        for sp in serial_ports:
+            if job is not None:
+                flash_thread = threading.Thread(target=job_process_entry, args=(
+                profile_info, sp, serial_baudrate, settings, deepcopy(device_operations[sp]), log_level, log_f,
+                remote_server, remote_port, remote_password, stats_db))
+            else:
+                flash_thread = threading.Thread(target=flash_process_entry, args=(
+                profile_info, sp, serial_baudrate, image_dir, settings, deepcopy(images_info), chip_erase,
+                memory_type, memory_info, download, log_level, log_f, read_wifimac:=read_wifimac,
+                remote_server, remote_port, remote_password, otp_maps.get(sp, None), golden_image, stats_db,
+                ram_boot, entry_address))
+            threads_list.append(flash_thread)
+            flash_thread.start()
+
+        for thred in threads_list:
+            thred.join()
+
+        logger.info(f"All flash threads have completed")
+    except Exception as err:
+        logger.error(f"Main process exception: {err}")
+        sys_exit(logger, False, err)
+
@@ -7,27 +7,106 @@
 
 import fnmatch
 import os.path
-from typing import Optional, Union
+from collections import OrderedDict
+from typing import List, Optional, Union
 import re
 import subprocess
+import threading
+from bisect import bisect_right
 from elftools.elf.constants import SH_FLAGS
 from elftools.elf.elffile import ELFFile
 from .color_output import print_red, print_yellow
+from .elf_symbolizer import ElfSymbolizer
 
 # regex matches a potential address
 ADDRESS_RE = re.compile(r'0x[0-9a-f]{8}', re.IGNORECASE)
 
+# number of checked addresses kept per AddressMatcher
+ADDRESS_MATCHER_CACHE_SIZE = 1024
+# number of decoded addresses kept per AddressDecoder
+ADDR2LINE_CACHE_SIZE = 4096
+# max addresses written to addr2line at once, keeps the pipes from filling up
+ADDR2LINE_BATCH_SIZE = 128
+# queried after each batch, its record marks the end of the batch output
+ADDR2LINE_SENTINEL = '0x00000000'
+
+# symbolizer choices: addr2line of the toolchain, the in-process ElfSymbolizer, or addr2line if found else native
+SYMBOLIZER_AUTO = 'auto'
+SYMBOLIZER_ADDR2LINE = 'addr2line'
+SYMBOLIZER_NATIVE = 'native'
+SYMBOLIZERS = [SYMBOLIZER_AUTO, SYMBOLIZER_ADDR2LINE, SYMBOLIZER_NATIVE]
+
+
+class Addr2LineServer:
+    """
+    Long-lived addr2line process of one ELF file. Addresses are written to its stdin and one record (the address line
+    followed by the inlined-by lines) is read back per address, instead of starting a process per address.
+    """
+
+    def __init__(self, addr2line: str, elf_file: str) -> None:
+        self.cmd = [addr2line, '-pfiaC', '-e', elf_file]
+        self._process = None
+
+    def _start(self):
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(self.cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                             stderr=subprocess.DEVNULL, cwd='.')
+        return self._process
+
+    def lookup(self, addresses: List[str]) -> List[bytes]:
+        records = []
+        for index in range(0, len(addresses), ADDR2LINE_BATCH_SIZE):
+            records += self._lookup_batch(addresses[index:index + ADDR2LINE_BATCH_SIZE])
+        return records
+
+    def _lookup_batch(self, addresses: List[str]) -> List[bytes]:
+        process = self._start()
+        try:
+            process.stdin.write("".join([f"{addr}\n" for addr in addresses + [ADDR2LINE_SENTINEL]]).encode())
+            process.stdin.flush()
+
+            records = []
+            record = None
+            while True:
+                line = process.stdout.readline()
+                if not line:
+                    raise OSError("addr2line exited unexpectedly")
+                if line.startswith(b'0x'):
+                    # with -a every record starts with the address
+                    if record is not None:
+                        records.append(record)
+                    if len(records) == len(addresses):
+                        # start of the sentinel record, its inlined-by lines (if any) are skipped by the next lookup
+                        return records
+                    record = line
+                elif record is not None:
+                    record += line
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=1)
+            except Exception:
+                self._process.kill()
+            self._process = None
+
 
 class AddressDecoder:
     """
     Class for decoding possible addresses
     """
 
-    def __init__(self, toolchain_path: str, elf_file: str, rom_file: Optional[str] = None) -> None:
+    def __init__(self, toolchain_path: str, elf_file: str, rom_file: Optional[str] = None,
+                 symbolizer: str = SYMBOLIZER_AUTO) -> None:
         """
         :param toolchain_path: the path to the toolchain
         :param elf_file: the path to the ELF file
         :param rom_file: the path to the ROM ELF file
+        :param symbolizer: one of SYMBOLIZERS
         """
         self.toolchain_path = toolchain_path
         self.elf_file = elf_file
@@ -37,6 +116,34 @@ class AddressDecoder:
         if rom_file is not None:
             self.rom_address_matcher = AddressMatcher(rom_file)
         self.addr2line = None
+        # addr2line server per ELF, keyed by is_rom
+        self._addr2line_servers = {}
+        # LRU cache of translations (None if not found), keyed by (is_rom, address)
+        self._cache = OrderedDict()
+        # the cache and the addr2line servers are shared by the decoding worker and the core dump parsers
+        self._lock = threading.Lock()
+
+        # in-process symbolizer per ELF, keyed by is_rom, the symbols are loaded in background from now on
+        self._elf_symbolizers = {}
+        self.native = symbolizer == SYMBOLIZER_NATIVE
+        if symbolizer == SYMBOLIZER_AUTO:
+            self.native = self._find_addr2line() is None
+            if self.native:
+                print_yellow("addr2line not found in toolchain, decode addresses with the native symbolizer")
+        if self.native:
+            for is_rom, file in [(False, elf_file), (True, rom_file)]:
+                if file and os.path.exists(file):
+                    self._elf_symbolizers[is_rom] = ElfSymbolizer(file)
+                    self._elf_symbolizers[is_rom].start()
+
+    def _find_addr2line(self) -> Optional[str]:
+        if self.toolchain_path and os.path.exists(self.toolchain_path):
+            bin_dir = os.path.join(self.toolchain_path, "bin")
+            if os.path.exists(bin_dir):
+                for file in os.listdir(bin_dir):
+                    if fnmatch.fnmatch(file, "*addr2line*"):
+                        return os.path.join(bin_dir, file)
+        return None
 
     def _get_addr2line(self):
         """
@@ -61,42 +168,99 @@ class AddressDecoder:
         """
         line = self.address_buffer + line  # because the address may be cut in half
         self.address_buffer = ""
-        out = ""
-        for match in re.finditer(ADDRESS_RE, line):
-            num = match.group()
-            address_int = int(num, 16)
-            translation = None
-
-            # Try looking for the address in the app ELF file
-            if self.address_matcher.is_executable_address(address_int):
-                translation = self.lookup_address(num)
-            # Not found in app ELF file, check ROM ELF file (if it is available)
-            if translation is None and self.rom_file is not None and \
-                    self.rom_address_matcher.is_executable_address(address_int):
-                translation = self.lookup_address(num, is_rom=True)
-            # Translation found either in the app or ROM ELF file
-            if translation is not None:
-                out += translation
-            else:
-                pass
-        return out
+        return self.decode_line(line)
+
+    def decode_line(self, line: str) -> str:
+        """
+        Decode the address in the line, without the address buffer. Can be called from worker threads.
+        """
+        nums = [match.group() for match in ADDRESS_RE.finditer(line)]
+        if not nums:
+            return ""
+
+        # Try looking for the addresses in the app ELF file, all addresses of the line in one query
+        app_nums = [num for num in nums if self.address_matcher.is_executable_address(int(num, 16))]
+        translations = dict(zip(app_nums, self.lookup_addresses(app_nums)))
+        # Not found in app ELF file, check ROM ELF file (if it is available)
+        if self.rom_file is not None:
+            rom_nums = [num for num in nums if translations.get(num) is None and
+                        self.rom_address_matcher.is_executable_address(int(num, 16))]
+            for num, translation in zip(rom_nums, self.lookup_addresses(rom_nums, is_rom=True)):
+                translations[num] = translation
+        # Translation found either in the app or ROM ELF file
+        return "".join([translations.get(num) or "" for num in nums])
+
+    def prefetch(self, nums: List[str]) -> None:
+        """
+        Lookup the executable addresses of the app ELF file in one query, so that decoding them hits the cache.
+        """
+        self.lookup_addresses([num for num in nums if self.address_matcher.is_executable_address(int(num, 16))])
 
     def lookup_address(self, addr: str, is_rom: bool = False) -> Union[str, None]:
         """
         Lookup the address in the ELF file.
         """
+        return self.lookup_addresses([addr], is_rom)[0]
+
+    def lookup_addresses(self, addrs: List[str], is_rom: bool = False) -> List[Union[str, None]]:
+        """
+        Lookup the addresses in the ELF file, through the cache and the addr2line server of the ELF file.
+        """
+        with self._lock:
+            return self._lookup_addresses(addrs, is_rom)
+
+    def _lookup_addresses(self, addrs: List[str], is_rom: bool = False) -> List[Union[str, None]]:
+        if not addrs:
+            return []
+        if self.native:
+            symbolizer = self._elf_symbolizers.get(is_rom)
+            translations = [symbolizer.lookup(int(addr, 16)) if symbolizer else None for addr in addrs]
+            if is_rom:
+                translations = [t.replace('at ??:?', 'in ROM') if t else t for t in translations]
+            return translations
+
         self._get_addr2line()
-        if self.addr2line:
-            elf_file: str = self.rom_file if is_rom else self.elf_file  # type: ignore
-            cmd = [self.addr2line, '-pfiaC', '-e', elf_file, addr]
+        if not self.addr2line:
+            return [None] * len(addrs)
+
+        keys = [(is_rom, int(addr, 16)) for addr in addrs]
+        results = {}
+        missing = {}
+        for addr, key in zip(addrs, keys):
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                results[key] = self._cache[key]
+            else:
+                missing[key] = addr
+
+        if missing:
+            server = self._addr2line_servers.get(is_rom)
+            if server is None:
+                elf_file: str = self.rom_file if is_rom else self.elf_file  # type: ignore
+                server = Addr2LineServer(self.addr2line, elf_file)
+                self._addr2line_servers[is_rom] = server
             try:
-                translation = subprocess.check_output(cmd, cwd='.')
+                records = server.lookup(list(missing.values()))
+            except OSError as err:
+                print_red(f'{" ".join(server.cmd)}: {err}')
+                return [results.get(key) for key in keys]
+            for key, translation in zip(missing.keys(), records):
+                decoded = None
                 if b'?? ??:0' not in translation:
                     decoded = translation.decode()
-                    return decoded if not is_rom else decoded.replace('at ??:?', 'in ROM')
-            except OSError as err:
-                print_red(f'{" ".join(cmd)}: {err}')
-        return None
+                    decoded = decoded if not is_rom else decoded.replace('at ??:?', 'in ROM')
+                self._cache[key] = decoded
+                results[key] = decoded
+            while len(self._cache) > ADDR2LINE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+        return [results[key] for key in keys]
+
+    def close(self):
+        with self._lock:
+            for server in self._addr2line_servers.values():
+                server.close()
+            self._addr2line_servers = {}
 
 
 class AddressMatcher:
@@ -112,7 +276,7 @@ class AddressMatcher:
         """
         :param elf_path: the path to the ELF file
         """
-        self.intervals = []
+        intervals = []
         if elf_path and os.path.exists(elf_path):
             with open(elf_path, 'rb') as file:
                 elf = ELFFile(file)
@@ -122,9 +286,26 @@ class AddressMatcher:
                         start = section['sh_addr']
                         size = section['sh_size']
                         end = start + size
-                        self.intervals.append((start, end))
+                        intervals.append((start, end))
 
-        self.intervals = sorted(self.intervals)
+        self.set_intervals(intervals)
+
+    def set_intervals(self, intervals):
+        """
+        merge the overlapping and adjacent intervals, and split them into sorted start and end lists for bisect
+        """
+        self.intervals = []
+        for start, end in sorted(intervals):
+            if start >= end:
+                continue
+            if self.intervals and start <= self.intervals[-1][1]:
+                self.intervals[-1] = (self.intervals[-1][0], max(self.intervals[-1][1], end))
+            else:
+                self.intervals.append((start, end))
+        self._starts = [start for start, _ in self.intervals]
+        self._ends = [end for _, end in self.intervals]
+        # results of recently checked addresses, the same addresses tend to repeat in logs
+        self._cache = {}
 
     def is_executable_address(self, addr: int) -> bool:
         """
@@ -133,10 +314,11 @@ class AddressMatcher:
         :param addr: the address to check
         :return: True if the address is in executable section, False otherwise
         """
-        for start, end in self.intervals:
-            if start > addr:
-                return False
-            if start <= addr < end:
-                return True
-
-        return False
+        result = self._cache.get(addr)
+        if result is None:
+            index = bisect_right(self._starts, addr) - 1
+            result = index >= 0 and addr < self._ends[index]
+            if len(self._cache) >= ADDRESS_MATCHER_CACHE_SIZE:
+                self._cache.clear()
+            self._cache[addr] = result
+        return result
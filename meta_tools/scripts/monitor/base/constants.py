@@ -25,6 +25,12 @@ TAG_SERIAL_FLUSH = 2
 TAG_CMD = 3
 
 EVENT_QUEUE_TIMEOUT = 0.03  # timeout before raising queue.Empty exception in case of empty event queue
+OUTPUT_BATCH_MAX_ITEMS = 1024  # max output queue items written to terminal and log file at once
+LOG_FILE_FLUSH_INTERVAL = 0.5  # interval in seconds for flushing the log file
+
+# background address decoding, translations are output right after their lines
+ADDRESS_DECODE_MAX_PENDING = 256  # lines being decoded, lines out of a stack trace are not decoded when reached
+ADDRESS_DECODE_WAIT = 0.05  # max seconds the output waits for a translation, a later one is output when done
 
 GDB_UART_CONTINUE_COMMAND = "+$c#63"
 GDB_EXIT_TIMEOUT = 0.3  # time delay between exit and writing GDB_UART_CONTINUE_COMMAND
@@ -38,6 +44,14 @@ ASYNC_CLOSING_WAIT_NONE = 0xFFFF  # don't wait at all
 RECONNECT_DELAY = 0.5  # timeout between reconnect tries
 CHECK_ALIVE_FLAG_TIMEOUT = 0.25  # timeout for checking alive flags (currently used by serial reader)
 
+# fast read mode of serial reader for high baud rates
+# a block read returns when the line is idle for FAST_READ_INTER_BYTE_TIMEOUT, or when the block is full,
+# the block holds the data received in FAST_READ_BATCH_LATENCY at the current baud rate
+FAST_READ_INTER_BYTE_TIMEOUT = 0.002
+FAST_READ_BATCH_LATENCY = 0.02
+FAST_READ_MIN_BLOCK_SIZE = 4096
+READ_STATS_INTERVAL = 5  # interval in seconds for printing serial reader statistics
+
 TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
 
 GDB_PRINTF_REGISTER_INFO_START = "Register Infos Start"
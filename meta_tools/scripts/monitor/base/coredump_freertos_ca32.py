@@ -28,6 +28,10 @@ STACK_END_PATTERN = re.compile('StackEnd: (0x[\da-f]{8})', flags=re.I)
 STACK_DEPTH_PATTERN = re.compile(r'.*?dump\s+stack\s+depth\s+=\s*(\d+)$', flags=re.I)
 STACK_DATA_PATTERN = re.compile(r'.*?\s+\[([\da-f]+)]\s+(((?:0x)?[\da-f]{8}\s*)+)', flags=re.I)
 
+# core dump markers contain COREDUMP_TRIGGER, data abort line contains DATAABORT_TRIGGER in any case
+COREDUMP_TRIGGER = '=========='
+DATAABORT_TRIGGER = 'abort'
+
 # coredump states
 COREDUMP_IDLE = 0
 COREDUMP_READING = 1
@@ -108,6 +112,11 @@ class CoreDump:
             self.log_handler.output_enabled = True
             self._coredump_buffer = ""
 
+    def needs_check(self, line):
+        # cheap test before the regex checks: lines out of a core dump are checked only if they contain a marker
+        return self._decode_coredumps and (self._reading_coredump != COREDUMP_IDLE or COREDUMP_TRIGGER in line or
+                                           DATAABORT_TRIGGER in line.lower())
+
     @contextmanager
     def check(self, line):  # type: (bytes) -> Generator
         self._check_coredump_trigger_before_print(line)
@@ -219,7 +228,13 @@ class RTOS_COREDUMP_Parser():
         print(stack_dump.crash_info)
         # print backtrace info
         print(f"\n{'=' * 20} Backtrace info {'=' * 20}")
-        for data in stack_dump.stack_datas:
-            output = self.address_decoder.decode_address(f"0x{data.actual_val:08x}")
-            if output:
-                print_red(output.strip())
+        nums = [f"0x{data.actual_val:08x}" for data in stack_dump.stack_datas]
+        try:
+            # one addr2line query for the whole stack
+            self.address_decoder.prefetch(nums)
+            for num in nums:
+                output = self.address_decoder.decode_address(num)
+                if output:
+                    print_red(output.strip())
+        finally:
+            self.address_decoder.close()
@@ -28,6 +28,9 @@ COREDUMP_LINE = r".*?#CD:(.*)"
 COREDUMP_END = r".*?#CD:END#"
 COREDUMP_ERROR_STR = r".*?#CD:ERROR CANNOT DUMP#"
 
+# all core dump markers contain it
+COREDUMP_TRIGGER = '#'
+
 # coredump states
 COREDUMP_IDLE = 0
 COREDUMP_READING = 1
@@ -108,6 +111,10 @@ class CoreDump:
             self.log_handler.output_enabled = True
             self._coredump_buffer = b''
 
+    def needs_check(self, line):
+        # cheap test before the regex checks: lines out of a core dump are checked only if they contain a marker
+        return self._decode_coredumps and (self._reading_coredump != COREDUMP_IDLE or COREDUMP_TRIGGER in line)
+
     @contextmanager
     def check(self, line):
         self._check_coredump_trigger_before_print(line)
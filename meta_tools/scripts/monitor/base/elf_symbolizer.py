@@ -0,0 +1,296 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from bisect import bisect_right
+from typing import Optional, Tuple
+
+from elftools.elf.elffile import ELFFile
+from elftools.elf.sections import NoteSection, SymbolTableSection
+
+from .color_output import print_red, print_yellow
+
+_CACHE_DIR_NAME = "AmebaMonitor"
+_CACHE_SUB_DIR = "symbols"
+_CACHE_MAGIC = b"RTKSYM1\n"
+_CACHE_HEADER = struct.Struct("<I")
+# entries kept in the cache directory, the least recently used ones are removed when a new entry is saved
+_CACHE_MAX_ENTRIES = 16
+# file index of the rows ending a line sequence, addresses from there on have no line info
+_NO_FILE = 0xFFFFFFFF
+
+
+def _get_cache_dir():
+    if sys.platform == "win32":
+        root = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    elif sys.platform == "darwin":
+        root = os.path.expanduser("~/Library/Caches")
+    else:
+        root = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(root, _CACHE_DIR_NAME, _CACHE_SUB_DIR)
+
+
+class ElfSymbolizer:
+    """
+    In-process replacement of addr2line: function symbols of .symtab and the DWARF line tables are parsed once into
+    sorted address arrays and looked up by bisect. The arrays are cached on disk keyed by the ELF build-id (or path,
+    size and mtime without build-id), and loaded in background.
+    Unlike addr2line -pfiaC, function names are not demangled and inlined frames are not reported.
+    """
+
+    def __init__(self, elf_file: str, use_cache: bool = True) -> None:
+        self.elf_file = elf_file
+        self.use_cache = use_cache
+        self.address_width = 8
+        # function index
+        self._func_starts = array("Q")
+        self._func_ends = array("Q")
+        self._func_names = []
+        # line index
+        self._line_addrs = array("Q")
+        self._line_files = array("I")
+        self._line_nums = array("I")
+        self._files = []
+        self._loaded = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # build or load the index in background, lookups wait for it
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.load, daemon=True)
+            self._thread.start()
+
+    def load(self):
+        try:
+            with open(self.elf_file, "rb") as file:
+                elf = ELFFile(file)
+                self.address_width = 16 if elf.elfclass == 64 else 8
+                cache_key = self._get_cache_key(elf)
+                if not (self.use_cache and self._load_cache(cache_key)):
+                    self._build_index(elf)
+                    if self.use_cache:
+                        self._save_cache(cache_key)
+        except Exception as e:
+            print_red(f"Cannot load symbols from {self.elf_file}: {e}")
+        finally:
+            self._loaded.set()
+
+    def _get_cache_key(self, elf) -> str:
+        build_id = None
+        for section in elf.iter_sections():
+            if isinstance(section, NoteSection):
+                for note in section.iter_notes():
+                    if note["n_type"] == "NT_GNU_BUILD_ID":
+                        build_id = note["n_desc"]
+        if build_id:
+            identity = f"build-id:{build_id}"
+        else:
+            stat = os.stat(self.elf_file)
+            identity = f"{os.path.realpath(self.elf_file)}|{stat.st_size}|{stat.st_mtime_ns}"
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def _build_index(self, elf):
+        # bit0 of ARM function symbols marks Thumb code, not part of the address
+        address_mask = ~1 if elf["e_machine"] == "EM_ARM" else ~0
+
+        functions = []
+        symtab = elf.get_section_by_name(".symtab")
+        if isinstance(symtab, SymbolTableSection):
+            for symbol in symtab.iter_symbols():
+                if symbol["st_info"]["type"] == "STT_FUNC" and symbol.name:
+                    start = symbol["st_value"] & address_mask
+                    functions.append((start, start + symbol["st_size"], symbol.name))
+        functions.sort()
+        # functions without size (e.g. in assembly) end at the next function
+        for index, (start, end, name) in enumerate(functions):
+            if end == start:
+                end = functions[index + 1][0] if index + 1 < len(functions) else start + 1
+                functions[index] = (start, end, name)
+        self._func_starts = array("Q", [f[0] for f in functions])
+        self._func_ends = array("Q", [f[1] for f in functions])
+        self._func_names = [f[2] for f in functions]
+
+        rows = []
+        files = {}
+        if elf.has_dwarf_info():
+            dwarf_info = elf.get_dwarf_info()
+            for cu in dwarf_info.iter_CUs():
+                line_program = dwarf_info.line_program_for_CU(cu)
+                if line_program is None:
+                    continue
+                comp_dir = cu.get_top_DIE().attributes.get("DW_AT_comp_dir")
+                comp_dir = comp_dir.value.decode("utf-8", errors="replace") if comp_dir else ""
+                file_indexes = self._get_file_indexes(line_program, comp_dir, files)
+                for entry in line_program.get_entries():
+                    state = entry.state
+                    if state is None:
+                        continue
+                    # end rows sort before a sequence starting at the same address, other rows of the same address
+                    # keep their order, the last one applies
+                    if state.end_sequence:
+                        rows.append((state.address, 0, len(rows), _NO_FILE, 0))
+                    else:
+                        rows.append((state.address, 1, len(rows), file_indexes.get(state.file, _NO_FILE), state.line))
+        rows.sort()
+        self._line_addrs = array("Q", [row[0] for row in rows])
+        self._line_files = array("I", [row[3] for row in rows])
+        self._line_nums = array("I", [row[4] for row in rows])
+        self._files = [None] * len(files)
+        for name, index in files.items():
+            self._files[index] = name
+
+    @staticmethod
+    def _get_file_indexes(line_program, comp_dir, files):
+        # file index of the line program -> index in the shared file name list
+        version = line_program.header["version"]
+        include_dirs = [d.decode("utf-8", errors="replace") if isinstance(d, bytes) else d
+                        for d in line_program.header["include_directory"]]
+        if version < 5:
+            include_dirs.insert(0, comp_dir)
+        file_indexes = {}
+        for index, file_entry in enumerate(line_program.header["file_entry"]):
+            name = file_entry.name
+            if isinstance(name, bytes):
+                name = name.decode("utf-8", errors="replace")
+            dir_index = file_entry.dir_index
+            # DWARF 5 indexes files from 0, earlier versions from 1, directory 0 is the compilation dir
+            if dir_index < len(include_dirs) and not os.path.isabs(name):
+                name = os.path.join(include_dirs[dir_index], name)
+            file_indexes[index if version >= 5 else index + 1] = files.setdefault(name, len(files))
+        return file_indexes
+
+    def _load_cache(self, cache_key) -> bool:
+        cache_file = os.path.join(_get_cache_dir(), f"{cache_key}.bin")
+        try:
+            with open(cache_file, "rb") as f:
+                if f.read(len(_CACHE_MAGIC)) != _CACHE_MAGIC:
+                    return False
+                header_size, = _CACHE_HEADER.unpack(f.read(_CACHE_HEADER.size))
+                header = json.loads(f.read(header_size).decode("utf-8"))
+                arrays = {}
+                for name, typecode in [("func_starts", "Q"), ("func_ends", "Q"), ("line_addrs", "Q"),
+                                       ("line_files", "I"), ("line_nums", "I")]:
+                    size = header["sizes"][name]
+                    data = f.read(size)
+                    if len(data) != size:
+                        # truncated entry
+                        return False
+                    arrays[name] = array(typecode)
+                    arrays[name].frombytes(data)
+                func_names = header["func_names"]
+                files = header["files"]
+        except (OSError, ValueError, KeyError, TypeError, struct.error):
+            # no or broken cache entry, will be rebuilt
+            return False
+
+        # a corrupt entry would make symbolize() fail with IndexError, rebuild it instead
+        func_count = len(arrays["func_starts"])
+        line_count = len(arrays["line_addrs"])
+        if not (isinstance(func_names, list) and isinstance(files, list) and
+                len(arrays["func_ends"]) == func_count == len(func_names) and
+                len(arrays["line_files"]) == line_count == len(arrays["line_nums"])):
+            return False
+        if any(file_index != _NO_FILE and file_index >= len(files) for file_index in set(arrays["line_files"])):
+            return False
+
+        self._func_starts = arrays["func_starts"]
+        self._func_ends = arrays["func_ends"]
+        self._func_names = func_names
+        self._line_addrs = arrays["line_addrs"]
+        self._line_files = arrays["line_files"]
+        self._line_nums = arrays["line_nums"]
+        self._files = files
+        try:
+            # mark the entry as recently used for the eviction
+            os.utime(cache_file)
+        except OSError:
+            pass
+        return True
+
+    def _save_cache(self, cache_key):
+        cache_dir = _get_cache_dir()
+        arrays = {
+            "func_starts": self._func_starts,
+            "func_ends": self._func_ends,
+            "line_addrs": self._line_addrs,
+            "line_files": self._line_files,
+            "line_nums": self._line_nums
+        }
+        header = json.dumps({
+            "func_names": self._func_names,
+            "files": self._files,
+            "sizes": {name: len(data) * data.itemsize for name, data in arrays.items()}
+        }).encode("utf-8")
+        try:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            # write to a temp file and rename, so that concurrent monitors never read a partial entry
+            fd, temp_file = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(_CACHE_MAGIC)
+                f.write(_CACHE_HEADER.pack(len(header)))
+                f.write(header)
+                for data in arrays.values():
+                    f.write(data.tobytes())
+            os.replace(temp_file, os.path.join(cache_dir, f"{cache_key}.bin"))
+        except OSError as e:
+            print_yellow(f"Cannot save symbol cache: {e}")
+            return
+        self._evict_cache(cache_dir)
+
+    @staticmethod
+    def _evict_cache(cache_dir, max_entries=_CACHE_MAX_ENTRIES):
+        # every rebuilt ELF adds an entry, keep the most recently used ones
+        entries = []
+        for name in os.listdir(cache_dir):
+            if name.endswith(".bin"):
+                path = os.path.join(cache_dir, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+        entries.sort(reverse=True)
+        for _, path in entries[max_entries:]:
+            try:
+                os.remove(path)
+            except OSError:
+                # removed by another monitor, or in use on Windows
+                pass
+
+    def symbolize(self, address: int) -> Tuple[Optional[str], Optional[str], int]:
+        """
+        Return (function, file, line) of the address, None (and line 0) for the unknown parts.
+        """
+        self._loaded.wait()
+
+        function = None
+        index = bisect_right(self._func_starts, address) - 1
+        if index >= 0 and address < self._func_ends[index]:
+            function = self._func_names[index]
+
+        file, line = None, 0
+        index = bisect_right(self._line_addrs, address) - 1
+        if index >= 0 and self._line_files[index] != _NO_FILE:
+            file = self._files[self._line_files[index]]
+            line = self._line_nums[index]
+
+        return function, file, line
+
+    def lookup(self, address: int) -> Optional[str]:
+        """
+        Return the translation of the address in the format of "addr2line -pfa", None if nothing is known.
+        """
+        function, file, line = self.symbolize(address)
+        if function is None and file is None:
+            return None
+        location = f"{file}:{line}" if file else "??:?"
+        return f"0x{address:0{self.address_width}x}: {function or '??'} at {location}\n"
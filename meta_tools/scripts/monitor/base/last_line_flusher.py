@@ -0,0 +1,39 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+import time
+
+from .constants import LAST_LINE_THREAD_INTERVAL
+
+
+class LastLineFlusher(object):
+    """
+    Deadline for finishing the last line sent without EOL, polled by the main loop within its queue timeout:
+    the line is finished when no serial data has been received for LAST_LINE_THREAD_INTERVAL.
+    """
+
+    def __init__(self, interval=LAST_LINE_THREAD_INTERVAL):
+        self.interval = interval
+        self.deadline = None
+
+    def touch(self):
+        # serial data received, restart the idle period
+        self.deadline = time.monotonic() + self.interval
+
+    def cancel(self):
+        self.deadline = None
+
+    def get_timeout(self, timeout):
+        # queue timeout which wakes the main loop no later than the deadline
+        if self.deadline is None:
+            return timeout
+        return max(0, min(timeout, self.deadline - time.monotonic()))
+
+    def expired(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.deadline = None
+            return True
+        return False
@@ -8,14 +8,21 @@ import datetime
 import os
 import queue
 import re
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from typing import List, Optional, Union
 from serial.tools.miniterm import Console
 
-from .address_decoder import AddressDecoder
+from .address_decoder import AddressDecoder, SYMBOLIZER_AUTO
 from serial.tools import miniterm
+from .logagg_demux import LogAggDemux
+from .log_source import LogSource, parse_logagg_sources
 from .key_config import MENU_KEY, TOGGLE_OUTPUT_KEY
 from .color_output import print_red, print_yellow
-from .constants import TIME_FORMAT, EVENT_QUEUE_TIMEOUT
+from .constants import TIME_FORMAT, EVENT_QUEUE_TIMEOUT, OUTPUT_BATCH_MAX_ITEMS, LOG_FILE_FLUSH_INTERVAL, \
+    ADDRESS_DECODE_MAX_PENDING, ADDRESS_DECODE_WAIT
 from .stoppable_thread import StoppableThread
 from queue import Queue
 
@@ -23,32 +30,53 @@ key_description = miniterm.key_description
 
 STACKTRACE_START = '.*?(========== Stack Trace ==========.*)'
 STACKTRACE_END = '========== End of Stack Trace =========='
+STACKTRACE_START_RE = re.compile(STACKTRACE_START, flags=re.I)
+STACKTRACE_END_RE = re.compile(STACKTRACE_END, flags=re.I)
+# cheap test before the regex checks, both stack trace markers contain it
+STACKTRACE_TRIGGER = '=========='
 
 
 class LogHandler(StoppableThread):
     def __init__(self, elf_file: str, output_queue:Queue, timestamps: bool, enable_address_decoding: bool,
-                 toolchain_path: str, log_enabled: bool, log_dir: str,  port: str, logAGG: Optional[List[str]], rom_elf_file: Union[str, None] = None):
+                 toolchain_path: str, log_enabled: bool, log_dir: str,  port: str, logAGG: Optional[List[str]], rom_elf_file: Union[str, None] = None,
+                 logAGG_hide: Optional[List[str]] = None, logAGG_history: int = 0, logAGG_split_log: bool = False,
+                 symbolizer: str = SYMBOLIZER_AUTO, decode_all_lines: bool = False):
         super(LogHandler, self).__init__()
         self.log_file = None
         self.log_dir = log_dir
         self.log_enabled = log_enabled
         self.log_date = None
+        self._log_flush_time = 0
+        self._log_unflushed = False
         self.port = port
         self.output_enabled = True
         self.output_queue = output_queue
-        self._start_of_line = True
         self.elf_file = elf_file
         self.timestamps = timestamps
         self.timestamp_format = TIME_FORMAT
-        self._buf = bytearray()
+        self._timestamp_ms = None
+        self._timestamp = ""
         self.running = False
-        self.logAGG_srcname = logAGG or []
-        self.logAGG_src = 2**len(self.logAGG_srcname) - 1
+        # output state per source ID (pathnum), 0 for the plain serial output
+        self.sources = {0: LogSource(0, history_lines=logAGG_history)}
+        for source_id, name in parse_logagg_sources(logAGG).items():
+            self.sources[source_id] = LogSource(source_id, name, display=name not in (logAGG_hide or []),
+                                                history_lines=logAGG_history)
+        self._all_sources_displayed = all(source.display for source in self.sources.values())
+        self.logAGG_split_log = logAGG_split_log
+        self.logAGG_demux = LogAggDemux([source_id for source_id in self.sources if source_id])
         self._stacktrace = False
+        self.decode_all_lines = decode_all_lines
         if enable_address_decoding:
-            self.address_decoder = AddressDecoder(toolchain_path, elf_file, rom_elf_file)
+            self.address_decoder = AddressDecoder(toolchain_path, elf_file, rom_elf_file, symbolizer)
+            # addresses are decoded in background, the translation is queued as a future right after its line,
+            # one worker since the lookups are serialized by the decoder anyway
+            self._decode_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="address_decoder")
+            self._decode_slots = threading.BoundedSemaphore(ADDRESS_DECODE_MAX_PENDING)
+            self._decode_skipped = 0
         else:
             self.address_decoder = None
+            self._decode_pool = None
         if self.log_enabled:
             self.start_logging()
 
@@ -56,22 +84,100 @@ class LogHandler(StoppableThread):
         self.running = True
         while self.running:
             try:
-                text = self.output_queue.get(timeout=EVENT_QUEUE_TIMEOUT)           
+                items = [self.output_queue.get(timeout=EVENT_QUEUE_TIMEOUT)]
             except queue.Empty:
+                self._flush_log_file()
                 continue
 
-            if self.output_enabled:
-                print(text, end='')
-            if self.log_file:
-                if datetime.datetime.now().date() != self.log_date:
-                    self.stop_logging()
-                    self.start_logging()
-                try:
-                    self.log_file.write(text)
-                    self.log_file.flush()
-                except Exception as e:
-                    print_red(f"\nCannot write to file: {e}")
-                    self.stop_logging()
+            # drain everything available and output it at once, items are (source ID, text),
+            # or (source ID, future) of an address translation, which is output in place when done
+            try:
+                while len(items) < OUTPUT_BATCH_MAX_ITEMS:
+                    items.append(self.output_queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            resolved = []
+            # the translations of a batch share one short wait
+            deadline = None
+            for source_id, text in items:
+                if not isinstance(text, Future):
+                    resolved.append((source_id, text))
+                    continue
+                if not text.done():
+                    # output the lines before the translation while waiting shortly for it
+                    self._write_items(resolved)
+                    resolved = []
+                    if deadline is None:
+                        deadline = time.monotonic() + ADDRESS_DECODE_WAIT
+                    wait([text], timeout=max(0, deadline - time.monotonic()))
+                if text.done():
+                    resolved.append((source_id, self._get_translation(text)))
+                else:
+                    # slow translation, the output goes on and the translation follows when done
+                    text.add_done_callback(
+                        lambda future, source_id=source_id: self.output_queue.put(
+                            (source_id, self._get_translation(future)), False))
+            self._write_items(resolved)
+
+    @staticmethod
+    def _get_translation(future):
+        try:
+            return future.result() or ""
+        except Exception:
+            # failed, the line is output without translation
+            return ""
+
+    def _write_items(self, items):
+        if not items:
+            return
+        text = "".join([item[1] for item in items])
+        if self.output_enabled:
+            if self._all_sources_displayed:
+                sys.stdout.write(text)
+            else:
+                sys.stdout.write("".join([item[1] for item in items if self.sources[item[0]].display]))
+            sys.stdout.flush()
+        if self.log_file:
+            if datetime.datetime.now().date() != self.log_date:
+                self.stop_logging()
+                self.start_logging()
+            try:
+                self.log_file.write(text)
+                if self.logAGG_split_log:
+                    self._write_source_log_files(items)
+                self._log_unflushed = True
+            except Exception as e:
+                print_red(f"\nCannot write to file: {e}")
+                self.stop_logging()
+                return
+            if time.monotonic() - self._log_flush_time >= LOG_FILE_FLUSH_INTERVAL:
+                self._flush_log_file()
+
+    def _write_source_log_files(self, items):
+        for source_id, text in items:
+            if source_id:
+                self.sources[source_id].log_pending.append(text)
+        for source in self.sources.values():
+            if source.log_pending:
+                if source.log_file:
+                    source.log_file.write("".join(source.log_pending))
+                source.log_pending.clear()
+
+    def _flush_log_file(self):
+        # the log file is flushed periodically instead of per write, and when the output goes idle
+        if not (self.log_file and self._log_unflushed):
+            return
+        try:
+            self.log_file.flush()
+            for source in self.sources.values():
+                if source.log_file:
+                    source.log_file.flush()
+        except Exception as e:
+            print_red(f"\nCannot write to file: {e}")
+            self.stop_logging()
+        self._log_unflushed = False
+        self._log_flush_time = time.monotonic()
 
     def _stop(self):
         """Stop the log output and clean up resources"""
@@ -79,6 +185,24 @@ class LogHandler(StoppableThread):
         self.stop_logging()
         self.running = False
         self.stop()
+        self.print_hidden_history()
+        if self.address_decoder:
+            self._decode_pool.shutdown(wait=False)
+            self.address_decoder.close()
+
+    def print_hidden_history(self):
+        # sources hidden from the terminal show their last lines on exit
+        for source in self.sources.values():
+            if not source.display and source.history:
+                print_yellow(f"--- Last {len(source.history)} lines of {source.name} ---")
+                sys.stdout.write("".join(source.history))
+                sys.stdout.flush()
+
+    def get_history(self, source_id: int = 0) -> List[str]:
+        source = self.sources.get(source_id)
+        if source is None or source.history is None:
+            return []
+        return list(source.history)
 
     @property
     def address_buffer(self):
@@ -110,6 +234,16 @@ class LogHandler(StoppableThread):
                 print_yellow(f"Logging is enabled into file {name}")
             except Exception as e:
                 print_red(f"\nLog file {name} cannot be created: {e}")
+                return
+            if self.logAGG_split_log:
+                for source in self.sources.values():
+                    if not source.id:
+                        continue
+                    source_name = f"{os.path.splitext(name)[0]}_{source.name}.txt"
+                    try:
+                        source.log_file = open(source_name, "w")
+                    except Exception as e:
+                        print_red(f"\nLog file {source_name} cannot be created: {e}")
 
     def stop_logging(self):
         if self.log_file:
@@ -121,42 +255,54 @@ class LogHandler(StoppableThread):
                 print_red(f"\nLog file cannot be closed: {e}")
             finally:
                 self.log_file = None
+        for source in self.sources.values():
+            if source.log_file:
+                try:
+                    source.log_file.close()
+                except Exception as e:
+                    print_red(f"\nLog file cannot be closed: {e}")
+                finally:
+                    source.log_file = None
+
+    def get_timestamp(self):
+        # lines received in the same millisecond share one formatted timestamp
+        now = time.time()
+        now_ms = int(now * 1000)
+        if now_ms != self._timestamp_ms:
+            self._timestamp_ms = now_ms
+            self._timestamp = datetime.datetime.fromtimestamp(now).strftime(self.timestamp_format)[:-3]
+        return self._timestamp
 
     def print(self, text, pathnum: int = 0):
         new_line_char = "\n"
-        text = text.replace("\r\n", "\n")
-        text = text.replace("\r", "")
+        source = self.sources.get(pathnum) or self.sources[0]
+        if "\r" in text:
+            text = text.replace("\r\n", "\n")
+            text = text.replace("\r", "")
         if text and self.timestamps and (self.output_enabled or self.log_file):
-            t = datetime.datetime.now().strftime(self.timestamp_format)[:-3]
             # "text" is not guaranteed to be a full line. Timestamps should be only at the beginning of lines.
+            line_prefix = self.get_timestamp() + source.line_prefix_suffix
 
-            if pathnum == 0:
-                line_prefix = t + " "
-            elif pathnum == 0x1:
-               line_prefix = t + f" [{self.logAGG_srcname[0]}]"
-            elif pathnum == 0x2:
-                line_prefix = t + f" [{self.logAGG_srcname[1]}]"
-            elif pathnum == 0x4:
-                line_prefix = t + f" [{self.logAGG_srcname[2]}]"                     
-            
             # If the output is at the start of a new line, prefix it with the timestamp text.
-            if self._start_of_line:
+            if source.start_of_line:
                 text = line_prefix + text
 
             # If the new output ends with a newline, remove it so that we don't add a trailing timestamp.
-            self._start_of_line = text.endswith(new_line_char)
-            if self._start_of_line:
+            source.start_of_line = text.endswith(new_line_char)
+            if source.start_of_line:
                 text = text[:-len(new_line_char)]
 
             text = text.replace(new_line_char, new_line_char + line_prefix)
 
             # If we're at the start of a new line again, restore the final newline.
-            if self._start_of_line:
+            if source.start_of_line:
                 text += new_line_char
         elif text:
-            self._start_of_line = text.endswith(new_line_char)
+            source.start_of_line = text.endswith(new_line_char)
 
-        self.output_queue.put(text, False)   
+        if source.history is not None and text:
+            source.history.append(text)
+        self.output_queue.put((source.id, text), False)
 
     def output_toggle(self):  # type: () -> None
         self.output_enabled = not self.output_enabled
@@ -164,11 +310,16 @@ class LogHandler(StoppableThread):
                      f"Type {key_description(MENU_KEY)} {key_description(TOGGLE_OUTPUT_KEY)} "
                      "to show/disable output again.")
 
-    def handle_possible_address_in_line(self, line) -> None:
+    def handle_possible_address_in_line(self, line, pathnum: int = 0) -> None:
         if not self.address_decoder:
             return
-        stacktrace_start_mo = re.search(STACKTRACE_START, line.strip(), flags=re.I)
-        stcaktrace_end_mo = re.search(STACKTRACE_END, line.strip(), flags=re.I)
+        if STACKTRACE_TRIGGER not in line:
+            # fast path, no stack trace marker
+            if self._stacktrace or self.decode_all_lines:
+                self._decode_address_in_line(line, pathnum)
+            return
+        stacktrace_start_mo = STACKTRACE_START_RE.search(line.strip())
+        stcaktrace_end_mo = STACKTRACE_END_RE.search(line.strip())
         if stacktrace_start_mo:
             self._stacktrace = True
             return
@@ -176,12 +327,35 @@ class LogHandler(StoppableThread):
             self._stacktrace = False
             return
 
-        if self._stacktrace:
-        #if True:
-            translation = self.address_decoder.decode_address(line)
-            if translation:
-                self.output_queue.put(translation, False)
-                #print_yellow(translation)
+        if self._stacktrace or self.decode_all_lines:
+            self._decode_address_in_line(line, pathnum)
+
+    def _decode_address_in_line(self, line, pathnum: int = 0):
+        # the line buffer is kept here, the workers only decode complete text
+        text = self.address_buffer + line
+        self.address_buffer = ""
+        if "0x" not in text and "0X" not in text:
+            return
+        # a stack trace waits for a free slot, other lines are not decoded when too many are pending
+        if not self._decode_slots.acquire(blocking=self._stacktrace):
+            if not self._decode_skipped:
+                print_yellow(f"\nAddress decoding is {ADDRESS_DECODE_MAX_PENDING} lines behind, "
+                             "lines are not decoded until it catches up")
+            self._decode_skipped += 1
+            return
+        if self._decode_skipped:
+            print_yellow(f"\nAddress decoding caught up, {self._decode_skipped} lines were not decoded")
+            self._decode_skipped = 0
+        try:
+            future = self._decode_pool.submit(self.address_decoder.decode_line, text)
+        except RuntimeError:
+            # pool shut down on exit
+            self._decode_slots.release()
+            return
+        future.add_done_callback(lambda _: self._decode_slots.release())
+        # the translation belongs to the source of its line, for display and split log
+        source = self.sources.get(pathnum) or self.sources[0]
+        self.output_queue.put((source.id, future), False)
 
     def logAGG_parse(self, data: bytes):
         """
@@ -189,55 +363,4 @@ class LogHandler(StoppableThread):
         Returns:
           [ ("raw", b"..."), ("frame", src, b"..."), ... ]
         """
-        events = []
-        self._buf.extend(data)
-
-        while self._buf:
-            "" " 1) find first 0xFF to sync " ""
-            try:
-                idx = self._buf.index(0xFF)
-            except ValueError:
-                "" "if 0xFF is not found，output as raw" ""
-                events.append(("raw", bytes(self._buf)))
-                self._buf.clear()
-                break
-            "" "if bytes before 0xFF，output as raw" ""
-            if idx > 0:
-                events.append(("raw", bytes(self._buf[:idx])))
-                del self._buf[:idx]
-
-            "" "make sure there are at lease header byte, otherwise wait for further input" ""
-            if len(self._buf) < 2:
-                break
-
-            "" " 2) parse header " ""
-            header = self._buf[1]
-            src    = (header >> 5) & 0x07
-            length = ((header >> 2) & 0x07) + 1
-            csum   = header & 0x03  # bit1~0
-
-            """ make sure the whole payload is here """
-            if len(self._buf) < 2 + length:
-                break
-
-            "" " cut the whole payload " ""
-            frame = bytes(self._buf[: 2 + length])
-            del self._buf[: 2 + length]
-
-            "" " 3) checksum compare：bit1 must be 0，bit0 == popcount(header>>2) % 2 " ""
-            "" " header bit7~2 """
-            high6 = header >> 2              
-            odd_parity = bin(high6).count("1") & 1 
-            bit1_ok = (csum & 0x2) == 0
-            bit0_ok = (csum & 0x1) == odd_parity
-            if not (bit1_ok and bit0_ok):
-                "" " checksum fail, output frame as raw " ""
-                events.append(("raw", frame))
-                continue
-            "" " 4) checksum pass and src matched, output frame as frame " ""
-            if src in (0x1, 0x2, 0x4) and (src & self.logAGG_src) != 0:
-                payload = frame[2:]
-                events.append(("frame", src, payload))
-
-        return events
-
+        return self.logAGG_demux.feed(data)
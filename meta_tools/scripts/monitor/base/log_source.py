@@ -0,0 +1,59 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+from collections import deque
+from typing import Dict, List, Optional
+
+# source IDs encoded by the 3-bit src field of logAGG header, 0 is the plain serial output
+LOGAGG_SOURCE_IDS = range(1, 8)
+# IDs of the sources given by plain names, in order
+LOGAGG_LEGACY_SOURCE_IDS = [0x1, 0x2, 0x4]
+
+
+def parse_logagg_sources(specs: Optional[List[str]]) -> Dict[int, str]:
+    """
+    Parse the --logAGG sources: "NAME=ID" with ID 1~7, or plain names for the IDs 0x1, 0x2 and 0x4 in order.
+    Raise ValueError for invalid sources.
+    """
+    sources = {}
+    for index, spec in enumerate(specs or []):
+        if "=" in spec:
+            name, _, value = spec.partition("=")
+            try:
+                source_id = int(value, 0)
+            except ValueError:
+                raise ValueError(f"Invalid logAGG source ID in '{spec}'")
+        elif index < len(LOGAGG_LEGACY_SOURCE_IDS):
+            name, source_id = spec, LOGAGG_LEGACY_SOURCE_IDS[index]
+        else:
+            raise ValueError(f"logAGG source '{spec}' needs an ID, use NAME=ID with ID 1~7")
+
+        if not name:
+            raise ValueError(f"Empty logAGG source name in '{spec}'")
+        if source_id not in LOGAGG_SOURCE_IDS:
+            raise ValueError(f"logAGG source ID in '{spec}' out of range 1~7")
+        if source_id in sources:
+            raise ValueError(f"Duplicated logAGG source ID {source_id} for '{sources[source_id]}' and '{name}'")
+        sources[source_id] = name
+    return sources
+
+
+class LogSource(object):
+    """
+    Output state of one log source: the plain serial output (ID 0) or a logAGG source (ID 1~7).
+    """
+
+    def __init__(self, source_id: int, name: str = "", display: bool = True, history_lines: int = 0):
+        self.id = source_id
+        self.name = name
+        # timestamp prefix is followed by the source name
+        self.line_prefix_suffix = f" [{name}]" if source_id else " "
+        self.display = display
+        self.start_of_line = True
+        # ring buffer of the last lines
+        self.history = deque(maxlen=history_lines) if history_lines > 0 else None
+        self.log_file = None
+        self.log_pending = []
@@ -0,0 +1,96 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2024 Realtek Semiconductor Corp.
+# SPDX-License-Identifier: Apache-2.0
+
+from typing import Iterable, List, Tuple
+
+LOGAGG_SYNC = 0xFF
+LOGAGG_HEADER_SIZE = 2
+
+
+def _is_header_valid(header):
+    # checksum bit1~0 of header: bit1 must be 0, bit0 == popcount(header>>2) % 2
+    return (header & 0x2) == 0 and (header & 0x1) == (bin(header >> 2).count("1") & 1)
+
+
+# per header byte: frame length (header and payload), 0 if the header checksum fails
+_FRAME_LENGTH = bytes([LOGAGG_HEADER_SIZE + ((header >> 2) & 0x07) + 1 if _is_header_valid(header) else 0
+                       for header in range(256)])
+# per header byte: frame length regardless of checksum, a failed frame is output as raw
+_RAW_FRAME_LENGTH = bytes([LOGAGG_HEADER_SIZE + ((header >> 2) & 0x07) + 1 for header in range(256)])
+
+
+class LogAggDemux(object):
+    """
+    logAGG frame demultiplexer: 0xFF | header (src bit7~5, payload length - 1 bit4~2, checksum bit1~0) | payload.
+
+    The buffer is parsed by offset in one pass and consumed once per feed, consecutive data of the same source
+    (or raw data) is merged into one event.
+    """
+
+    def __init__(self, sources: Iterable[int]):
+        self.sources = frozenset(sources)
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> List[Tuple]:
+        """
+        Returns:
+          [ ("raw", b"..."), ("frame", src, b"..."), ... ]
+        """
+        buf = self._buf
+        buf.extend(data)
+        size = len(buf)
+        sources = self.sources
+        frame_length = _FRAME_LENGTH
+
+        # merged events as [src, [parts]], src None for raw data
+        merged = []
+        last_src = -1
+        last_parts = None
+        pos = 0
+        while pos < size:
+            # 1) find 0xFF to sync, bytes before it are raw
+            if buf[pos] != LOGAGG_SYNC:
+                idx = buf.find(LOGAGG_SYNC, pos)
+                if idx < 0:
+                    idx = size
+                if last_src is not None:
+                    last_src = None
+                    last_parts = []
+                    merged.append((None, last_parts))
+                last_parts.append(buf[pos:idx])
+                pos = idx
+                if pos == size:
+                    break
+
+            # 2) wait for further input if the header or the payload is incomplete
+            if size - pos < LOGAGG_HEADER_SIZE:
+                break
+            header = buf[pos + 1]
+            length = frame_length[header]
+            end = pos + (length or _RAW_FRAME_LENGTH[header])
+            if end > size:
+                break
+
+            # 3) checksum fail: output frame as raw; checksum pass and src matched: output payload of the src
+            if not length:
+                src = None
+                start = pos
+            else:
+                src = header >> 5
+                start = pos + LOGAGG_HEADER_SIZE
+                if src not in sources:
+                    pos = end
+                    continue
+            if src != last_src:
+                last_src = src
+                last_parts = []
+                merged.append((src, last_parts))
+            last_parts.append(buf[start:end])
+            pos = end
+
+        del buf[:pos]
+
+        return [("raw", b"".join(parts)) if src is None else ("frame", src, b"".join(parts)) for src, parts in merged]
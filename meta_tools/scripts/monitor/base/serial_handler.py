@@ -20,80 +20,65 @@ class SerialHandler:
 
     def __init__(self, last_line_part, logger, target_os, elf_file):
         # type: (str,  LogHandler, str,   serial.Serial, str) -> None
-        self._last_line_part = last_line_part
-        self._np_last_line_part = ""
-        self._lp_last_line_part = ""
-        self._ap_last_line_part = ""
+        # unfinished line per pathnum, 0 for plain output and the logAGG source otherwise
+        self._last_line_parts = {0: last_line_part}
         self.log_handler = logger
         self.target = target_os
         self.elf_file = elf_file
 
+    @property
+    def _last_line_part(self):
+        return self._last_line_parts.get(0, "")
+
+    @_last_line_part.setter
+    def _last_line_part(self, value):
+        self._last_line_parts[0] = value
+
     def split_data(self, data: str, pathnum: int) -> List[str]:
         """
         Split data into lines, while keeping newlines, and move unfinished line for future processing
         """
         # if data is empty fallback to empty string for easier concatenation with last line
         sp = data.splitlines(keepends=True) or [""]
-        if pathnum == 0:        
-            if self._last_line_part != "":
-                # add unprocessed part from previous "data" to the first line
-                sp[0] = self._last_line_part + sp[0]
-                self._last_line_part = ""
-            if not sp[-1].endswith("\n"):
-                # last part is not a full line
-                self._last_line_part = sp.pop(-1)
-        elif pathnum == 0x01:
-            if self._np_last_line_part != "":
-                # add unprocessed part from previous "data" to the first line
-                sp[0] = self._np_last_line_part + sp[0]
-                self._np_last_line_part = ""
-            if not sp[-1].endswith("\n"):
-                # last part is not a full line
-                self._np_last_line_part = sp.pop(-1)
-        elif pathnum == 0x02:
-            if self._lp_last_line_part != "":
-                # add unprocessed part from previous "data" to the first line
-                sp[0] = self._lp_last_line_part + sp[0]
-                self._lp_last_line_part = ""
-            if not sp[-1].endswith("\n"):
-                # last part is not a full line
-                self._lp_last_line_part = sp.pop(-1)
-        elif pathnum == 0x04:
-            if self._ap_last_line_part != "":
-                # add unprocessed part from previous "data" to the first line
-                sp[0] = self._ap_last_line_part + sp[0]
-                self._ap_last_line_part = ""
-            if not sp[-1].endswith("\n"):
-                # last part is not a full line
-                self._ap_last_line_part = sp.pop(-1)
+        last_line_part = self._last_line_parts.get(pathnum, "")
+        if last_line_part != "":
+            # add unprocessed part from previous "data" to the first line
+            sp[0] = last_line_part + sp[0]
+        if not sp[-1].endswith("\n"):
+            # last part is not a full line
+            self._last_line_parts[pathnum] = sp.pop(-1)
+        elif last_line_part != "":
+            self._last_line_parts[pathnum] = ""
         return sp
 
     def handle_serial_input(self, data, coredump, pathnum: int = 0, finalize_line=False):
-        
+        log_handler = self.log_handler
         sp = self.split_data(
             data, pathnum)  # confirm that sp is a list of entire lines and the left part will be stored in _last_line_part
         for line in sp:
-            # line_strip = line.strip()
-            line_strip = line
-            if coredump:
-                with coredump.check(line_strip):
-                    self.log_handler.print(line, pathnum)
-                    self.log_handler.handle_possible_address_in_line(line_strip)
+            # coredump check only runs for lines which may belong to a core dump, see CoreDump.needs_check
+            if coredump and coredump.needs_check(line):
+                with coredump.check(line):
+                    log_handler.print(line, pathnum)
+                    log_handler.handle_possible_address_in_line(line, pathnum)
             else:
-                self.log_handler.print(line, pathnum)
-                self.log_handler.handle_possible_address_in_line(line_strip)
+                log_handler.print(line, pathnum)
+                log_handler.handle_possible_address_in_line(line, pathnum)
 
-        # we need to decide whether to handle the _last_line_part
-        if self._last_line_part != "" and finalize_line:
-            self.log_handler.print(self._last_line_part)
-            self.log_handler.handle_possible_address_in_line(self._last_line_part)
-            # It is possible that the incomplete line cuts in half the PC
-            # address. A small buffer is kept and will be used the next time
-            # handle_possible_pc_address_in_line is invoked to avoid this problem.
-            # ADDRESS_RE matches 10 character long addresses. Therefore, we
-            # keep the last 9 characters.
-            self.log_handler.address_buffer = self._last_line_part[-9:]
-            self._last_line_part = ""
+        # we need to decide whether to handle the unfinished line of every source
+        if finalize_line:
+            for last_pathnum, last_line_part in self._last_line_parts.items():
+                if last_line_part == "":
+                    continue
+                log_handler.print(last_line_part, last_pathnum)
+                log_handler.handle_possible_address_in_line(last_line_part, last_pathnum)
+                # It is possible that the incomplete line cuts in half the PC
+                # address. A small buffer is kept and will be used the next time
+                # handle_possible_pc_address_in_line is invoked to avoid this problem.
+                # ADDRESS_RE matches 10 character long addresses. Therefore, we
+                # keep the last 9 characters.
+                log_handler.address_buffer = last_line_part[-9:]
+                self._last_line_parts[last_pathnum] = ""
 
     def handle_commands(self, cmd: int, console_reader: ConsoleReader, serial_reader: Union[SerialReader, LinuxReader]):
         if cmd == CMD_STOP:
@@ -12,7 +12,8 @@ import serial
 from serial import Serial
 from serial.tools import list_ports
 
-from .constants import ASYNC_CLOSING_WAIT_NONE, CHECK_ALIVE_FLAG_TIMEOUT, RECONNECT_DELAY, TAG_SERIAL, TAG_KEY
+from .constants import ASYNC_CLOSING_WAIT_NONE, CHECK_ALIVE_FLAG_TIMEOUT, RECONNECT_DELAY, TAG_SERIAL, TAG_KEY, \
+    FAST_READ_INTER_BYTE_TIMEOUT, FAST_READ_BATCH_LATENCY, FAST_READ_MIN_BLOCK_SIZE, READ_STATS_INTERVAL
 from .color_output import print_red, print_yellow
 from .stoppable_thread import StoppableThread
 import os
@@ -39,6 +40,45 @@ if remote_service_path.exists():
         RemoteSerial = None
         print(f"error: RemoteSerial ImportException: ", str(e))
 
+class ReadStats(object):
+    """
+    Received bytes per second and event queue depth of the serial reader, updated per pushed batch.
+    """
+
+    def __init__(self, interval=READ_STATS_INTERVAL):
+        self.interval = interval
+        self.total_bytes = 0
+        self.batches = 0
+        self.bytes_per_second = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.start_time = time.monotonic()
+        self._window_start = self.start_time
+        self._window_bytes = 0
+
+    def update(self, size, queue_depth):
+        # return True when a new bytes/sec window is completed
+        self.total_bytes += size
+        self.batches += 1
+        self.queue_depth = queue_depth
+        self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+        self._window_bytes += size
+
+        now = time.monotonic()
+        if now - self._window_start < self.interval:
+            return False
+        self.bytes_per_second = self._window_bytes / (now - self._window_start)
+        self._window_start = now
+        self._window_bytes = 0
+        return True
+
+    def __str__(self):
+        elapsed = max(time.monotonic() - self.start_time, 1e-6)
+        return (f"{self.bytes_per_second / 1024:.1f} KB/s (average {self.total_bytes / elapsed / 1024:.1f} KB/s), "
+                f"{self.total_bytes} bytes in {self.batches} batches, "
+                f"queue depth {self.queue_depth} (max {self.max_queue_depth})")
+
+
 class SerialReader(StoppableThread):
     """
     Read data from the serial port and push to the event queue, until stopped.
@@ -50,7 +90,9 @@ class SerialReader(StoppableThread):
                  debug=False,
                  remote_server: Optional[str] = None,
                  remote_port: Optional[int] = None,
-                 remote_password: Optional[str] = None):
+                 remote_password: Optional[str] = None,
+                 fast_read=False,
+                 read_stats=False):
         super(SerialReader, self).__init__()
         self.port = port
         self.baud = baudrate
@@ -65,6 +107,11 @@ class SerialReader(StoppableThread):
         self.remote_password = remote_password
         self.gdb_exit = False
         self.running = False
+        # fast read mode: large block reads ended by a short inter-byte timeout, one event per block
+        self.fast_read = fast_read
+        self.read_block_size = max(FAST_READ_MIN_BLOCK_SIZE, int(baudrate / 10 * FAST_READ_BATCH_LATENCY))
+        self.show_read_stats = read_stats
+        self.read_stats = ReadStats()
         # if not hasattr(self.serial, "cancel_read"):
         #     self.serial.timeout = CHECK_ALIVE_FLAG_TIMEOUT
 
@@ -168,12 +215,22 @@ class SerialReader(StoppableThread):
                     self.data_buffer = b''
                     break
 
+        is_remote = RemoteSerial and isinstance(self.serial, RemoteSerial)
+        if self.fast_read and not is_remote:
+            self.serial.inter_byte_timeout = FAST_READ_INTER_BYTE_TIMEOUT
+            self.serial.timeout = CHECK_ALIVE_FLAG_TIMEOUT
+
         while self.running:
             try:
-                if RemoteSerial and isinstance(self.serial, RemoteSerial):
+                if is_remote:
                     while self.serial.inWaiting() < 1:
                         time.sleep(0.01)
                     data = self.serial.read(self.serial.inWaiting())
+                elif self.fast_read:
+                    # returns a whole burst at once, bounded by the block size to keep the display latency low
+                    data = self.serial.read(self.read_block_size)
+                    if not data:
+                        continue
                 else:
                     data = self.serial.read(1)
                     if not data:
@@ -182,8 +239,10 @@ class SerialReader(StoppableThread):
 
                 # Display raw byte data in debug mode
                 if self.debug:
-                    hex_str = ' '.join(f'{b:02X}' for b in data)
-                    print(f"[Received Data (Hex)]: {hex_str}")
+                    print(f"[Received Data (Hex)]: {data.hex(' ').upper()}")
+
+                if self.read_stats.update(len(data), self.event_queue.qsize()) and self.show_read_stats:
+                    print_yellow(f"[Reader] {self.read_stats}")
 
                 # Handle output control in reset mode
                 if self.reset_mode and not self.start_output:
@@ -209,6 +268,8 @@ class SerialReader(StoppableThread):
     def _stop(self):
         """Stop the serial monitor and clean up resources"""
         print("Closing connection...")
+        if self.show_read_stats:
+            print_yellow(f"[Reader] {self.read_stats}")
         self.running = False
         self.stop()
         if self.serial and self.serial.is_open:
@@ -11,7 +11,6 @@ import os
 import queue
 import subprocess
 import sys
-import threading
 import colorama
 import serial
 from serial.tools import list_ports, miniterm
@@ -24,7 +23,10 @@ from base.console_reader import ConsoleReader
 from base.constants import CTRL_C, CTRL_H, EVENT_QUEUE_TIMEOUT, LAST_LINE_THREAD_INTERVAL, TAG_CMD, TAG_KEY, TAG_SERIAL, \
     TAG_SERIAL_FLUSH, CMD_STOP
 from base.key_config import EXIT_KEY, EXIT_MENU_KEY, MENU_KEY
+from base.last_line_flusher import LastLineFlusher
 from base.log_handler import LogHandler
+from base.log_source import parse_logagg_sources
+from base.address_decoder import SYMBOLIZERS, SYMBOLIZER_ADDR2LINE, SYMBOLIZER_AUTO
 from base.color_output import print_normal, print_yellow, print_red
 from base.serial_handler import SerialHandler, SerialStopException
 from base.serial_reader import LinuxReader, SerialReader
@@ -67,7 +69,14 @@ class Monitor():
             remote_password: Optional[str] = None,
             log_enabled: bool = False,
             log_dir: Optional[List[str]] = None,
-            logAGG: Optional[List[str]] = None
+            logAGG: Optional[List[str]] = None,
+            logAGG_hide: Optional[List[str]] = None,
+            logAGG_history: int = 0,
+            logAGG_split_log: bool = False,
+            symbolizer: str = SYMBOLIZER_AUTO,
+            decode_all_lines: bool = False,
+            fast_read: bool = False,
+            read_stats: bool = False
     ):
         self.event_queue = queue.Queue()
         self.cmd_queue = queue.Queue()
@@ -80,7 +89,10 @@ class Monitor():
         self.debug = debug
         self.logAGG_enabled = True if logAGG else False
         self.log_handler = LogHandler(self.elf_file, self.output_queue, timestamps, enable_address_decoding, toolchain_path,
-                                      log_enabled, log_dir, port, logAGG, rom_elf_file=rom_file)
+                                      log_enabled, log_dir, port, logAGG, rom_elf_file=rom_file,
+                                      logAGG_hide=logAGG_hide, logAGG_history=logAGG_history,
+                                      logAGG_split_log=logAGG_split_log, symbolizer=symbolizer,
+                                      decode_all_lines=decode_all_lines)
                                       
         if self.target_os == "freertos":
             from base.coredump_freertos import CoreDump
@@ -104,7 +116,8 @@ class Monitor():
         if isinstance(self, SerialMonitor):
             self.serial_reader = SerialReader(port, baudrate, self.event_queue,
                                               reset_mode=reset_mode, debug=debug,
-                                              remote_server=remote_server, remote_port=remote_port, remote_password=remote_password)
+                                              remote_server=remote_server, remote_port=remote_port, remote_password=remote_password,
+                                              fast_read=fast_read, read_stats=read_stats)
 
         else:
             self.serial = subprocess.Popen([self.elf_file], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
@@ -117,7 +130,7 @@ class Monitor():
         self.console_reader = ConsoleReader(self.event_queue, self.cmd_queue, self.console_parser)
 
         # internal state
-        self._invoke_processing_last_line_timer = None
+        self.last_line_flusher = LastLineFlusher(LAST_LINE_THREAD_INTERVAL)
 
     def __enter__(self):
         """ Use "with self" to temporarily disable monitoring behaviour """
@@ -146,11 +159,6 @@ class Monitor():
                 self.console_reader._stop()
                 self.serial_reader._stop()
                 self.log_handler._stop()
-                # Cancelling _invoke_processing_last_line_timer is not
-                # important here because receiving empty data doesn"t matter.
-                if self._invoke_processing_last_line_timer:
-                    self._invoke_processing_last_line_timer.cancel()
-                    self._invoke_processing_last_line_timer = None
             except Exception as e:  # noqa
                 print_red(f"{e}")
 
@@ -160,12 +168,22 @@ class Monitor():
     def invoke_processing_last_line(self):
         self.event_queue.put((TAG_SERIAL_FLUSH, b""), False)
 
+    def process_last_line(self):
+        # finalizing the line when coredump is in progress causes decoding issues
+        # the coredump loader uses empty line as a sign for end-of-coredump
+        # line is finalized only for non coredump data (output is muted while reading coredump)
+        if self.log_handler.output_enabled:
+            self.serial_handler.handle_serial_input("", self.coredump, finalize_line=True)
+
     def _main_loop(self):
+        if self.last_line_flusher.expired():
+            self.process_last_line()
+
         try:
             item = self.cmd_queue.get_nowait()
         except queue.Empty:
             try:
-                item = self.event_queue.get(timeout=EVENT_QUEUE_TIMEOUT)
+                item = self.event_queue.get(timeout=self.last_line_flusher.get_timeout(EVENT_QUEUE_TIMEOUT))
             except queue.Empty:
                 return
 
@@ -193,21 +211,14 @@ class Monitor():
                 payload_str = self.serial_reader.decode(data)              
                 self.serial_handler.handle_serial_input(payload_str, self.coredump)
 
-            if self._invoke_processing_last_line_timer is not None:
-                self._invoke_processing_last_line_timer.cancel()
-            self._invoke_processing_last_line_timer = threading.Timer(LAST_LINE_THREAD_INTERVAL,
-                                                                      self.invoke_processing_last_line)
-            self._invoke_processing_last_line_timer.start()
             # If no further data is received in the next short period
-            # of time then the _invoke_processing_last_line_timer
-            # generates an event which will result in the finishing of
-            # the last line. This is fix for handling lines sent
-            # without EOL.
-            # finalizing the line when coredump is in progress causes decoding issues
-            # the coredump loader uses empty line as a sign for end-of-coredump
-            # line is finalized only for non coredump data
+            # of time then the last_line_flusher deadline expires in the
+            # main loop, which results in the finishing of the last line.
+            # This is fix for handling lines sent without EOL.
+            self.last_line_flusher.touch()
         elif event_tag == TAG_SERIAL_FLUSH:
-            self.serial_handler.handle_serial_input(data, self.coredump, True)
+            self.last_line_flusher.cancel()
+            self.process_last_line()
         else:
             raise RuntimeError("Bad event data %r" % ((event_tag, data),))
 
@@ -279,12 +290,26 @@ def main():
             sys.exit(1)
 
     if args.enable_address_decoding:
-        if not args.toolchain_dir:
+        if not args.toolchain_dir and args.symbolizer == SYMBOLIZER_ADDR2LINE:
             print_red("Note: No toolchain_dir specified for enable-address-decoding, monitor starts failed!")
             sys.exit(1)
         if not args.axf_file:
             print_red("Note: No axf_file specified for enable-address-decoding, monitor starts failed!")
             sys.exit(1)
+    elif args.decode_all_lines:
+        print_red("Note: --decode-all-lines requires --enable-address-decoding, monitor starts failed!")
+        sys.exit(1)
+    if args.logAGG:
+        try:
+            logAGG_names = parse_logagg_sources(args.logAGG).values()
+        except ValueError as e:
+            print_red(f"Error: {e}")
+            sys.exit(1)
+        for name in args.logAGG_hide or []:
+            if name not in logAGG_names:
+                print_red(f"Error: logAGG source '{name}' to hide is not in --logAGG")
+                sys.exit(1)
+
     toolchain_path = ''
     if args.toolchain_dir:
         if os.name == "nt":
@@ -335,7 +360,14 @@ def main():
                         remote_password=args.remote_password,
                         log_enabled = args.log,
                         log_dir=args.log_dir,
-                        logAGG = args.logAGG)
+                        logAGG = args.logAGG,
+                        logAGG_hide=args.logAGG_hide,
+                        logAGG_history=args.logAGG_history,
+                        logAGG_split_log=args.logAGG_split_log,
+                        symbolizer=args.symbolizer,
+                        decode_all_lines=args.decode_all_lines,
+                        fast_read=args.fast_read,
+                        read_stats=args.read_stats)
 
         print_yellow("--- Exit monitor: Ctrl+C ---")
 
@@ -362,6 +394,13 @@ def get_parser():
     parser.add_argument("--timestamps", action="store_true",
                         help="Add timestamp for each line. Default is False")
     parser.add_argument("--toolchain-dir", help="Set toolchain dir. If not set, will get from config.")
+    parser.add_argument("--symbolizer", choices=SYMBOLIZERS, default=SYMBOLIZER_AUTO,
+                        help="Address decoding by addr2line of toolchain, or natively from the ELF file without toolchain. "
+                             "Default is auto: addr2line if found in toolchain, otherwise native. "
+                             "Native output has no C++ demangling and no inlined frames")
+    parser.add_argument("--decode-all-lines", action="store_true",
+                        help="Decode addresses in all lines, not only in stack traces. "
+                             "Requires --enable-address-decoding. Default is False")
 
     parser.add_argument('--reset', action='store_true', 
                        help='Enable reset mode: Wait 100ms after connection to send "reboot" command, start output only after detecting "ROM:["')
@@ -374,8 +413,19 @@ def get_parser():
     parser.add_argument('--log-dir', type=str, default="",
                        help='Specify the target log file directory, if not, the logs will save to under xxxx_gcc_project when logging enabled')
     parser.add_argument('--logAGG', nargs='+', 
-                         help='the logAGG enabled and source marked '
+                         help='the logAGG enabled and source marked, NAME or NAME=ID with source ID 1~7, '
+                              'plain names are source ID 0x1, 0x2 and 0x4 in order'
                         )
+    parser.add_argument('--logAGG-hide', nargs='+',
+                       help='logAGG sources not displayed on terminal, still logged, last lines are shown on exit')
+    parser.add_argument('--logAGG-history', type=int, default=0,
+                       help='Number of last lines kept in memory per logAGG source, default is 0')
+    parser.add_argument('--logAGG-split-log', action='store_true',
+                       help='Also save logs of each logAGG source to its own file when logging enabled')
+    parser.add_argument('--fast-read', action='store_true',
+                       help='Enable fast read mode for high baud rates: read serial data in large blocks and queue them as batches')
+    parser.add_argument('--read-stats', action='store_true',
+                       help='Print serial reader statistics periodically: received bytes per second and event queue depth')
 
     return parser
 